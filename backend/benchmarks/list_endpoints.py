@@ -0,0 +1,185 @@
+"""
+Benchmark of the list endpoints that return plain dicts serialized with
+orjson (``/api/v1/posts`` and ``/api/v1/campaigns/donations``), against the
+model-returning path that they replaced.
+
+Each path is timed from the query to the JSON body:
+
+- models: :meth:`~gaza_archive.db.Db.get_posts` /
+  :meth:`~gaza_archive.db.Db.get_donations`, then validation and JSON
+  serialization through the response model, as FastAPI does with
+  ``response_model``.
+- dicts: :meth:`~gaza_archive.db.Db.get_post_dicts` /
+  :meth:`~gaza_archive.db.Db.get_donation_dicts`, then ``orjson.dumps``.
+
+Run it from the ``backend`` directory::
+
+    python -m benchmarks.list_endpoints [--db-url URL]
+
+It runs on a new SQLite database by default. Any other database passed with
+``--db-url`` should be a scratch one, as the benchmark data is left there.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import tempfile
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Any, Callable
+
+import orjson
+from pydantic import TypeAdapter
+
+from gaza_archive.config import Config
+from gaza_archive.db import Db
+from gaza_archive.model import (
+    Account,
+    Campaign,
+    CampaignDonation,
+    CampaignDonationInfo,
+    Media,
+    Post,
+)
+
+
+def _seed(db: Db, n_accounts: int, n_posts: int, n_donations: int):
+    accounts = [
+        Account(
+            url=f"https://inst{i % 5}.social/@user{i}",
+            id=str(i),
+            display_name=f"User {i}",
+            avatar_url=f"https://cdn.example/avatars/{i}.png",
+            header_url=f"https://cdn.example/headers/{i}.png",
+            profile_note=f"<p>Note {i}</p>",
+            campaign_url=f"https://www.gofundme.com/f/benchmark-{i}",
+            created_at=datetime(2024, 1, 1) + timedelta(days=i),
+        )
+        for i in range(n_accounts)
+    ]
+    db.save_accounts(accounts)
+
+    posts = []
+    for i, author in enumerate(accounts):
+        for j in range(n_posts):
+            post_id = str(i * n_posts + j)
+            post = Post(
+                url=f"{author.url}/{post_id}",
+                id=post_id,
+                author=author,
+                content=f"<p>Post {post_id} &amp; <b>more</b></p>",
+                created_at=datetime(2024, 6, 1) + timedelta(minutes=int(post_id)),
+            )
+            if j % 3 == 0:
+                post.attachments = [
+                    Media(
+                        url=f"https://cdn.example/media/{post_id}.jpg",
+                        id=post_id,
+                        type="image",
+                        description=f"Image {post_id}",
+                        post=post,
+                    )
+                ]
+            posts.append(post)
+    db.save_posts(posts)
+
+    db.save_campaigns(
+        [
+            Campaign(
+                url=str(account.campaign_url),
+                account_url=account.url,
+                donations=[
+                    CampaignDonation(
+                        id=f"{i}-{j}",
+                        url=f"{account.campaign_url}#donation-{i}-{j}",
+                        campaign_url=str(account.campaign_url),
+                        amount=float(j % 500 + 1),
+                        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+                        + timedelta(hours=i * n_donations + j),
+                        donor=f"donor-{j % 50}" if j % 4 else None,
+                    )
+                    for j in range(n_donations)
+                ],
+            )
+            for i, account in enumerate(accounts)
+        ]
+    )
+
+
+def _through_model(adapter: TypeAdapter, items: list[Any]) -> bytes:
+    items = adapter.validate_python(items, from_attributes=True)
+    return json.dumps(adapter.dump_python(items, mode="json")).encode()
+
+
+def _time(func: Callable[[], bytes], rounds: int) -> float:
+    """
+    :return: The median time of a call, in milliseconds.
+    """
+    func()  # Warm-up
+    times = []
+    for _ in range(rounds):
+        started_at = perf_counter()
+        func()
+        times.append(perf_counter() - started_at)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db-url", help="Database URL (default: new SQLite file)")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=50, help="Posts per account")
+    parser.add_argument(
+        "--donations", type=int, default=100, help="Donations per account"
+    )
+    parser.add_argument("--limit", type=int, default=100, help="Items per request")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = replace(
+            Config.from_env(),
+            db_url=args.db_url or f"sqlite:///{tmp_dir}/benchmark.db",
+            slow_query_threshold=0,
+        )
+        logging.getLogger().setLevel(logging.WARNING)
+        db = Db(config)
+        # So amounts are converted without fetching the rates
+        db._save_to_cache(datetime.now().strftime("%Y-%m-%d"), {"USD": 1.0})
+
+        print(
+            f"Storing {args.accounts} accounts, {args.posts} posts and "
+            f"{args.donations} donations per account..."
+        )
+        _seed(db, args.accounts, args.posts, args.donations)
+
+        posts = TypeAdapter(list[Post])
+        donations = TypeAdapter(list[CampaignDonationInfo])
+        limit = args.limit
+        benchmarks = {
+            "/api/v1/posts": (
+                lambda: _through_model(posts, db.get_posts(limit=limit)),
+                lambda: orjson.dumps(db.get_post_dicts(limit=limit)),
+            ),
+            "/api/v1/campaigns/donations": (
+                lambda: _through_model(donations, db.get_donations(limit=limit)),
+                lambda: orjson.dumps(db.get_donation_dicts(limit=limit)),
+            ),
+        }
+
+        print(f"{limit} items per request, median of {args.rounds} rounds:")
+        print(f"{'':30}{'models':>10}{'dicts':>10}")
+        for name, (models, dicts) in benchmarks.items():
+            print(
+                f"{name:30}"
+                f"{_time(models, args.rounds):>8.1f}ms"
+                f"{_time(dicts, args.rounds):>8.1f}ms"
+            )
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of :meth:`gaza_archive.db.Db.save_campaigns` on campaigns that
+already have many stored donations, as in each crawl cycle.
+
+Run it from the ``backend`` directory::
+
+    python -m benchmarks.save_donations [--db-url URL]
+
+It runs on a new SQLite database by default. Any other database passed with
+``--db-url`` should be a scratch one, as the benchmark data is left there.
+"""
+
+import argparse
+import logging
+import tempfile
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from gaza_archive.config import Config
+from gaza_archive.db import Db
+from gaza_archive.model import Campaign, CampaignDonation, SuspensionState
+
+
+def _campaign(i: int, donation_ids: range) -> Campaign:
+    url = f"https://www.gofundme.com/f/benchmark-{i}"
+    started_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return Campaign(
+        url=url,
+        account_url=f"https://benchmark.social/@user{i}",
+        donations_cursor=f"cursor-{donation_ids.stop}",
+        # As stored, like the crawler does
+        state=SuspensionState.ACTIVE,
+        donations=[
+            CampaignDonation(
+                id=f"{i}-{j}",
+                url=f"{url}#donation-{i}-{j}",
+                campaign_url=url,
+                amount=float(j % 500 + 1),
+                created_at=started_at + timedelta(minutes=j),
+                donor=f"donor-{j % 1000}",
+            )
+            for j in donation_ids
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db-url", help="Database URL (default: new SQLite file)")
+    parser.add_argument("--campaigns", type=int, default=3)
+    parser.add_argument(
+        "--stored",
+        type=int,
+        default=100_000,
+        help="Donations stored per campaign before the benchmark",
+    )
+    parser.add_argument(
+        "--new",
+        type=int,
+        nargs="+",
+        default=[0, 100, 10_000],
+        help="New donations per campaign in each benchmarked save",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = replace(
+            Config.from_env(),
+            db_url=args.db_url or f"sqlite:///{tmp_dir}/benchmark.db",
+            slow_query_threshold=0,
+        )
+        logging.getLogger().setLevel(logging.WARNING)
+        db = Db(config)
+
+        print(f"Storing {args.stored:,} donations in {args.campaigns} campaigns...")
+        db.save_campaigns(
+            [_campaign(i, range(args.stored)) for i in range(args.campaigns)]
+        )
+
+        print(f"{'new donations per campaign':>28}  {'time':>10}")
+        stored = args.stored
+        for new in args.new:
+            campaigns = [
+                _campaign(i, range(stored, stored + new)) for i in range(args.campaigns)
+            ]
+            started_at = perf_counter()
+            db.save_campaigns(campaigns)
+            elapsed = perf_counter() - started_at
+            stored += new
+            print(f"{new:>28,}  {elapsed * 1000:>8.0f}ms")
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
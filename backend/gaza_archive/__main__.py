@@ -1,5 +1,64 @@
-from .app import App
+import argparse
+import os
+
+from .app import App, AppMode
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gaza Verified Archive: crawlers, bots and API server."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=[mode.value for mode in AppMode],
+        default=os.getenv("APP_MODE", AppMode.ALL.value),
+        help=(
+            "Services to run: the crawlers and the API in one process (all), "
+            "only the crawlers and the bots (crawler), or only the API (api). "
+            "Default: APP_MODE, or all."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of API worker processes in api mode. Default: API_WORKERS, or 1.",
+    )
+    parser.add_argument(
+        "--rebuild-media-manifest",
+        action="store_true",
+        help=(
+            "Rebuild the index of the stored media files, used by the /media "
+            "browser, and exit."
+        ),
+    )
+    parser.add_argument(
+        "--render-thumbnails",
+        action="store_true",
+        help="Render the missing thumbnails of the stored images and exit.",
+    )
+    parser.add_argument(
+        "--dedupe-media",
+        action="store_true",
+        help=(
+            "Store each distinct content of the stored media files only once, "
+            "report the space reclaimed and exit."
+        ),
+    )
+
+    args = parser.parse_args()
+    if args.rebuild_media_manifest:
+        App(mode=AppMode.CRAWLER).rebuild_media_manifest()
+        return
+    if args.dedupe_media:
+        App(mode=AppMode.CRAWLER).dedupe_media()
+        return
+    if args.render_thumbnails:
+        App(mode=AppMode.CRAWLER).render_missing_thumbnails()
+        return
+
+    App(mode=AppMode(args.mode), api_workers=args.workers).run()
 
 
 if __name__ == "__main__":
-    App().run()
+    main()
@@ -1,32 +1,78 @@
+import os
 import signal
+from enum import Enum
 from logging import getLogger
+from typing import TYPE_CHECKING
 
-from .db import Db
 from .config import Config
-from .loop import Loop
-from .server import ApiServer
+from .db import Db
+
+# The crawlers and the API are only imported by the modes that run them, so
+# the crawler doesn't load FastAPI and Jinja, and the API doesn't load the
+# HTTP clients, the HTML parser and the campaign sources of the crawlers
+if TYPE_CHECKING:
+    from .loop import Loop
+    from .server import ApiServer
+    from .storages import DedupeReport
 
 log = getLogger(__name__)
 
 
+class AppMode(str, Enum):
+    """
+    Which services the application runs.
+    """
+
+    # The crawlers and the API, as threads of the same process
+    ALL = "all"
+    # Only the crawlers and the bots
+    CRAWLER = "crawler"
+    # Only the API, in one or more read-only worker processes
+    API = "api"
+
+
 class App:
     """
     Main application class.
     """
 
-    def __init__(self):
+    def __init__(self, mode: AppMode = AppMode.ALL, api_workers: int | None = None):
+        """
+        :param mode: Which services to run.
+        :param api_workers: Number of API worker processes in ``api`` mode
+            (default: ``API_WORKERS``).
+        """
         self.config = Config.from_env()
+        self.mode = mode
+        self.api_workers = api_workers or self.config.api_workers
+        # Also in API mode: it creates or migrates the schema before the
+        # read-only workers start, in case the crawler isn't up yet
         self.db = Db(self.config)
-        self.loop = Loop(config=self.config, db=self.db)
-        self.api = ApiServer(config=self.config, db=self.db)
+        self.loop: "Loop | None" = None
+        self.api: "ApiServer | None" = None
+
+        if mode != AppMode.API:
+            from .loop import Loop
+
+            self.loop = Loop(config=self.config, db=self.db)
+        if mode == AppMode.ALL:
+            from .server import ApiServer
+
+            self.api = ApiServer(config=self.config, db=self.db)
 
     def run(self):
+        if self.mode == AppMode.API:
+            self._run_api()
+            return
+
         signal.signal(signal.SIGINT, self.handle_exit)
         signal.signal(signal.SIGTERM, self.handle_exit)
+        assert self.loop, "The main loop is not initialized"
 
         try:
             self.loop.start()
-            self.api.start()
+            if self.api:
+                self.api.start()
             self.loop.join()
         except KeyboardInterrupt:
             self.loop.stop()
@@ -34,8 +80,66 @@ class App:
         finally:
             log.info("Exiting...")
 
+    def rebuild_media_manifest(self) -> int:
+        """
+        Rebuild the media manifest from the stored files.
+
+        :return: The number of files in the manifest.
+        """
+        assert self.loop, "The main loop is not initialized"
+        return self.loop.client.rebuild_media_manifest()
+
+    def dedupe_media(self) -> "DedupeReport":
+        """
+        Deduplicate the stored media files.
+        """
+        assert self.loop, "The main loop is not initialized"
+        return self.loop.client.dedupe_media()
+
+    def render_missing_thumbnails(self) -> int:
+        """
+        Render the thumbnails of the stored images that don't have them yet.
+
+        :return: The number of images whose thumbnails were rendered.
+        """
+        assert self.loop, "The main loop is not initialized"
+        try:
+            return self.loop.client.render_missing_thumbnails()
+        finally:
+            self.loop.client.thumbnails.shutdown(wait=True)
+
+    def _run_api(self):
+        """
+        Run the API server in the foreground, with ``api_workers`` processes.
+        The crawler runs in another process and is the only writer, so the
+        workers open the database in read-only mode.
+        """
+        self.db.engine.dispose()
+        # Inherited by the worker processes
+        os.environ["API_READ_ONLY"] = "true"
+
+        log.info(
+            "Starting API server on %s:%d with %d worker(s)",
+            self.config.api_host,
+            self.config.api_port,
+            self.api_workers,
+        )
+
+        import uvicorn
+
+        uvicorn.run(
+            f"{__package__}.server:create_app",
+            factory=True,
+            host=self.config.api_host,
+            port=self.config.api_port,
+            workers=self.api_workers,
+            log_level="debug" if self.config.debug else "info",
+        )
+
     def handle_exit(self, signum, *_):
         """Handle shutdown signals (SIGINT, SIGTERM)."""
         log.info("%s received. Stopping application...", signal.Signals(signum).name)
-        self.loop.stop()
-        self.api.stop()
+        if self.loop:
+            self.loop.stop()
+        if self.api:
+            self.api.stop()
@@ -2,13 +2,13 @@ from ..config import Config
 from ..db import Db
 from ..model import Account
 from ..storages import Storage
-
 from .bots import MastodonAccountsBot, MastodonCampaignsBot
 from .downloader import MediaDownloader
 from .mastodon import MastodonApi
 from .sources import sources
 from .sources.campaigns import CampaignParser
 from .suspension_checker import SuspensionStateChecker
+from .thumbnails import ThumbnailRenderer
 
 
 class Client(
@@ -27,6 +27,7 @@ class Client(
         self.config = config
         self.db = db
         self.storage = storage
+        self.thumbnails = ThumbnailRenderer(storage, db, config.thumbnail_workers)
         self.sources = [source(config) for source in sources if source is not None]
         super().__init__()
 
@@ -7,7 +7,7 @@ import requests
 
 from ....config import Config
 from ....db import Db
-from ....model import Post
+from ....model import BotName, Post
 from ....model.suspension import SuspensionState
 
 log = getLogger(__name__)
@@ -21,6 +21,7 @@ class MastodonAccountsBot(ABC):
     config: Config
     db: Db
     _bot_account_info: dict | None = None
+    __bot_name = BotName.ACCOUNTS.value
 
     def _is_account_limited_on_home_instance(self, post: Post) -> bool:
         """
@@ -100,6 +101,10 @@ class MastodonAccountsBot(ABC):
             response.raise_for_status()
             self._bot_account_info = response.json()
             assert self._bot_account_info, "Bot account info is empty"
+            if self._bot_account_info.get("url"):
+                self.db.save_bot_account_url(
+                    self.__bot_name, self._bot_account_info["url"]
+                )
         except Exception as e:
             log.error("Failed to verify Mastodon bot account: %s", e)
             self._bot_account_info = None
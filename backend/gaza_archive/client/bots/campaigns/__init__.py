@@ -7,7 +7,7 @@ import requests
 
 from ....config import Config
 from ....db import Db
-from ....model import CampaignAccountStats
+from ....model import BotName, CampaignAccountStats
 
 log = getLogger(__name__)
 
@@ -23,7 +23,7 @@ class MastodonCampaignsBot(ABC):
     _bot_campaign_info: dict | None = None
     _bot_campaign_thread: Thread | None = None
     _bot_campaign_stop_event = Event()
-    __bot_name = "mastodon_campaigns_bot"
+    __bot_name = BotName.CAMPAIGNS.value
     _post_header_template = "#GazaVerified campaigns that raised less than ${min_amount} in the past {time_window} days:\n\n"
     _max_post_length: int = (
         500 - len("\n\n(10/10)") - 2
@@ -67,6 +67,10 @@ class MastodonCampaignsBot(ABC):
             response.raise_for_status()
             self._bot_campaign_info = response.json()
             assert self._bot_campaign_info, "Bot campaign info is empty"
+            if self._bot_campaign_info.get("url"):
+                self.db.save_bot_account_url(
+                    self.__bot_name, self._bot_campaign_info["url"]
+                )
         except Exception as e:
             log.error("Failed to verify Mastodon bot account: %s", e)
             self._bot_campaign_info = None
@@ -1,3 +1,4 @@
+import re
 from abc import ABC
 from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
@@ -5,45 +6,233 @@ from logging import getLogger
 import requests
 
 from ..config import Config
+from ..db import Db
 from ..errors import DownloadError
 from ..model import Account, Media, Post
-from ..storages import Storage
+from ..storages import DedupeReport, Storage
+from .thumbnails import ThumbnailRenderer
 
 log = getLogger(__name__)
 
 
+def _content_range(response: requests.Response, offset: int) -> tuple[int, int | None]:
+    """
+    :param offset: Start of the requested range, or 0 for the whole file.
+    :return: The offset the content of the response starts at, and the size
+        of the whole file, if known.
+    """
+    length = response.headers.get("Content-Length")
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        # The length is the one of the encoded content
+        length = None
+
+    if not offset or response.status_code != 206:
+        # Range not supported: the download starts again
+        return 0, int(length) if length and length.isdigit() else None
+
+    match = re.fullmatch(
+        r"bytes (\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", "")
+    )
+    if not match or int(match.group(1)) != offset:
+        raise DownloadError(
+            f"Unexpected range {response.headers.get('Content-Range')!r} "
+            f"for {response.url}, requested from {offset}"
+        )
+
+    if match.group(2) != "*":
+        return offset, int(match.group(2))
+    return offset, offset + int(length) if length and length.isdigit() else None
+
+
 class MediaDownloader(ABC):
     config: Config
+    db: Db
     storage: Storage
+    thumbnails: ThumbnailRenderer
 
-    def download(self, url: str, path: str):
+    def _get(self, url: str, offset: int = 0) -> requests.Response:
+        headers = {
+            "User-Agent": self.storage.config.user_agent,
+            # So Content-Length and the ranges refer to the stored bytes
+            "Accept-Encoding": "identity",
+        }
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        return requests.get(
+            url,
+            stream=True,
+            timeout=self.storage.config.http_timeout,
+            headers=headers,
+        )
+
+    def download(self, url: str, path: str) -> bool:
+        """
+        Download a file, or resume its interrupted download if the server
+        supports range requests.
+
+        :return: Whether the file was downloaded, i.e. it wasn't stored yet.
+        """
         if self.storage.exists(path):
             log.debug("Attachment already downloaded: %s", url)
-            return
+            return False
 
+        offset = self.storage.partial_size(path)
         try:
-            with requests.get(
-                url,
-                stream=True,
-                timeout=self.storage.config.http_timeout,
-                headers={"User-Agent": self.storage.config.user_agent},
-            ) as response:
+            response = self._get(url, offset)
+            if offset and response.status_code == 416:
+                # The partial file isn't shorter than the remote one
+                response.close()
+                self.storage.discard_partial(path)
+                offset = 0
+                response = self._get(url)
+
+            with response:
+                if response.status_code in (404, 410):
+                    self.storage.discard_partial(path)
                 response.raise_for_status()
-                self.storage.save(
+
+                try:
+                    offset, size = _content_range(response, offset)
+                except DownloadError:
+                    self.storage.discard_partial(path)
+                    raise
+
+                digest = self.storage.save(
                     url,
                     path,
                     lambda: (chunk for chunk in response.iter_content(chunk_size=8192)),
+                    offset=offset,
+                    size=size,
                 )
         except Exception as exc:
             raise DownloadError(f"Failed to download media {url}") from exc
 
+        # Record the file in the media manifest, which the API lists the
+        # media directories from
+        media_file = self.storage.stat(path)
+        if media_file:
+            media_file.sha256 = digest
+            self.db.save_media_file(media_file)
+
+        return True
+
+    def _resume_partial_download(self, path: str, url: str | None) -> bool:
+        if not url or not url.startswith(("http://", "https://")):
+            # Files rendered by the backend, e.g. thumbnails, can't be resumed.
+            # --render-thumbnails renders the missing ones again.
+            self.storage.discard_partial(path)
+            return False
+
+        if self.storage.exists(path):
+            self.storage.discard_partial(path)
+            return False
+
+        if not self.download(url, path):
+            return False
+
+        media = self.db.get_attachment(url)
+        if media and media.type == "image" and media.path == path:
+            self.thumbnails.submit(path)
+        return True
+
+    def resume_partial_downloads(self) -> int:
+        """
+        Resume the downloads interrupted by a restart, as the crawlers don't
+        fetch the posts that were already stored again.
+
+        :return: The number of files downloaded.
+        """
+        partials = list(self.storage.partial_downloads())
+        if not partials:
+            return 0
+
+        log.info("Resuming %d interrupted downloads", len(partials))
+        count = 0
+        with ThreadPoolExecutor(
+            max_workers=self.config.concurrent_requests
+        ) as executor:
+            futs = [
+                executor.submit(self._resume_partial_download, path, url)
+                for path, url in partials
+            ]
+
+        for fut in futs:
+            try:
+                count += fut.result()
+            except Exception as e:
+                log.error("Error resuming download: %s", e)
+
+        log.info("%d interrupted downloads completed", count)
+        return count
+
+    def rebuild_media_manifest(self) -> int:
+        """
+        Replace the media manifest with a scan of the stored files, e.g. for
+        the files downloaded before the manifest existed.
+
+        :return: The number of files in the manifest.
+        """
+        log.info("Rebuilding the media manifest...")
+        count = self.db.replace_media_files(self.storage.scan())
+        log.info("Media manifest rebuilt: %d files", count)
+        return count
+
+    def dedupe_media(self) -> DedupeReport:
+        """
+        Store the media files downloaded before they were content-addressed
+        only once per content.
+        """
+        log.info("Deduplicating the stored media files...")
+        report = self.storage.dedupe(on_deduplicated=self.db.save_media_file)
+        log.info(
+            "Media deduplicated: %d of %d files, %.1f MB reclaimed, "
+            "%d unused blobs removed",
+            report.deduplicated,
+            report.files,
+            report.reclaimed_bytes / 1024 / 1024,
+            report.removed_blobs,
+        )
+        return report
+
+    def render_missing_thumbnails(self) -> int:
+        """
+        Render the thumbnails of the stored images that don't have them yet,
+        e.g. the images downloaded before thumbnails were introduced.
+
+        :return: The number of images whose thumbnails were rendered.
+        """
+        if not self.thumbnails.enabled:
+            log.warning("Thumbnails are disabled (THUMBNAIL_WORKERS=0)")
+            return 0
+
+        # Collected upfront, so the query doesn't hold the database while the
+        # thumbnails are stored
+        paths = [
+            row["path"]
+            for row in self.db.iter_attachment_rows()
+            if row["type"] == "image"
+        ]
+
+        log.info("Checking the thumbnails of %d images...", len(paths))
+        futures = [
+            self.thumbnails.submit(path)
+            for path in paths
+            if self.storage.exists(path) and self.thumbnails.missing(path)
+        ]
+
+        count = sum(1 for future in futures if future and future.result())
+        log.info("Thumbnails rendered for %d images", count)
+        return count
+
     def download_post_attachments(self, post: Post):
         attachments = [media for media in post.attachments if isinstance(media, Media)]
         if not attachments:
             return
 
         for media in attachments:
-            self.download(url=media.url, path=media.path)
+            if self.download(url=media.url, path=media.path) and media.type == "image":
+                self.thumbnails.submit(media.path)
 
     def download_attachments(self, posts: list[Post]):
         futs = []
@@ -4,6 +4,7 @@ import warnings
 from abc import ABC
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from threading import Lock
 from time import time
 
 from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
@@ -14,10 +15,6 @@ from ....errors import CampaignDeletedError, HttpError
 from ....model import Account, Campaign, SuspensionState
 from ....utils import naive_utc
 from ._source import CampaignSource
-from .chuffed import ChuffedCampaignSource
-from .steunactie import SteunactieCampaignSource
-from .gfm import GFMCampaignSource
-from .whydonate import WhydonateCampaignSource
 
 log = logging.getLogger(__name__)
 
@@ -29,12 +26,31 @@ class CampaignParser(ABC):
     db: Db
 
     def __init__(self, *_, **__):
-        self.campaign_sources: set[CampaignSource] = {
-            ChuffedCampaignSource(config=self.config, db=self.db),
-            GFMCampaignSource(config=self.config, db=self.db),
-            SteunactieCampaignSource(config=self.config, db=self.db),
-            WhydonateCampaignSource(config=self.config, db=self.db),
-        }
+        self._campaign_sources: set[CampaignSource] | None = None
+        self._campaign_sources_lock = Lock()
+
+    @property
+    def campaign_sources(self) -> set[CampaignSource]:
+        """
+        The supported campaign platforms. Their modules are only imported
+        when a campaign URL is first parsed or refreshed.
+        """
+        if self._campaign_sources is None:
+            with self._campaign_sources_lock:
+                if self._campaign_sources is None:
+                    from .chuffed import ChuffedCampaignSource
+                    from .gfm import GFMCampaignSource
+                    from .steunactie import SteunactieCampaignSource
+                    from .whydonate import WhydonateCampaignSource
+
+                    self._campaign_sources = {
+                        ChuffedCampaignSource(config=self.config, db=self.db),
+                        GFMCampaignSource(config=self.config, db=self.db),
+                        SteunactieCampaignSource(config=self.config, db=self.db),
+                        WhydonateCampaignSource(config=self.config, db=self.db),
+                    }
+
+        return self._campaign_sources
 
     def get_campaign_url(self, account: Account) -> str | None:
         return next(
@@ -76,14 +92,24 @@ class CampaignParser(ABC):
         existing_campaigns: dict[str, Campaign] = {}
         new_campaigns: dict[str, Campaign] = {}
         deleted_urls: set[str] = set()
+        # Only the sync state is needed here: the refresh carries just the
+        # new donations, and the stored ones are never loaded.
+        sync_states = self.db.get_campaign_sync_states()
 
         for account in accounts:
             if not account.campaign_url:
                 continue
 
-            campaign = self.db.get_campaign(account.campaign_url)
-            if campaign:
-                existing_campaigns[account.url] = campaign
+            sync_state = sync_states.get(account.campaign_url)
+            if sync_state:
+                existing_campaigns[account.url] = Campaign(
+                    url=sync_state.url,
+                    account_url=account.url,
+                    donations=[],
+                    donations_cursor=sync_state.donations_cursor,
+                    state=sync_state.state,
+                    down_since=sync_state.down_since,
+                )
             else:
                 new_campaigns[account.url] = Campaign(
                     url=account.campaign_url,
@@ -210,8 +236,13 @@ class CampaignParser(ABC):
         return campaign_source.parse_url(url)
 
     def fetch_donations(self, campaign: Campaign) -> Campaign:
+        """
+        Fetch the donations made to a campaign since its stored cursor.
+
+        :return: The campaign, with the updated cursor and only the new
+            donations.
+        """
         campaign_source = self.get_campaign_source(campaign.url)
-        donations = {donation.url: donation for donation in campaign.donations}
         campaign = campaign_source.fetch_donations(campaign)
 
         if campaign.donations:
@@ -222,13 +253,4 @@ class CampaignParser(ABC):
                 campaign.url,
             )
 
-        campaign.donations = sorted(
-            {
-                **donations,
-                **({donation.url: donation for donation in campaign.donations}),
-            }.values(),
-            key=lambda d: d.created_at.astimezone(timezone.utc),
-            reverse=True,
-        )
-
         return campaign
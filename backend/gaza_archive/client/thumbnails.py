@@ -0,0 +1,132 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+from logging import getLogger
+from multiprocessing import get_context
+from threading import BoundedSemaphore, Lock
+
+from ..db import Db
+from ..model import derivative_path, derivative_sizes
+from ..storages import Storage
+
+log = getLogger(__name__)
+
+
+def render_derivatives(data: bytes, sizes: dict[str, int]) -> dict[str, bytes]:
+    """
+    Render the WebP derivatives of an image. It runs on a worker process.
+
+    :param data: Content of the original image.
+    :param sizes: Maximum width/height of each derivative, by name.
+    :return: The content of each derivative, by name.
+    """
+    # Only the worker processes need Pillow
+    from PIL import Image, ImageOps
+
+    derivatives = {}
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+        for name, size in sizes.items():
+            derivative = image.copy()
+            derivative.thumbnail((size, size))
+            output = BytesIO()
+            derivative.save(output, format="WEBP", quality=80)
+            derivatives[name] = output.getvalue()
+
+    return derivatives
+
+
+class ThumbnailRenderer:
+    """
+    Renders the thumbnails and the previews of the image attachments (see
+    :data:`derivative_sizes`) on a pool of worker processes, and stores them
+    next to the originals.
+    """
+
+    def __init__(self, storage: Storage, db: Db, workers: int):
+        """
+        :param storage: Storage of the originals and of the derivatives.
+        :param db: Database, to record the derivatives in the media manifest.
+        :param workers: Number of worker processes. 0 disables rendering.
+        """
+        self.storage = storage
+        self.db = db
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = Lock()
+        # Limits the images waiting to be rendered, as they are kept in memory
+        self._slots = BoundedSemaphore(max(workers, 1) * 4)
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if not self._executor:
+                # The crawler is multi-threaded, so don't fork it
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context("forkserver")
+                )
+
+            return self._executor
+
+    def missing(self, path: str) -> bool:
+        """
+        :return: Whether any of the derivatives of a stored image is missing.
+        """
+        return any(
+            not self.storage.exists(derivative_path(path, name))
+            for name in derivative_sizes
+        )
+
+    def submit(self, path: str) -> Future | None:
+        """
+        Render the derivatives of a stored image in the background. It blocks
+        if too many images are already waiting to be rendered.
+
+        :param path: Path of the image in the storage.
+        :return: A future that resolves to whether the derivatives were
+            stored, or None if rendering is disabled.
+        """
+        if not self.enabled:
+            return None
+
+        self._slots.acquire()
+        result: Future[bool] = Future()
+        try:
+            rendered = self._get_executor().submit(
+                render_derivatives, self.storage.read(path), derivative_sizes
+            )
+        except Exception:
+            self._slots.release()
+            raise
+
+        rendered.add_done_callback(partial(self._save, path, result))
+        return result
+
+    def _save(self, path: str, result: Future, rendered: Future):
+        try:
+            for name, data in rendered.result().items():
+                derivative = derivative_path(path, name)
+                digest = self.storage.save(derivative, derivative, lambda: iter([data]))
+                media_file = self.storage.stat(derivative)
+                if media_file:
+                    media_file.sha256 = digest
+                    self.db.save_media_file(media_file)
+        except Exception as e:
+            log.warning("Could not render the thumbnails of %s: %s", path, e)
+            result.set_result(False)
+        else:
+            result.set_result(True)
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
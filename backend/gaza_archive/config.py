@@ -1,5 +1,5 @@
-import os
 import logging
+import os
 import re
 import sys
 from dataclasses import dataclass
@@ -19,9 +19,12 @@ class Config:  # pylint: disable=too-few-public-methods
     db_url: str
     api_host: str
     api_port: int
+    api_workers: int
+    api_read_only: bool
     user_agent: str
     concurrent_requests: int
     download_media: bool
+    thumbnail_workers: int
     enable_crawlers: bool
     enable_campaign_crawlers: bool
     campaign_url_http_proxy: str | None
@@ -46,6 +49,24 @@ class Config:  # pylint: disable=too-few-public-methods
     account_state_servers_limit: int
     account_state_custom_servers: list[str]
     deleted_after_down_hours: float
+    api_cache_ttl: int
+    api_cache_size: int
+    api_db_workers: int
+    api_analytics_db_workers: int
+    api_db_queue_size: int
+    feed_cache_size_mb: int
+    feed_prewarm_interval: int
+    accel_redirect_prefix: str | None
+    compression_min_size: int
+    rate_limit_capacity: int
+    rate_limit_rate: float
+    rate_limit_store: str | None
+    rate_limit_tokens: list[str]
+    api_query_timeout: float
+    api_max_rows: int
+    slow_query_threshold: float
+    stream_buffer_size: int
+    stream_max_clients: int
     debug: bool
 
     def __post_init__(self):
@@ -74,6 +95,10 @@ class Config:  # pylint: disable=too-few-public-methods
             db_url=os.getenv("DB_URL", "sqlite:///./data.db"),
             api_host=os.getenv("API_HOST", "0.0.0.0"),
             api_port=int(os.getenv("API_PORT", "8000")),
+            api_workers=int(os.getenv("API_WORKERS", "1")),
+            api_read_only=(
+                os.getenv("API_READ_ONLY", "false").lower() in ("true", "1", "yes")
+            ),
             user_agent=(
                 os.getenv("USER_AGENT", "GazaVerifiedArchiveBot/1.0")
                 + f" (+{base_url})"
@@ -82,6 +107,7 @@ class Config:  # pylint: disable=too-few-public-methods
             download_media=(
                 os.getenv("DOWNLOAD_MEDIA", "true").lower() in ("true", "1", "yes")
             ),
+            thumbnail_workers=int(os.getenv("THUMBNAIL_WORKERS", "2")),
             enable_crawlers=(
                 os.getenv("ENABLE_CRAWLERS", "true").lower() in ("true", "1", "yes")
             ),
@@ -173,4 +199,30 @@ class Config:  # pylint: disable=too-few-public-methods
             deleted_after_down_hours=float(
                 os.getenv("DELETED_AFTER_DOWN_HOURS", "72.0")
             ),
+            api_cache_ttl=int(os.getenv("API_CACHE_TTL", "300")),
+            api_cache_size=int(os.getenv("API_CACHE_SIZE", "1000")),
+            api_db_workers=int(os.getenv("API_DB_WORKERS", "8")),
+            api_analytics_db_workers=int(os.getenv("API_ANALYTICS_DB_WORKERS", "2")),
+            api_db_queue_size=int(os.getenv("API_DB_QUEUE_SIZE", "32")),
+            feed_cache_size_mb=int(os.getenv("FEED_CACHE_SIZE_MB", "64")),
+            feed_prewarm_interval=int(os.getenv("FEED_PREWARM_INTERVAL", "60")),
+            compression_min_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+            accel_redirect_prefix=(
+                os.getenv("ACCEL_REDIRECT_PREFIX", "").rstrip("/") or None
+            ),
+            rate_limit_capacity=int(os.getenv("RATE_LIMIT_CAPACITY", "120")),
+            rate_limit_rate=float(os.getenv("RATE_LIMIT_RATE", "2.0")),
+            rate_limit_store=os.getenv("RATE_LIMIT_STORE") or None,
+            rate_limit_tokens=[
+                token
+                for token in re.split(
+                    r"\s*,\s*", os.getenv("RATE_LIMIT_TOKENS", "").strip()
+                )
+                if token
+            ],
+            api_query_timeout=float(os.getenv("API_QUERY_TIMEOUT", "10")),
+            api_max_rows=int(os.getenv("API_MAX_ROWS", "10000")),
+            slow_query_threshold=float(os.getenv("SLOW_QUERY_THRESHOLD", "1.0")),
+            stream_buffer_size=int(os.getenv("STREAM_BUFFER_SIZE", "1000")),
+            stream_max_clients=int(os.getenv("STREAM_MAX_CLIENTS", "1000")),
         )
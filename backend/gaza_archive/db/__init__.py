@@ -1,3 +1,13 @@
 from ._db import Db
+from ._events import EventListener, event_types
+from ._projections import export_fields
+from ._queries import QueryBudget, QueryCounter
 
-__all__ = ["Db"]
+__all__ = [
+    "Db",
+    "EventListener",
+    "QueryBudget",
+    "QueryCounter",
+    "event_types",
+    "export_fields",
+]
@@ -1,22 +1,28 @@
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from logging import getLogger
-from threading import RLock
-from typing import Iterator
+from threading import Lock, RLock
+from typing import Any, Collection, Iterator
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Query, Session
 
 from ..model import Account
+from ..model.suspension import SuspensionState
 from ._model import (
     Account as DbAccount,
+    AccountSuspensionState as DbAccountSuspensionState,
     Campaign as DbCampaign,
     CampaignDonation as DbCampaignDonation,
     Post as DbPost,
 )
+from ._projections import FqnCache, account_export_columns
 
 log = getLogger(__name__)
 
+# Home instance states of the accounts that are no longer active
+inactive_states = (SuspensionState.DELETED, SuspensionState.SUSPENDED)
+
 
 class Accounts(ABC):
     """
@@ -26,21 +32,128 @@ class Accounts(ABC):
     _write_lock: RLock
 
     def __init__(self, *_, **__):
-        self._accounts: dict[str, Account] = {}
+        # (data version, counts) of the last count_accounts_by_state call
+        self._state_counts: tuple[int, dict[str | None, int]] | None = None
+        self._state_counts_lock = Lock()
 
     @abstractmethod
     @contextmanager
     def get_session(self) -> Iterator[Session]: ...
 
-    def _load_accounts(self) -> dict[str, Account]:
-        log.debug("Loading accounts from database...")
-        self._accounts = self.get_accounts()
-        log.info("Loaded %d accounts from database.", len(self._accounts))
-        return self._accounts
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
+    @abstractmethod
+    def get_data_version(
+        self, scopes: Collection[str] | None = None
+    ) -> tuple[int, Any]: ...
+
+    @staticmethod
+    def _join_home_state(query: Query) -> Query:
+        """
+        Outer join the accounts in a query with their state on their home
+        instance, i.e. the one whose URL prefixes the account URL.
+        """
+        return query.outerjoin(
+            DbAccountSuspensionState,
+            (DbAccountSuspensionState.account_url == DbAccount.url)
+            & (
+                func.substr(
+                    DbAccount.url,
+                    1,
+                    func.length(DbAccountSuspensionState.server_url) + 1,
+                )
+                == DbAccountSuspensionState.server_url + "/"
+            ),
+        )
+
+    @staticmethod
+    def _filter_home_state(
+        query: Query,
+        state: SuspensionState | None = None,
+        hide_inactive: bool = False,
+    ) -> Query:
+        if state:
+            query = query.filter(DbAccountSuspensionState.state == state)
+        if hide_inactive:
+            query = query.filter(
+                or_(
+                    DbAccountSuspensionState.state.is_(None),
+                    DbAccountSuspensionState.state.notin_(inactive_states),
+                )
+            )
+        return query
+
+    def get_account_urls(self) -> list[str]:
+        """
+        :return: The URLs of all the stored accounts, sorted. Cheaper than
+            :meth:`get_accounts` when the rest of the profile isn't needed.
+        """
+        with self.get_session() as session:
+            return [
+                str(url)
+                for (url,) in session.query(DbAccount.url).order_by(DbAccount.url)
+            ]
+
+    def has_account(self, account_url: str) -> bool:
+        """
+        :return: Whether the account is stored. Cheaper than
+            :meth:`get_account` when the account itself isn't needed.
+        """
+        with self.get_session() as session:
+            return (
+                session.query(DbAccount.url)
+                .filter(DbAccount.url == account_url)
+                .first()
+                is not None
+            )
+
+    def iter_account_rows(
+        self,
+        *,
+        limit: int | None = None,
+        offset: int | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Stream all the accounts as flat rows (see
+        :data:`account_export_columns`), fetching ``batch_size`` rows at a
+        time through a server-side cursor where supported.
+        """
+        with self.get_session() as session:
+            query = (
+                session.query(*account_export_columns.values())
+                .order_by(DbAccount.url)
+                .limit(limit)
+                .offset(offset)
+            )
+
+            fields = tuple(account_export_columns)
+            fqns = FqnCache()
+            for row in query.yield_per(batch_size):
+                account = dict(zip(fields, row))
+                account["fqn"] = fqns.get(account["url"])
+                yield account
 
     def get_accounts(
-        self, limit: int | None = None, offset: int | None = None
+        self,
+        limit: int | None = None,
+        offset: int | None = None,
+        state: SuspensionState | None = None,
+        hide_inactive: bool = False,
+        urls: Collection[str] | None = None,
     ) -> dict[str, Account]:
+        """
+        :param limit: Maximum number of accounts to return, sorted by URL.
+        :param offset: Number of accounts to skip.
+        :param urls: Only return the accounts with these URLs.
+        :param state: Only return the accounts in this state on their home
+            instance.
+        :param hide_inactive: Skip the accounts that are deleted or suspended
+            on their home instance.
+        :return: The accounts, by URL, with their last post ID and their home
+            instance state.
+        """
         with self.get_session() as session:
             last_post_subquery = (
                 session.query(
@@ -50,33 +163,68 @@ class Accounts(ABC):
                 .subquery()
             )
 
-            db_accounts = (
-                session.query(DbAccount, last_post_subquery.c.last_status_id)
-                .outerjoin(
+            query = self._join_home_state(
+                session.query(
+                    DbAccount,
+                    last_post_subquery.c.last_status_id,
+                    DbAccountSuspensionState.state,
+                ).outerjoin(
                     last_post_subquery,
                     DbAccount.url == last_post_subquery.c.author_url,
                 )
+            )
+
+            if urls is not None:
+                query = query.filter(DbAccount.url.in_(urls))
+
+            db_accounts = (
+                self._filter_home_state(query, state, hide_inactive)
                 .order_by(DbAccount.url)
-                .limit(limit if limit is not None else None)
+                .limit(limit)
                 .offset(offset if offset is not None else 0)
                 .all()
             )
 
-            account_urls = [str(db_account.url) for db_account, _ in db_accounts]
-            home_states = self.get_home_instance_states(account_urls)
-
             return {
                 str(db_account.url): db_account.to_model(
                     last_status_id=last_status_id,
-                    state=(
-                        home_states.get(str(db_account.url)).value
-                        if home_states.get(str(db_account.url))
-                        else None
-                    ),
+                    state=home_state.value if home_state else None,
                 )
-                for db_account, last_status_id in db_accounts
+                for db_account, last_status_id, home_state in db_accounts
             }
 
+    def count_accounts_by_state(self) -> dict[str | None, int]:
+        """
+        Count the accounts by home instance state. The counts are cached
+        until the accounts or their states change.
+
+        :return: The number of accounts by state value, with None for the
+            accounts whose home instance state is unknown.
+        """
+        version, _ = self.get_data_version(scopes=("accounts", "suspensions"))
+        cached = self._state_counts
+        if cached and cached[0] == version:
+            return cached[1]
+
+        with self._state_counts_lock:
+            if self._state_counts and self._state_counts[0] == version:
+                return self._state_counts[1]
+
+            with self.get_session() as session:
+                rows = (
+                    self._join_home_state(
+                        session.query(
+                            DbAccountSuspensionState.state, func.count(DbAccount.url)
+                        ).select_from(DbAccount)
+                    )
+                    .group_by(DbAccountSuspensionState.state)
+                    .all()
+                )
+
+            counts = {state.value if state else None: count for state, count in rows}
+            self._state_counts = (version, counts)
+            return counts
+
     def get_account(self, account_url: str) -> Account | None:
         with self.get_session() as session:
             last_post_subquery = (
@@ -111,6 +259,7 @@ class Accounts(ABC):
         accounts_by_url = {account.url: account for account in accounts}
 
         with self._write_lock, self.get_session() as session:
+            changed = False
             db_accounts: dict[str, DbAccount] = {
                 str(db_account.url): db_account
                 for db_account in (
@@ -183,8 +332,12 @@ class Accounts(ABC):
 
                     db_account.update_from_model(account)
                     session.merge(db_account)
+                    changed = True
                 elif not db_account:
                     log.info("Adding new account: %s", account.url)
                     session.add(DbAccount.from_model(account))
+                    changed = True
 
+            if changed:
+                self._bump_data_version(session, "accounts")
             session.commit()
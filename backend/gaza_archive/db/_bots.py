@@ -5,6 +5,7 @@ from logging import getLogger
 from threading import RLock
 from typing import Iterator
 
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 
 from ..model import BotState
@@ -24,6 +25,9 @@ class Bots(ABC):
     @contextmanager
     def get_session(self) -> Iterator[Session]: ...
 
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
     def get_bot_state(self, bot_name: str) -> BotState | None:
         with self.get_session() as session:
             bot_state = session.query(DbBotState).get(bot_name)
@@ -42,3 +46,50 @@ class Bots(ABC):
 
             session.add(bot_state)
             session.commit()
+
+    def get_bot_account_urls(self) -> dict[str, str]:
+        """
+        :return: The URLs of the bot accounts, as a ``bot_name -> url``
+            mapping. Bots whose account hasn't been verified yet are omitted.
+        """
+        with self.get_session() as session:
+            return {
+                str(bot_name): str(account_url)
+                for bot_name, account_url in session.query(
+                    DbBotState.bot_name, DbBotState.account_url
+                ).filter(DbBotState.account_url.isnot(None))
+            }
+
+    def save_bot_account_url(self, bot_name: str, account_url: str):
+        """
+        Store the URL of a bot's account, so the API processes can show it
+        without talking to the Mastodon instance.
+        """
+        with self._write_lock, self.get_session() as session:
+            current = (
+                session.query(DbBotState.account_url)
+                .filter(DbBotState.bot_name == bot_name)
+                .one_or_none()
+            )
+            if current and current.account_url == account_url:
+                return
+
+            if current:
+                session.execute(
+                    update(DbBotState)
+                    .where(DbBotState.bot_name == bot_name)
+                    .values(account_url=account_url)
+                )
+            else:
+                # Explicitly leave last_updated_at empty, as the bot hasn't
+                # posted anything yet
+                session.execute(
+                    insert(DbBotState).values(
+                        bot_name=bot_name,
+                        account_url=account_url,
+                        last_updated_at=None,
+                    )
+                )
+
+            self._bump_data_version(session, "bots")
+            session.commit()
@@ -4,13 +4,13 @@ from contextlib import contextmanager
 from datetime import datetime
 from logging import getLogger
 from threading import RLock
-from typing import Iterator, Any
+from typing import Any, Collection, Iterator, Sequence
 
-from sqlalchemy import func, or_
+from pydantic import BaseModel
+from sqlalchemy import func, insert, or_, update
 from sqlalchemy.orm import Query, Session
 
 from ..config import Config
-from ..utils import naive_utc
 from ..model import (
     Account,
     ApiSortType,
@@ -20,14 +20,19 @@ from ..model import (
     CampaignDonationInfo,
     CampaignStats,
     CampaignStatsAmount,
+    CampaignSyncState,
     SuspensionState,
 )
+from ..utils import naive_utc
+from ._dialects import time_buckets, upsert
 from ._model import (
     Account as DbAccount,
     Campaign as DbCampaign,
     CampaignDonation as DbCampaignDonation,
     Post as DbPost,
 )
+from ._projections import AccountDicts, account_columns, donation_export_columns
+from ._queries import QueryBudget
 
 log = getLogger(__name__)
 
@@ -38,6 +43,7 @@ class Campaigns(ABC):
     """
 
     config: Config
+    has_listeners: bool
     _write_lock: RLock
     _table_by_search_key: dict[str, type[DbCampaign]] = {
         "account": DbAccount,
@@ -49,6 +55,12 @@ class Campaigns(ABC):
     @contextmanager
     def get_session(self) -> Iterator[Session]: ...
 
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
+    @abstractmethod
+    def _publish(self, event_type: str, items: Sequence[BaseModel]): ...
+
     @abstractmethod
     def convert(
         self,
@@ -72,6 +84,58 @@ class Campaigns(ABC):
 
             return campaign.to_model() if campaign else None
 
+    def get_account_campaign_urls(self, account_urls: Collection[str]) -> set[str]:
+        """
+        :param account_urls: URLs of the accounts.
+        :return: The URLs of the campaigns of these accounts.
+        """
+        if not account_urls:
+            return set()
+
+        with self.get_session() as session:
+            return {
+                str(row[0])
+                for row in session.query(DbAccount.campaign_url).filter(
+                    DbAccount.url.in_(list(account_urls)),
+                    DbAccount.campaign_url.isnot(None),
+                )
+            }
+
+    def get_campaign_sync_states(self) -> dict[str, CampaignSyncState]:
+        """
+        Get the synchronization state of all the stored campaigns in a single
+        query, without loading their donations.
+
+        :return: Campaign URL -> sync state.
+        """
+        with self.get_session() as session:
+            rows = (
+                session.query(
+                    DbCampaign.url,
+                    DbCampaign.donations_cursor,
+                    DbCampaign.state,
+                    DbCampaign.down_since,
+                    func.count(DbCampaignDonation.id),
+                )
+                .outerjoin(
+                    DbCampaignDonation,
+                    DbCampaignDonation.campaign_url == DbCampaign.url,
+                )
+                .group_by(DbCampaign.url)
+                .all()
+            )
+
+            return {
+                url: CampaignSyncState(
+                    url=url,
+                    donations_cursor=cursor,
+                    state=state,
+                    down_since=down_since,
+                    donations_count=count,
+                )
+                for url, cursor, state, down_since, count in rows
+            }
+
     @classmethod
     def _params_to_columns(cls, params: list[str]) -> dict[str, Any]:
         columns = {}
@@ -95,22 +159,13 @@ class Campaigns(ABC):
             time_unit = attr_tokens[1] if len(attr_tokens) > 1 else None
             if time_unit:
                 time_unit = time_unit.lower()
-                if time_unit == "day":
-                    column = func.strftime("%Y-%m-%d", getattr(table, attr)).label(
-                        "day"
-                    )
-                elif time_unit == "week":
-                    column = func.date(
-                        getattr(table, attr), "weekday 1", "-6 days"
-                    ).label("week")
-                elif time_unit == "month":
-                    column = func.strftime("%Y-%m", getattr(table, attr)).label("month")
-                elif time_unit == "year":
-                    column = func.strftime("%Y", getattr(table, attr)).label("year")
-                else:
+                time_bucket = time_buckets.get(time_unit)
+                if not time_bucket:
                     raise AssertionError(
                         f"Invalid time unit in group_by field: {param}."
                     )
+
+                column = time_bucket(getattr(table, attr)).label(time_unit)
             else:
                 column = getattr(table, attr, None)
 
@@ -209,12 +264,12 @@ class Campaigns(ABC):
                 },
             )
 
-            if limit is not None:
-                query = query.limit(limit)
+            query = query.limit(QueryBudget.row_limit(limit))
             if offset is not None:
                 query = query.offset(offset)
 
             records = query.all()
+            QueryBudget.check_rows(len(records))
             return self._records_to_stats(
                 records,
                 group_columns=group_columns,
@@ -234,39 +289,20 @@ class Campaigns(ABC):
         show_deleted: bool = False,
     ) -> list[CampaignDonationInfo]:
         with self.get_session() as session:
-            query = (
+            rows = self._filter_donations(
                 session.query(DbAccount, DbCampaign, DbCampaignDonation)
                 .join(DbCampaignDonation.campaign)
-                .join(DbCampaign.account)
-            )
-
-            if accounts:
-                query = self._accounts_filter(query, accounts)
-            if donors:
-                query = self._donors_filter(query, donors)
-            if start_time:
-                query = query.filter(DbCampaignDonation.created_at >= start_time)
-            if end_time:
-                query = query.filter(DbCampaignDonation.created_at <= end_time)
-
-            query = self._excluded_campaign_accounts_filter(query)
-
-            if not show_deleted:
-                query = query.filter(
-                    or_(
-                        DbCampaign.state.is_(None),
-                        DbCampaign.state != SuspensionState.DELETED,
-                    )
-                )
-
-            query = self._apply_sort(
-                query, sort or [("donation.created_at", ApiSortType.DESC)]
-            )
-
-            if limit is not None:
-                query = query.limit(limit)
-            if offset is not None:
-                query = query.offset(offset)
+                .join(DbCampaign.account),
+                accounts=accounts,
+                donors=donors,
+                start_time=start_time,
+                end_time=end_time,
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                show_deleted=show_deleted,
+            ).all()
+            QueryBudget.check_rows(len(rows))
 
             return [
                 CampaignDonationInfo(
@@ -285,9 +321,165 @@ class Campaigns(ABC):
                     donor=donation.donor if not self.config.hide_donors else None,
                     created_at=donation.created_at,
                 )
-                for account, campaign, donation in query.all()
+                for account, campaign, donation in rows
             ]
 
+    def get_donation_dicts(
+        self,
+        accounts: list[str] | None = None,
+        donors: list[str] | None = None,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        sort: list[tuple[str, ApiSortType]] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        currency: str | None = None,
+        show_deleted: bool = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Same as :meth:`get_donations`, but it only selects the columns needed
+        by the API and returns plain dicts with the same shape as serialized
+        :class:`CampaignDonationInfo` objects.
+        """
+        currency = currency or "USD"
+        # Donations are stored in USD and converted at the current rate
+        rate = self.convert(1.0, from_currency="USD", to_currency=currency)[
+            "exchange_rate"
+        ]
+        hide_donors = self.config.hide_donors
+
+        with self.get_session() as session:
+            query = self._filter_donations(
+                session.query(
+                    DbCampaignDonation.id,
+                    DbCampaign.url,
+                    DbCampaignDonation.amount,
+                    DbCampaignDonation.donor,
+                    DbCampaignDonation.created_at,
+                    *account_columns,
+                )
+                .join(DbCampaignDonation.campaign)
+                .join(DbCampaign.account),
+                accounts=accounts,
+                donors=donors,
+                start_time=start_time,
+                end_time=end_time,
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                show_deleted=show_deleted,
+            )
+
+            accounts_dicts = AccountDicts()
+            donations = []
+            for row in query:
+                amount = CampaignStatsAmount(amount=row[2] * rate, currency=currency)
+                donations.append(
+                    {
+                        "id": row[0],
+                        "account": accounts_dicts.get(row[5:]),
+                        "campaign_url": row[1],
+                        "amount": {
+                            "amount": round(amount.amount, 2),
+                            "currency": currency,
+                            "string": str(amount),
+                        },
+                        "donor": row[3] if not hide_donors else None,
+                        "created_at": row[4],
+                    }
+                )
+
+            QueryBudget.check_rows(len(donations))
+            return donations
+
+    def iter_donation_rows(
+        self,
+        *,
+        accounts: list[str] | None = None,
+        donors: list[str] | None = None,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        currency: str | None = None,
+        show_deleted: bool = False,
+        batch_size: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Stream all the donations matching the filters as flat rows (see
+        :data:`donation_export_columns`), fetching ``batch_size`` rows at a
+        time through a server-side cursor where supported.
+
+        Amounts are converted to ``currency`` (default: USD) at the current
+        rate, and donors are omitted if they are hidden.
+        """
+        currency = currency or "USD"
+        rate = self.convert(1.0, from_currency="USD", to_currency=currency)[
+            "exchange_rate"
+        ]
+        hide_donors = self.config.hide_donors
+
+        with self.get_session() as session:
+            query = self._filter_donations(
+                session.query(*donation_export_columns.values())
+                .join(DbCampaignDonation.campaign)
+                .join(DbCampaign.account),
+                accounts=accounts,
+                donors=donors,
+                start_time=start_time,
+                end_time=end_time,
+                show_deleted=show_deleted,
+            )
+
+            fields = tuple(donation_export_columns)
+            for row in query.yield_per(batch_size):
+                donation = dict(zip(fields, row))
+                donation["amount"] = round(donation["amount"] * rate, 2)
+                donation["currency"] = currency
+                if hide_donors:
+                    donation["donor"] = None
+                yield donation
+
+    def _filter_donations(
+        self,
+        query: Query,
+        *,
+        accounts: list[str] | None = None,
+        donors: list[str] | None = None,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        sort: list[tuple[str, ApiSortType]] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        show_deleted: bool = False,
+    ) -> Query:
+        if accounts:
+            query = self._accounts_filter(query, accounts)
+        if donors:
+            query = self._donors_filter(query, donors)
+        if start_time:
+            query = query.filter(DbCampaignDonation.created_at >= start_time)
+        if end_time:
+            query = query.filter(DbCampaignDonation.created_at <= end_time)
+
+        query = self._excluded_campaign_accounts_filter(query)
+
+        if not show_deleted:
+            query = query.filter(
+                or_(
+                    DbCampaign.state.is_(None),
+                    DbCampaign.state != SuspensionState.DELETED,
+                )
+            )
+
+        query = self._apply_sort(
+            query, sort or [("donation.created_at", ApiSortType.DESC)]
+        )
+
+        query = query.limit(QueryBudget.row_limit(limit))
+        if offset is not None:
+            query = query.offset(offset)
+
+        return query
+
     def _records_to_stats(
         self,
         records: list[tuple[Any, ...]],
@@ -417,7 +609,7 @@ class Campaigns(ABC):
             sort_column = group_sort_columns.get(sort_field)
             if sort_column is None:
                 sort_column = table_sort_columns.get(sort_field)
-                assert sort_column, f"Invalid sort field: {sort_field}."
+                assert sort_column is not None, f"Invalid sort field: {sort_field}."
 
             sort_column = (
                 sort_column.asc()
@@ -479,151 +671,184 @@ class Campaigns(ABC):
         return query
 
     def save_campaigns(self, campaigns: list[Campaign]):
-        with self._write_lock, self.get_session() as session:
-            campaigns_by_url: dict[str, Campaign] = {}
-            for campaign in campaigns:
-                existing = campaigns_by_url.get(campaign.url)
-                if not existing:
-                    campaigns_by_url[campaign.url] = campaign
-                    continue
+        """
+        Save campaigns and their donations.
 
-                if (
-                    existing.donations_cursor is None
-                    and campaign.donations_cursor is not None
-                ):
-                    existing.donations_cursor = campaign.donations_cursor
+        Donations are upserted by ID in bulk, without loading the stored
+        donations of the campaigns. Donations that already exist under a
+        different campaign URL are moved to the new campaign and updated,
+        while those already stored under the same campaign are left untouched.
+        """
+        campaigns_by_url: dict[str, Campaign] = {}
+        donations_by_url: dict[str, dict[str, CampaignDonation]] = defaultdict(dict)
+
+        for campaign in campaigns:
+            existing = campaigns_by_url.setdefault(campaign.url, campaign)
+            if (
+                existing is not campaign
+                and existing.donations_cursor is None
+                and campaign.donations_cursor is not None
+            ):
+                existing.donations_cursor = campaign.donations_cursor
 
-                donations_by_id = {
-                    donation.id: donation for donation in existing.donations
-                }
-                for donation in campaign.donations:
-                    prev = donations_by_id.get(donation.id)
-                    if prev is None or naive_utc(donation.created_at) > naive_utc(prev.created_at):
-                        donations_by_id[donation.id] = donation
+            donations_by_id = donations_by_url[campaign.url]
+            for donation in campaign.donations:
+                prev = donations_by_id.get(donation.id)
+                if prev is None or naive_utc(donation.created_at) > naive_utc(
+                    prev.created_at
+                ):
+                    donations_by_id[donation.id] = donation
 
-                existing.donations = list(donations_by_id.values())
+        with self._write_lock, self.get_session() as session:
+            existing_rows = {
+                str(row[0]): tuple(row[1:])
+                for row in session.query(
+                    DbCampaign.url,
+                    DbCampaign.donations_cursor,
+                    DbCampaign.state,
+                    DbCampaign.down_since,
+                )
+                .filter(DbCampaign.url.in_(list(campaigns_by_url)))
+                .all()
+            }
 
-            campaigns = list(campaigns_by_url.values())
+            new_campaigns = []
+            updated_campaigns = []
+            saved_urls = set()
 
-            for campaign in campaigns:
-                if not campaign.donations:
-                    continue
-                donations_by_id: dict[str, CampaignDonation] = {
-                    donation.id: donation for donation in campaign.donations
+            for url, campaign in campaigns_by_url.items():
+                row = {
+                    "url": url,
+                    "donations_cursor": campaign.donations_cursor,
+                    "state": campaign.state,
+                    "down_since": campaign.down_since,
                 }
-                for donation in campaign.donations:
-                    prev = donations_by_id.get(donation.id)
-                    if prev is None or naive_utc(donation.created_at) > naive_utc(prev.created_at):
-                        donations_by_id[donation.id] = donation
-                campaign.donations = list(donations_by_id.values())
-
-            db_campaigns: dict[str, Campaign] = {  # type: ignore
-                str(db_campaign.url): db_campaign
-                for db_campaign in (
-                    session.query(DbCampaign)
-                    .filter(
-                        DbCampaign.url.in_([campaign.url for campaign in campaigns])
-                    )
-                    .all()
-                )
-            }
 
-            for campaign in campaigns:
-                db_campaign = db_campaigns.get(campaign.url)
-                if not db_campaign:
-                    if (
-                        not campaign.donations
-                        and campaign.state is None
-                        and campaign.down_since is None
+                if url in existing_rows:
+                    if existing_rows[url] != (
+                        campaign.donations_cursor,
+                        campaign.state,
+                        naive_utc(campaign.down_since) if campaign.down_since else None,
                     ):
-                        continue
-
+                        updated_campaigns.append(row)
+                elif (
+                    donations_by_url[url]
+                    or campaign.state is not None
+                    or campaign.down_since is not None
+                ):
                     log.info(
                         "Adding new campaign with %d donations (state=%s): %s",
-                        len(campaign.donations),
+                        len(donations_by_url[url]),
                         campaign.state,
-                        campaign.url,
+                        url,
                     )
-                    session.merge(DbCampaign.from_model(campaign))
-
-                    if campaign.donations:
-                        donation_ids = [donation.id for donation in campaign.donations]
-                        existing_rows = {
-                            str(row.id): row
-                            for row in session.query(DbCampaignDonation)
-                            .filter(DbCampaignDonation.id.in_(donation_ids))
-                            .all()
-                        }
-
-                        for donation in campaign.donations:
-                            existing_row = existing_rows.get(donation.id)
-                            if existing_row:
-                                if (
-                                    str(existing_row.campaign_url)
-                                    != donation.campaign_url
-                                ):
-                                    log.info(
-                                        "Moving donation %s from %s to %s",
-                                        donation.id,
-                                        existing_row.campaign_url,
-                                        donation.campaign_url,
-                                    )
-                                    existing_row.campaign_url = donation.campaign_url
-                                existing_row.donor = donation.donor
-                                existing_row.amount = donation.amount
-                                existing_row.created_at = donation.created_at
-                                session.add(existing_row)
-                            else:
-                                session.add(DbCampaignDonation.from_model(donation))
+                    new_campaigns.append(row)
+                else:
                     continue
 
-                db_campaign.state = campaign.state
-                db_campaign.down_since = campaign.down_since
-                db_campaign.donations_cursor = campaign.donations_cursor
+                saved_urls.add(url)
 
-                existing_donations = {donation.id for donation in db_campaign.donations}
-                new_donations = [
-                    donation
-                    for donation in campaign.donations
-                    if donation.id not in existing_donations
-                ]
+            if new_campaigns:
+                session.execute(insert(DbCampaign), new_campaigns)
+            if updated_campaigns:
+                session.execute(update(DbCampaign), updated_campaigns)
 
-                if new_donations:
-                    log.info(
-                        "Added %d donations to campaign: %s",
-                        len(new_donations),
-                        campaign.url,
+            # A donation ID may show up under several campaigns in the same
+            # batch: the last one wins
+            donations = {
+                donation.id: donation
+                for url in saved_urls
+                for donation in donations_by_url[url].values()
+            }
+
+            # Only look up which donations are new if someone listens for them
+            new_donations = (
+                self._new_donations(session, list(donations.values()))
+                if self.has_listeners
+                else []
+            )
+            saved_donations = self._upsert_donations(session, list(donations.values()))
+            if saved_donations:
+                log.info(
+                    "Saved %d new or moved donations across %d campaigns",
+                    saved_donations,
+                    len(saved_urls),
+                )
+
+            if new_campaigns or updated_campaigns or saved_donations:
+                self._bump_data_version(session, "campaigns")
+            session.commit()
+
+        self._publish("donation", new_donations)
+
+    @staticmethod
+    def _new_donations(
+        session: Session,
+        donations: list[CampaignDonation],
+        chunk_size: int = 1000,
+    ) -> list[CampaignDonation]:
+        """
+        :return: The donations that aren't stored yet, under any campaign.
+        """
+        existing_ids: set[str] = set()
+        for i in range(0, len(donations), chunk_size):
+            existing_ids.update(
+                str(row[0])
+                for row in session.query(DbCampaignDonation.id).filter(
+                    DbCampaignDonation.id.in_(
+                        [donation.id for donation in donations[i : i + chunk_size]]
                     )
+                )
+            )
 
-                    donation_ids = [donation.id for donation in new_donations]
-                    existing_rows = {
-                        str(row.id): row
-                        for row in session.query(DbCampaignDonation)
-                        .filter(DbCampaignDonation.id.in_(donation_ids))
-                        .all()
-                    }
+        return [donation for donation in donations if donation.id not in existing_ids]
+
+    @staticmethod
+    def _upsert_donations(
+        session: Session,
+        donations: list[CampaignDonation],
+        chunk_size: int = 1000,
+    ) -> int:
+        """
+        Bulk insert donations, moving those that already exist under another
+        campaign.
+
+        :return: Number of inserted or moved donations. Drivers that don't
+            report it for a batch count the whole batch, so the caller may
+            overestimate it, but never misses a change.
+        """
+        if not donations:
+            return 0
 
-                    for donation in new_donations:
-                        existing_row = existing_rows.get(donation.id)
-                        if existing_row:
-                            if str(existing_row.campaign_url) != donation.campaign_url:
-                                log.info(
-                                    "Moving donation %s from %s to %s",
-                                    donation.id,
-                                    existing_row.campaign_url,
-                                    donation.campaign_url,
-                                )
-                                existing_row.campaign_url = donation.campaign_url
-                            existing_row.donor = donation.donor
-                            existing_row.amount = donation.amount
-                            existing_row.created_at = donation.created_at
-                            session.add(existing_row)
-                        else:
-                            session.add(DbCampaignDonation.from_model(donation))
-
-                session.add(db_campaign)
+        stmt = upsert(
+            session.get_bind().dialect,
+            DbCampaignDonation.__table__,  # type: ignore
+            index_elements=["id"],
+            update_columns=["campaign_url", "donor", "amount", "created_at"],
+            where=lambda table, excluded: table.c.campaign_url != excluded.campaign_url,
+        )
+
+        saved = 0
+        for i in range(0, len(donations), chunk_size):
+            batch = donations[i : i + chunk_size]
+            result = session.execute(
+                stmt,
+                [
+                    {
+                        "id": donation.id,
+                        "campaign_url": donation.campaign_url,
+                        "donor": donation.donor,
+                        "amount": donation.amount,
+                        "created_at": donation.created_at,
+                    }
+                    for donation in batch
+                ],
+            )
+            # -1 if the driver doesn't report it for an executemany
+            rowcount = result.rowcount  # type: ignore
+            saved += rowcount if rowcount >= 0 else len(batch)
 
-            session.commit()
+        return saved
 
     def get_recent_campaign_donations(
         self,
@@ -693,5 +918,7 @@ class Campaigns(ABC):
                 .filter(DbCampaignDonation.id.in_(donation_ids))
                 .delete(synchronize_session=False)
             )
+            if deleted:
+                self._bump_data_version(session, "campaigns")
             session.commit()
             return int(deleted or 0)
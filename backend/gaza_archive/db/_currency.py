@@ -5,7 +5,6 @@ from logging import getLogger
 from time import sleep
 from typing import Iterator
 
-import requests
 from sqlalchemy.orm import Session
 
 from ..config import Config
@@ -25,12 +24,16 @@ class CurrencyConverter(ABC):
     backup_url = "https://data.fixer.io/api"
     cache_max_age_hours: int = 24
     config: Config
+    read_only: bool
     _cached_rates: dict[str, dict] = {}
 
     @abstractmethod
     @contextmanager
     def get_session(self) -> Iterator[Session]: ...
 
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
     def _get_from_cache(self, date: str) -> dict | None:
         """Retrieve rates from cache if available and valid."""
         # First check in-memory cache
@@ -53,6 +56,9 @@ class CurrencyConverter(ABC):
     def _save_to_cache(self, date: str, rates: dict):
         """Save rates to cache using SQLAlchemy ORM."""
         self._cached_rates[date] = rates
+        if self.read_only:
+            # Read-only processes only keep them in memory
+            return
 
         with self.get_session() as session:
             # Check if entry already exists
@@ -71,10 +77,15 @@ class CurrencyConverter(ABC):
                 # Create new entry
                 new_entry = ExchangeRate(date, rates)
                 session.add(new_entry)
+                self._bump_data_version(session, "exchange_rates")
                 session.commit()
 
     def _fetch_rates_from_api(self, date: str, use_backup: bool = True) -> dict:
         """Fetch exchange rates from external API."""
+        # Only loaded when the rates aren't cached, e.g. not by the API
+        # processes of an up-to-date database
+        import requests
+
         try:
             # Try primary API (exchangerate-api.com)
             if date == datetime.now().strftime("%Y-%m-%d"):
@@ -118,7 +129,7 @@ class CurrencyConverter(ABC):
                 except Exception as backup_e:
                     log.warning(
                         "Backup currency API failed: %s. Falling back to most recent rates",
-                        backup_e
+                        backup_e,
                     )
 
                     return self._fetch_rates_from_api(
@@ -133,12 +144,16 @@ class CurrencyConverter(ABC):
         if not self.config.fixer_io_api_key:
             raise ValueError("No API key provided for backup service")
 
+        import requests
+
         try:
             while True:
                 url = f"{self.backup_url}/{date}"
                 params = {"access_key": self.config.fixer_io_api_key}
 
-                response = requests.get(url, params=params, timeout=self.config.http_timeout)
+                response = requests.get(
+                    url, params=params, timeout=self.config.http_timeout
+                )
                 try:
                     response.raise_for_status()
                     break
@@ -154,9 +169,11 @@ class CurrencyConverter(ABC):
                             "Backup API rate limit exceeded. Consider upgrading your plan. "
                             "Waiting 30 seconds before retrying..."
                         )
-                        sleep(30.)
+                        sleep(30.0)
                     else:
-                        raise RuntimeError(f"Backup API HTTP error: {response.status_code}: {error_info}") from e
+                        raise RuntimeError(
+                            f"Backup API HTTP error: {response.status_code}: {error_info}"
+                        ) from e
 
             data = response.json()
 
@@ -238,7 +255,9 @@ class CurrencyConverter(ABC):
         # If from_currency is not USD, convert amount to USD first
         if from_currency != self.base_currency:
             if from_currency not in usd_rates:
-                raise ValueError(f"Currency {from_currency} not found in rates for {date}")
+                raise ValueError(
+                    f"Currency {from_currency} not found in rates for {date}"
+                )
 
             amount /= usd_rates[from_currency]
 
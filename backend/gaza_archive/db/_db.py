@@ -1,38 +1,126 @@
 from contextlib import contextmanager
 from logging import getLogger
 from threading import RLock
+from time import monotonic
 
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import DateTime, create_engine, inspect, select, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
 from ..config import Config
+from ._accounts import Accounts
 from ._bots import Bots
 from ._campaigns import Campaigns
 from ._currency import CurrencyConverter
-from ._accounts import Accounts
+from ._dialects import make_read_only
+from ._events import Events
 from ._media import Media
-from ._model import Base
+from ._media_files import MediaFiles
+from ._model import Base, SchemaVersion as DbSchemaVersion
 from ._posts import Posts
+from ._queries import QueryBudget, QueryCounter, SlowQueryLog
 from ._suspension import SuspensionStates
+from ._versions import DataVersions
 
 log = getLogger(__name__)
 
-
-class Db(CurrencyConverter, Accounts, Campaigns, Media, Posts, Bots, SuspensionStates):
+# Version of the schema defined by the models and by the migrations below.
+# Bump it whenever they change (new tables, columns or indexes), so existing
+# databases are migrated on the next startup.
+schema_version = 1
+
+
+class Db(
+    DataVersions,
+    CurrencyConverter,
+    Events,
+    Accounts,
+    Campaigns,
+    Media,
+    MediaFiles,
+    Posts,
+    Bots,
+    SuspensionStates,
+):
     """
     Database class for managing the database connection and sessions.
     """
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, read_only: bool = False):
+        """
+        :param config: The application configuration.
+        :param read_only: Open the database in read-only mode. The schema is
+            neither created nor migrated - that's up to the writer process -
+            and all the writes are rejected by the database.
+        """
+        started_at = monotonic()
         super().__init__()
         self.config = config
+        self.read_only = read_only
         self.engine = create_engine(self.config.db_url, echo=self.config.debug)
         self.Session = sessionmaker(bind=self.engine)
+        QueryCounter.install(self.engine)
+        QueryBudget.install(self.engine)
+        if self.config.slow_query_threshold > 0:
+            SlowQueryLog(self.config.slow_query_threshold).install(self.engine)
         self._write_lock = RLock()
 
+        if read_only:
+            make_read_only(self.engine)
+        else:
+            self._init_schema()
+            self._init_data_versions()
+
+        log.info("Database opened in %.2fs", monotonic() - started_at)
+
+    def warm_up(self):
+        """
+        Cache the account state counts, which are expensive to query on a cold
+        database, before the first requests.
+        """
+        self.count_accounts_by_state()
+
+    def _get_schema_version(self) -> int | None:
+        """
+        :return: The version of the schema of the database, or None if it
+            predates the ``schema_version`` table.
+        """
+        with self.engine.connect() as conn:
+            if not inspect(conn).has_table(DbSchemaVersion.__tablename__):
+                return None
+
+            return conn.execute(select(DbSchemaVersion.version)).scalar()
+
+    def _init_schema(self):
+        """
+        Create the missing tables and apply the migrations, unless the schema
+        is already at :data:`schema_version`.
+        """
+        version = self._get_schema_version()
+        if version is not None and version >= schema_version:
+            if version > schema_version:
+                log.warning(
+                    "The database schema (version %d) is newer than the "
+                    "application's (version %d)",
+                    version,
+                    schema_version,
+                )
+            return
+
+        log.info(
+            "Migrating the database schema from version %s to %d",
+            version,
+            schema_version,
+        )
         Base.metadata.create_all(self.engine)
         self._migrate()
-        self._load_accounts()
+        with self.get_session() as session:
+            session.merge(DbSchemaVersion(id=1, version=schema_version))
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another process migrated the schema in the meantime
+                session.rollback()
 
     def _migrate(self):
         """
@@ -45,6 +133,8 @@ class Db(CurrencyConverter, Accounts, Campaigns, Media, Posts, Bots, SuspensionS
         with self.engine.begin() as conn:
             self._migrate_accounts(conn)
             self._migrate_campaigns(conn)
+            self._migrate_bot_state(conn)
+            self._migrate_media_files(conn)
 
     def _migrate_accounts(self, conn):
         """Apply migrations for the accounts table."""
@@ -53,15 +143,20 @@ class Db(CurrencyConverter, Accounts, Campaigns, Media, Posts, Bots, SuspensionS
             return
 
         columns = {c["name"] for c in inspector.get_columns("accounts")}
+        datetime_type = DateTime().compile(dialect=conn.dialect)
 
         if "instance_down_since" not in columns:
             conn.execute(
-                text("ALTER TABLE accounts ADD COLUMN instance_down_since DATETIME")
+                text(
+                    f"ALTER TABLE accounts ADD COLUMN instance_down_since {datetime_type}"
+                )
             )
             log.info("Added instance_down_since column to accounts table")
         if "source_removed_since" not in columns:
             conn.execute(
-                text("ALTER TABLE accounts ADD COLUMN source_removed_since DATETIME")
+                text(
+                    f"ALTER TABLE accounts ADD COLUMN source_removed_since {datetime_type}"
+                )
             )
             log.info("Added source_removed_since column to accounts table")
 
@@ -80,6 +175,7 @@ class Db(CurrencyConverter, Accounts, Campaigns, Media, Posts, Bots, SuspensionS
             return
 
         campaign_columns = {c["name"] for c in inspector.get_columns("campaigns")}
+        datetime_type = DateTime().compile(dialect=conn.dialect)
 
         if "state" not in campaign_columns:
             conn.execute(
@@ -89,9 +185,33 @@ class Db(CurrencyConverter, Accounts, Campaigns, Media, Posts, Bots, SuspensionS
             )
             log.info("Added state column to campaigns table")
         if "down_since" not in campaign_columns:
-            conn.execute(text("ALTER TABLE campaigns ADD COLUMN down_since DATETIME"))
+            conn.execute(
+                text(f"ALTER TABLE campaigns ADD COLUMN down_since {datetime_type}")
+            )
             log.info("Added down_since column to campaigns table")
 
+    def _migrate_bot_state(self, conn):
+        """Apply migrations for the bot_state table."""
+        inspector = inspect(conn)
+        if not inspector.has_table("bot_state"):
+            return
+
+        columns = {c["name"] for c in inspector.get_columns("bot_state")}
+        if "account_url" not in columns:
+            conn.execute(text("ALTER TABLE bot_state ADD COLUMN account_url VARCHAR"))
+            log.info("Added account_url column to bot_state table")
+
+    def _migrate_media_files(self, conn):
+        """Apply migrations for the media_files table."""
+        inspector = inspect(conn)
+        if not inspector.has_table("media_files"):
+            return
+
+        columns = {c["name"] for c in inspector.get_columns("media_files")}
+        if "sha256" not in columns:
+            conn.execute(text("ALTER TABLE media_files ADD COLUMN sha256 VARCHAR(64)"))
+            log.info("Added sha256 column to media_files table")
+
     @contextmanager
     def get_session(self):
         with self.Session() as session:
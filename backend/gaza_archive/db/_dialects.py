@@ -0,0 +1,169 @@
+from typing import Any, Callable, Sequence
+
+from sqlalchemy import Engine, String, Table, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Dialect
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import ColumnElement
+from sqlalchemy.sql.dml import Insert
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class TimeBucket(FunctionElement):
+    """
+    Truncate a datetime column to a time bucket, rendered as a string label
+    (e.g. ``2025-01-31`` for days, ``2025-01`` for months).
+
+    The SQL is generated per dialect, so the same query can run on both SQLite
+    and PostgreSQL.
+    """
+
+    type = String()
+    inherit_cache = True
+    unit: str = ""
+
+
+class DayBucket(TimeBucket):
+    name = "day_bucket"
+    inherit_cache = True
+    unit = "day"
+
+
+class WeekBucket(TimeBucket):
+    """
+    Weeks are labelled by their first day. Buckets start on Tuesday, to stay
+    backwards-compatible with the original SQLite implementation
+    (``date(t, 'weekday 1', '-6 days')``).
+    """
+
+    name = "week_bucket"
+    inherit_cache = True
+    unit = "week"
+
+
+class MonthBucket(TimeBucket):
+    name = "month_bucket"
+    inherit_cache = True
+    unit = "month"
+
+
+class YearBucket(TimeBucket):
+    name = "year_bucket"
+    inherit_cache = True
+    unit = "year"
+
+
+time_buckets: dict[str, type[TimeBucket]] = {
+    bucket.unit: bucket for bucket in (DayBucket, WeekBucket, MonthBucket, YearBucket)
+}
+
+_sqlite_formats = {
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+_postgresql_formats = {
+    "day": "YYYY-MM-DD",
+    "week": "YYYY-MM-DD",
+    "month": "YYYY-MM",
+    "year": "YYYY",
+}
+
+
+@compiles(TimeBucket)
+def _compile_time_bucket(element: TimeBucket, compiler, **_):
+    raise CompileError(
+        f"Time grouping is not supported on the {compiler.dialect.name} dialect"
+    )
+
+
+@compiles(TimeBucket, "sqlite")
+def _compile_time_bucket_sqlite(element: TimeBucket, compiler, **kw):
+    column = compiler.process(list(element.clauses)[0], **kw)
+    if element.unit == "week":
+        return f"date({column}, 'weekday 1', '-6 days')"
+    return f"strftime('{_sqlite_formats[element.unit]}', {column})"
+
+
+@compiles(TimeBucket, "postgresql")
+def _compile_time_bucket_postgresql(element: TimeBucket, compiler, **kw):
+    column = compiler.process(list(element.clauses)[0], **kw)
+    fmt = _postgresql_formats[element.unit]
+    if element.unit == "week":
+        # Shift by one day so that weeks start on Tuesday, like on SQLite
+        return (
+            f"to_char(date_trunc('week', {column} - interval '1 day') "
+            f"+ interval '1 day', '{fmt}')"
+        )
+    return f"to_char(date_trunc('{element.unit}', {column}), '{fmt}')"
+
+
+_inserts: dict[str, Callable[[Table], Any]] = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def upsert(
+    dialect: Dialect,
+    table: Table,
+    index_elements: Sequence[str],
+    update_columns: Sequence[str],
+    where: Callable[[Table, Any], ColumnElement[bool]] | None = None,
+) -> Insert:
+    """
+    Build an ``INSERT ... ON CONFLICT DO UPDATE`` statement for the given
+    dialect. Execute it with a list of rows to run a bulk upsert.
+
+    :param dialect: Dialect of the target connection.
+    :param table: Target table.
+    :param index_elements: Names of the columns of the conflicting unique
+        index.
+    :param update_columns: Names of the columns to overwrite with the inserted
+        values on conflict.
+    :param where: Optional callback that takes the table and the ``excluded``
+        pseudo-table and returns the condition for the update. Rows that don't
+        match it are left untouched.
+    """
+    insert = _inserts.get(dialect.name)
+    if not insert:
+        raise CompileError(f"Upserts are not supported on the {dialect.name} dialect")
+
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: stmt.excluded[column] for column in update_columns},
+        where=where(table, stmt.excluded) if where else None,
+    )
+
+
+_read_only_statements = {
+    "sqlite": "PRAGMA query_only = ON",
+    "postgresql": "SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY",
+}
+
+
+def make_read_only(engine: Engine):
+    """
+    Make all the connections of an engine reject writes, for processes (e.g.
+    the API workers) that should only read the data written by the crawler.
+    """
+    statement = _read_only_statements.get(engine.dialect.name)
+    if not statement:
+        raise CompileError(
+            f"Read-only connections are not supported on the {engine.dialect.name} dialect"
+        )
+
+    @event.listens_for(engine, "connect")
+    def _set_read_only(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+        # Drivers that implicitly begin a transaction would roll the setting
+        # back when the connection is returned to the pool
+        dbapi_connection.commit()
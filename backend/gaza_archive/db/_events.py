@@ -0,0 +1,74 @@
+from abc import ABC
+from logging import getLogger
+from threading import Lock
+from typing import Callable, Sequence
+
+from pydantic import BaseModel
+
+log = getLogger(__name__)
+
+# Types of the events published when new data is committed, and their items:
+# - ``post``: new posts (:class:`gaza_archive.model.Post`)
+# - ``media``: new attachments (:class:`gaza_archive.model.Media`)
+# - ``donation``: new donations (:class:`gaza_archive.model.CampaignDonation`)
+# - ``account_state``: account state changes
+#   (:class:`gaza_archive.model.suspension.AccountSuspensionStateAudit`)
+event_types = ("post", "media", "donation", "account_state")
+
+# Receives the type of an event and its items
+EventListener = Callable[[str, Sequence[BaseModel]], None]
+
+
+class Events(ABC):
+    """
+    In-process notifications of the newly committed data, e.g. for the API
+    event stream.
+
+    Only the listeners of the process that writes the data are notified: API
+    workers running in other processes don't get any events.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._listeners: list[EventListener] = []
+        self._listeners_lock = Lock()
+        super().__init__(*args, **kwargs)
+
+    def subscribe(self, listener: EventListener):
+        """
+        Register a listener of the new data.
+
+        Listeners are called synchronously by the writer, on its thread and
+        after the commit, so they should return quickly - e.g. by queueing
+        the items rather than processing them.
+        """
+        with self._listeners_lock:
+            if listener not in self._listeners:
+                self._listeners = [*self._listeners, listener]
+
+    def unsubscribe(self, listener: EventListener):
+        with self._listeners_lock:
+            self._listeners = [item for item in self._listeners if item != listener]
+
+    @property
+    def has_listeners(self) -> bool:
+        """
+        Whether any listener is registered, so the writers can skip the work
+        needed to build events that nobody receives.
+        """
+        return bool(self._listeners)
+
+    def _publish(self, event_type: str, items: Sequence[BaseModel]):
+        """
+        Notify the listeners of new data. It must be called after the commit,
+        and errors of the listeners are logged rather than raised, so they
+        can't fail the writes.
+        """
+        if not items:
+            return
+
+        # The list is replaced rather than changed, so it can be read unlocked
+        for listener in self._listeners:
+            try:
+                listener(event_type, items)
+            except Exception as e:
+                log.exception("Error in the %s event listener: %s", event_type, e)
@@ -2,12 +2,23 @@ from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from logging import getLogger
 from threading import RLock
-from typing import Iterator
+from typing import Any, Collection, Iterator
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Query, Session, contains_eager, joinedload
 
 from ..model import Account, Media as MediaModel
 from ._model import Account as DbAccount, Media as DbMedia, Post as DbPost
+from ._projections import (
+    AccountDicts,
+    FqnCache,
+    account_columns,
+    media_columns,
+    media_dict,
+    media_export_columns,
+    media_path,
+    post_columns,
+    post_dict,
+)
 
 log = getLogger(__name__)
 
@@ -33,26 +44,142 @@ class Media(ABC):
         offset: int | None = None,
     ) -> list[MediaModel]:
         with self.get_session() as session:
-            query = session.query(DbMedia).join(DbPost, DbMedia.post_url == DbPost.url)
-
-            if account is not None:
-                query = query.join(
-                    DbAccount, DbAccount.url == DbPost.author_url
-                ).filter(DbAccount.url == Account.to_url(account))
-            if min_id is not None:
-                query = query.filter(DbMedia.id > min_id)
-            if max_id is not None:
-                query = query.filter(DbMedia.id < max_id)
-
-            query = query.order_by(DbPost.created_at.desc())
-            if limit is not None:
-                query = query.limit(limit)
-            if offset is not None:
-                query = query.offset(offset)
+            query = self._filter_attachments(
+                session.query(DbMedia)
+                .join(DbPost, DbMedia.post_url == DbPost.url)
+                .options(contains_eager(DbMedia.post).joinedload(DbPost.author)),
+                min_id=min_id,
+                max_id=max_id,
+                account=account,
+                limit=limit,
+                offset=offset,
+            )
 
             return [attachment.to_model() for attachment in query.all()]
 
+    def get_attachment_dicts(
+        self,
+        *,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        account: str | None = None,
+        urls: Collection[str] | None = None,
+        ids: Collection[str] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Same as :meth:`get_attachments`, but it only selects the columns needed
+        by the API and returns plain dicts with the same shape as serialized
+        :class:`MediaModel` objects.
+
+        :param urls: Only return the attachments with these URLs.
+        :param ids: Only return the attachments with these IDs.
+        """
+        with self.get_session() as session:
+            query = self._filter_attachments(
+                session.query(*media_columns, *post_columns, *account_columns)
+                .join(DbPost, DbMedia.post_url == DbPost.url)
+                .join(DbAccount, DbAccount.url == DbPost.author_url),
+                min_id=min_id,
+                max_id=max_id,
+                account=account,
+                urls=urls,
+                ids=ids,
+                limit=limit,
+                offset=offset,
+            )
+
+            n_media_cols = len(media_columns)
+            n_post_cols = len(post_columns)
+            authors = AccountDicts()
+            posts: dict[str, dict[str, Any]] = {}
+            attachments = []
+
+            for row in query:
+                post_row = row[n_media_cols : n_media_cols + n_post_cols]
+                post = posts.get(post_row[0])
+                if post is None:
+                    author = authors.get(row[n_media_cols + n_post_cols :])
+                    post = posts[post_row[0]] = post_dict(post_row, author)
+
+                attachments.append(media_dict(row, post))
+
+            return attachments
+
+    def iter_attachment_rows(
+        self,
+        *,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        account: str | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Stream all the attachments matching the filters as flat rows (see
+        :data:`media_export_columns`), fetching ``batch_size`` rows at a time
+        through a server-side cursor where supported.
+        """
+        with self.get_session() as session:
+            query = self._filter_attachments(
+                session.query(*media_export_columns.values()).join(
+                    DbPost, DbMedia.post_url == DbPost.url
+                ),
+                min_id=min_id,
+                max_id=max_id,
+                account=account,
+                limit=limit,
+                offset=offset,
+            )
+
+            fields = tuple(media_export_columns)
+            fqns = FqnCache()
+            for row in query.yield_per(batch_size):
+                media = dict(zip(fields, row))
+                media["path"] = media_path(
+                    fqns.get(media["author_url"]), media["id"], media["url"]
+                )
+                yield media
+
+    @staticmethod
+    def _filter_attachments(
+        query: Query,
+        *,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        account: str | None = None,
+        urls: Collection[str] | None = None,
+        ids: Collection[str] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> Query:
+        if account is not None:
+            query = query.filter(DbPost.author_url == Account.to_url(account))
+        if urls is not None:
+            query = query.filter(DbMedia.url.in_(urls))
+        if ids is not None:
+            query = query.filter(DbMedia.id.in_(ids))
+        if min_id is not None:
+            query = query.filter(DbMedia.id > min_id)
+        if max_id is not None:
+            query = query.filter(DbMedia.id < max_id)
+
+        query = query.order_by(DbPost.created_at.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        if offset is not None:
+            query = query.offset(offset)
+
+        return query
+
     def get_attachment(self, url: str) -> MediaModel | None:
         with self.get_session() as session:
-            db_media = session.query(DbMedia).filter(DbMedia.url == url).one_or_none()
+            db_media = (
+                session.query(DbMedia)
+                .options(joinedload(DbMedia.post).joinedload(DbPost.author))
+                .filter(DbMedia.url == url)
+                .one_or_none()
+            )
             return db_media.to_model() if db_media else None
@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from itertools import batched
+from logging import getLogger
+from threading import RLock
+from typing import Iterable, Iterator
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session
+
+from ..model import ApiSortType, MediaFile
+from ._model import MediaFile as DbMediaFile
+
+log = getLogger(__name__)
+
+# Fields that the media directory listings can be sorted by
+media_file_sort_fields = ("name", "size", "mtime", "type")
+
+
+class MediaFiles(ABC):
+    """
+    Database interface for the media manifest.
+    """
+
+    _write_lock: RLock
+
+    @abstractmethod
+    @contextmanager
+    def get_session(self) -> Iterator[Session]: ...
+
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
+    def save_media_file(self, media_file: MediaFile):
+        """
+        Add a downloaded file to the manifest, or update it.
+        """
+        with self._write_lock, self.get_session() as session:
+            session.merge(DbMediaFile(**DbMediaFile.values(media_file)))
+            self._bump_data_version(session, "media_files")
+            session.commit()
+
+    def replace_media_files(
+        self, media_files: Iterable[MediaFile], batch_size: int = 1000
+    ) -> int:
+        """
+        Replace the whole manifest, e.g. with the result of a scan of the
+        media storage.
+
+        The content hashes of the files that haven't changed since they were
+        recorded are preserved, as a scan doesn't compute them.
+
+        :return: The number of files in the new manifest.
+        """
+        count = 0
+        with self._write_lock, self.get_session() as session:
+            hashes = {
+                (path, size, mtime): sha256
+                for path, size, mtime, sha256 in session.query(
+                    DbMediaFile.path,
+                    DbMediaFile.size,
+                    DbMediaFile.mtime,
+                    DbMediaFile.sha256,
+                ).filter(DbMediaFile.sha256.is_not(None))
+            }
+
+            session.execute(delete(DbMediaFile))
+            for batch in batched(media_files, batch_size):
+                for media_file in batch:
+                    if not media_file.sha256:
+                        media_file.sha256 = hashes.get(
+                            (media_file.path, media_file.size, media_file.mtime)
+                        )
+
+                session.execute(
+                    insert(DbMediaFile),
+                    [DbMediaFile.values(media_file) for media_file in batch],
+                )
+                count += len(batch)
+
+            self._bump_data_version(session, "media_files")
+            session.commit()
+
+        return count
+
+    def has_media_files(self) -> bool:
+        """
+        :return: Whether the manifest has any files.
+        """
+        with self.get_session() as session:
+            return session.query(DbMediaFile.path).first() is not None
+
+    def get_media_file(self, path: str) -> MediaFile | None:
+        """
+        :param path: Path of the file, relative to the media directory.
+        :return: The manifest entry of the file, if it's recorded.
+        """
+        with self.get_session() as session:
+            db_file = session.get(DbMediaFile, path)
+            return db_file.to_model() if db_file else None
+
+    def get_media_directory(
+        self,
+        directory: str,
+        *,
+        sort: str = "name",
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> tuple[list[MediaFile], int] | None:
+        """
+        List a directory of the media storage from the manifest.
+
+        Subdirectories come first, with the total size and the latest
+        modification time of the files under them, followed by the files.
+
+        :param directory: Path of the directory, relative to the media
+            directory (``""`` for the root).
+        :param sort: Sort field (see :data:`media_file_sort_fields`),
+            optionally followed by ``:desc``.
+        :param limit: Maximum number of entries to return.
+        :param offset: Number of entries to skip.
+        :return: A ``(entries, total)`` tuple, where ``total`` is the number of
+            entries of the directory, or None if the directory doesn't exist.
+        :raises ValueError: If the sort field is invalid.
+        """
+        field, sort_type = ApiSortType.parse(sort)
+        if field not in media_file_sort_fields:
+            raise ValueError(f"Invalid sort field: {field}")
+
+        descending = sort_type == ApiSortType.DESC
+        prefix = f"{directory}/" if directory else ""
+        offset = offset or 0
+
+        with self.get_session() as session:
+            # Files in subdirectories at any depth, grouped by directory. It's
+            # a range rather than a LIKE, so it can use the directory index
+            subdirs_query = session.query(
+                DbMediaFile.directory,
+                func.sum(DbMediaFile.size),
+                func.max(DbMediaFile.mtime),
+            )
+            if prefix:
+                subdirs_query = subdirs_query.filter(
+                    DbMediaFile.directory >= prefix,
+                    # "0" is the character after "/"
+                    DbMediaFile.directory < f"{directory}0",
+                )
+            else:
+                subdirs_query = subdirs_query.filter(DbMediaFile.directory != "")
+
+            subdirs: dict[str, MediaFile] = {}
+            for subdir, size, mtime in subdirs_query.group_by(DbMediaFile.directory):
+                name = subdir[len(prefix) :].split("/", 1)[0]
+                entry = subdirs.get(name)
+                if entry is None:
+                    subdirs[name] = MediaFile(
+                        path=prefix + name, size=size, mtime=mtime, is_dir=True
+                    )
+                else:
+                    entry.size += size
+                    entry.mtime = max(entry.mtime, mtime)
+
+            files_query = session.query(DbMediaFile).filter(
+                DbMediaFile.directory == directory
+            )
+            n_files = files_query.count()
+            if directory and not (subdirs or n_files):
+                return None
+
+            dirs = sorted(
+                subdirs.values(),
+                key=lambda entry: (
+                    getattr(entry, field) if field in ("size", "mtime") else entry.name
+                ),
+                reverse=descending,
+            )
+            entries = dirs[offset : offset + limit if limit is not None else None]
+
+            if limit is None or len(entries) < limit:
+                column = getattr(DbMediaFile, field)
+                files_query = files_query.order_by(
+                    column.desc() if descending else column.asc(),
+                    DbMediaFile.name,
+                )
+                files_offset = max(offset - len(dirs), 0)
+                if files_offset:
+                    files_query = files_query.offset(files_offset)
+                if limit is not None:
+                    files_query = files_query.limit(limit - len(entries))
+
+                entries += [db_file.to_model() for db_file in files_query]
+
+            return entries, len(dirs) + n_files
@@ -2,14 +2,16 @@ import json
 from datetime import datetime, timezone
 
 from sqlalchemy import (
+    JSON,
+    BigInteger,
     Boolean,
     Column,
     DateTime,
     Enum as SqlEnum,
     Float,
     ForeignKey,
+    Index,
     Integer,
-    JSON,
     String,
     Table,
     Text,
@@ -23,6 +25,7 @@ from ..model import (
     Campaign as ModelCampaign,
     CampaignDonation as ModelCampaignDonation,
     Media as ModelMedia,
+    MediaFile as ModelMediaFile,
     Post as ModelPost,
 )
 from ..model.suspension import (
@@ -228,6 +231,49 @@ class Media(Base):
         )
 
 
+class MediaFile(Base):
+    """
+    SQLAlchemy model for the media manifest: the files downloaded to the
+    media storage, so they can be listed without walking the filesystem.
+    """
+
+    __tablename__ = "media_files"
+    __table_args__ = (Index("ix_media_files_directory_name", "directory", "name"),)
+
+    # Path relative to the media directory
+    path = Column(String, primary_key=True)
+    directory = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    type = Column(String, nullable=True)
+    mtime = Column(DateTime, nullable=False)
+    sha256 = Column(String(64), nullable=True)
+
+    @classmethod
+    def values(cls, model: ModelMediaFile) -> dict:
+        """
+        :return: The column values of a file, for bulk inserts.
+        """
+        return {
+            "path": model.path,
+            "directory": model.directory,
+            "name": model.name,
+            "size": model.size,
+            "type": model.type,
+            "mtime": model.mtime,
+            "sha256": model.sha256,
+        }
+
+    def to_model(self) -> ModelMediaFile:
+        return ModelMediaFile(
+            path=self.path,  # type: ignore
+            size=self.size,  # type: ignore
+            mtime=self.mtime,  # type: ignore
+            type=self.type,  # type: ignore
+            sha256=self.sha256,  # type: ignore
+        )
+
+
 class ExchangeRate(Base):
     """SQLAlchemy model for exchange rates cache."""
 
@@ -344,14 +390,46 @@ class BotState(Base):
 
     bot_name = Column(String, primary_key=True)
     last_updated_at = Column(DateTime, default=utcnow, index=True)
+    # URL of the bot's Mastodon account, as verified by the crawler, so the
+    # API can show it without talking to the instance
+    account_url = Column(String, nullable=True)
 
     def to_model(self) -> ModelBotState:
         return ModelBotState(
             bot_name=self.bot_name,  # type: ignore
             last_updated_at=self.last_updated_at,  # type: ignore
+            account_url=self.account_url,  # type: ignore
         )
 
 
+class DataVersion(Base):
+    """
+    SQLAlchemy model for the version counters of the stored data.
+
+    Each scope (e.g. ``posts``) is bumped by the writes that change its data,
+    so readers can tell whether anything changed without querying the data.
+    """
+
+    __tablename__ = "data_versions"
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=utcnow)
+
+
+class SchemaVersion(Base):
+    """
+    SQLAlchemy model for the version of the schema of the database, with a
+    single row, so the migrations are only checked when it's out of date.
+    """
+
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+
 class AccountSuspensionState(Base):
     """SQLAlchemy model for account suspension states."""
 
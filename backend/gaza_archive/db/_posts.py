@@ -2,13 +2,22 @@ from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from logging import getLogger
 from threading import RLock
-from typing import Iterator
+from typing import Any, Collection, Iterator, Sequence
 
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, Session, joinedload
 
-from ..model import Account, Post
+from ..model import Account, Media, Post, api_is_url
 from ._model import Account as DbAccount, Media as DbMedia, Post as DbPost
+from ._projections import (
+    AccountDicts,
+    account_columns,
+    media_columns,
+    media_dict,
+    post_columns,
+    post_dict,
+    post_export_columns,
+)
 
 log = getLogger(__name__)
 
@@ -24,6 +33,12 @@ class Posts(ABC):
     @contextmanager
     def get_session(self) -> Iterator[Session]: ...
 
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
+    @abstractmethod
+    def _publish(self, event_type: str, items: Sequence[BaseModel]): ...
+
     def get_posts(
         self,
         *,
@@ -35,27 +50,18 @@ class Posts(ABC):
         offset: int | None = None,
     ) -> list[Post]:
         with self.get_session() as session:
-            query = session.query(DbPost, DbMedia).outerjoin(
-                DbMedia, DbMedia.post_url == DbPost.url
+            query = self._filter_posts(
+                session.query(DbPost, DbMedia)
+                .outerjoin(DbMedia, DbMedia.post_url == DbPost.url)
+                .options(joinedload(DbPost.author)),
+                exclude_replies=exclude_replies,
+                min_id=min_id,
+                max_id=max_id,
+                account=account,
+                limit=limit,
+                offset=offset,
             )
 
-            if account is not None:
-                query = query.join(
-                    DbAccount, DbAccount.url == DbPost.author_url
-                ).filter(DbAccount.url == Account.to_url(account))
-            if min_id is not None:
-                query = query.filter(DbPost.id > min_id)
-            if max_id is not None:
-                query = query.filter(DbPost.id < max_id)
-            if exclude_replies:
-                query = query.filter(DbPost.in_reply_to_id.is_(None))
-
-            query = query.order_by(DbPost.created_at.desc())
-            if limit is not None:
-                query = query.limit(limit)
-            if offset is not None:
-                query = query.offset(offset)
-
             db_posts = query.all()
             posts: dict[str, Post] = {}
 
@@ -67,14 +73,147 @@ class Posts(ABC):
 
             return list(posts.values())
 
+    def get_post_dicts(
+        self,
+        *,
+        exclude_replies: bool = False,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        account: str | None = None,
+        urls: Collection[str] | None = None,
+        ids: Collection[str] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Same as :meth:`get_posts`, but it only selects the columns needed by
+        the API and returns plain dicts with the same shape as serialized
+        :class:`Post` objects, without building ORM or pydantic objects.
+
+        :param urls: Only return the posts with these URLs.
+        :param ids: Only return the posts with these IDs.
+        """
+        with self.get_session() as session:
+            query = self._filter_posts(
+                session.query(*post_columns, *account_columns, *media_columns)
+                .join(DbAccount, DbAccount.url == DbPost.author_url)
+                .outerjoin(DbMedia, DbMedia.post_url == DbPost.url),
+                exclude_replies=exclude_replies,
+                min_id=min_id,
+                max_id=max_id,
+                account=account,
+                urls=urls,
+                ids=ids,
+                limit=limit,
+                offset=offset,
+            )
+
+            n_post_cols = len(post_columns)
+            n_account_cols = len(account_columns)
+            authors = AccountDicts()
+            posts: dict[str, dict[str, Any]] = {}
+            media_parents: dict[str, dict[str, Any]] = {}
+
+            for row in query:
+                post_url = row[0]
+                post = posts.get(post_url)
+                if post is None:
+                    author = authors.get(
+                        row[n_post_cols : n_post_cols + n_account_cols]
+                    )
+                    post = posts[post_url] = post_dict(row, author)
+
+                media_row = row[n_post_cols + n_account_cols :]
+                if media_row[0] is not None:
+                    parent = media_parents.get(post_url)
+                    if parent is None:
+                        parent = media_parents[post_url] = {
+                            **post,
+                            "attachments": [],
+                        }
+                    post["attachments"].append(media_dict(media_row, parent))
+
+            return list(posts.values())
+
+    def iter_post_rows(
+        self,
+        *,
+        exclude_replies: bool = False,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        account: str | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Stream all the posts matching the filters as flat rows (see
+        :data:`post_export_columns`), fetching ``batch_size`` rows at a time
+        through a server-side cursor where supported.
+        """
+        with self.get_session() as session:
+            query = self._filter_posts(
+                session.query(*post_export_columns.values()),
+                exclude_replies=exclude_replies,
+                min_id=min_id,
+                max_id=max_id,
+                account=account,
+                limit=limit,
+                offset=offset,
+            )
+
+            fields = tuple(post_export_columns)
+            for row in query.yield_per(batch_size):
+                yield dict(zip(fields, row))
+
+    @staticmethod
+    def _filter_posts(
+        query: Query,
+        *,
+        exclude_replies: bool = False,
+        min_id: int | None = None,
+        max_id: int | None = None,
+        account: str | None = None,
+        urls: Collection[str] | None = None,
+        ids: Collection[str] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> Query:
+        if account is not None:
+            query = query.filter(DbPost.author_url == Account.to_url(account))
+        if urls is not None:
+            query = query.filter(DbPost.url.in_(urls))
+        if ids is not None:
+            query = query.filter(DbPost.id.in_(ids))
+        if min_id is not None:
+            query = query.filter(DbPost.id > min_id)
+        if max_id is not None:
+            query = query.filter(DbPost.id < max_id)
+        if exclude_replies:
+            query = query.filter(DbPost.in_reply_to_id.is_(None))
+
+        query = query.order_by(DbPost.created_at.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        if offset is not None:
+            query = query.offset(offset)
+
+        return query
+
     def get_post(self, post: str) -> Post | None:
+        """
+        :param post: URL or ID of the post.
+        """
         posts = {}
+        # Separate filters, so each lookup can use its own index
+        key = DbPost.url if api_is_url(post) else DbPost.id
 
         with self.get_session() as session:
             records = (
                 session.query(DbPost, DbMedia)
                 .outerjoin(DbMedia, DbMedia.post_url == DbPost.url)
-                .filter(or_(DbPost.url == post, DbPost.id == post))
+                .options(joinedload(DbPost.author))
+                .filter(key == post)
                 .all()
             )
 
@@ -115,6 +254,8 @@ class Posts(ABC):
                     .all()
                 }
 
+            new_posts: list[Post] = []
+            new_media: list[Media] = []
             for post in posts:
                 if post.url not in db_posts:
                     log.info(
@@ -123,10 +264,17 @@ class Posts(ABC):
                         post.url,
                     )
                     session.add(DbPost.from_model(post))
+                    new_posts.append(post)
 
                     for media in post.attachments:
                         if media.url not in existing_media_urls:
                             session.add(DbMedia.from_model(media))
                             existing_media_urls.add(media.url)
+                            new_media.append(media)
 
+            if session.new:
+                self._bump_data_version(session, "posts")
             session.commit()
+
+        self._publish("post", new_posts)
+        self._publish("media", new_media)
@@ -0,0 +1,224 @@
+from typing import Any, Sequence
+
+from ..model import Account as ModelAccount, derivative_path
+from ._model import (
+    Account as DbAccount,
+    CampaignDonation as DbCampaignDonation,
+    Media as DbMedia,
+    Post as DbPost,
+)
+
+# Columns selected by the read-only fast paths. Rows are unpacked positionally,
+# so keep the order in sync with the builders below.
+account_columns = (
+    DbAccount.url,
+    DbAccount.id,
+    DbAccount.display_name,
+    DbAccount.avatar_url,
+    DbAccount.header_url,
+    DbAccount.campaign_url,
+    DbAccount.profile_note,
+    DbAccount.profile_fields,
+    DbAccount.created_at,
+    DbAccount.instance_down_since,
+    DbAccount.source_removed_since,
+)
+
+post_columns = (
+    DbPost.url,
+    DbPost.id,
+    DbPost.content,
+    DbPost.in_reply_to_id,
+    DbPost.in_reply_to_account_id,
+    DbPost.quote,
+    DbPost.created_at,
+    DbPost.updated_at,
+)
+
+media_columns = (
+    DbMedia.url,
+    DbMedia.id,
+    DbMedia.type,
+    DbMedia.description,
+)
+
+
+# Columns of the bulk exports, by field name. Related objects (e.g. the author
+# of a post) are referenced by URL, so the rows are flat and fit CSV and
+# Parquet files as well as NDJSON.
+account_export_columns = {
+    "url": DbAccount.url,
+    "id": DbAccount.id,
+    "display_name": DbAccount.display_name,
+    "avatar_url": DbAccount.avatar_url,
+    "header_url": DbAccount.header_url,
+    "campaign_url": DbAccount.campaign_url,
+    "profile_note": DbAccount.profile_note,
+    "profile_fields": DbAccount.profile_fields,
+    "created_at": DbAccount.created_at,
+    "instance_down_since": DbAccount.instance_down_since,
+    "source_removed_since": DbAccount.source_removed_since,
+}
+
+post_export_columns = {
+    "url": DbPost.url,
+    "id": DbPost.id,
+    "author_url": DbPost.author_url,
+    "content": DbPost.content,
+    "in_reply_to_id": DbPost.in_reply_to_id,
+    "in_reply_to_account_id": DbPost.in_reply_to_account_id,
+    "quote": DbPost.quote,
+    "created_at": DbPost.created_at,
+    "updated_at": DbPost.updated_at,
+}
+
+media_export_columns = {
+    "url": DbMedia.url,
+    "id": DbMedia.id,
+    "type": DbMedia.type,
+    "description": DbMedia.description,
+    "post_url": DbMedia.post_url,
+    "author_url": DbPost.author_url,
+    "post_created_at": DbPost.created_at,
+}
+
+donation_export_columns = {
+    "id": DbCampaignDonation.id,
+    "campaign_url": DbCampaignDonation.campaign_url,
+    "account_url": DbAccount.url,
+    "amount": DbCampaignDonation.amount,
+    "donor": DbCampaignDonation.donor,
+    "created_at": DbCampaignDonation.created_at,
+}
+
+# Python types of the exported fields, including the computed ones
+export_fields: dict[str, dict[str, type]] = {
+    "accounts": {
+        **{
+            name: column.type.python_type
+            for name, column in account_export_columns.items()
+        },
+        "fqn": str,
+    },
+    "posts": {
+        name: column.type.python_type for name, column in post_export_columns.items()
+    },
+    "media": {
+        **{
+            name: column.type.python_type
+            for name, column in media_export_columns.items()
+        },
+        "path": str,
+    },
+    "donations": {
+        **{
+            name: column.type.python_type
+            for name, column in donation_export_columns.items()
+        },
+        "currency": str,
+    },
+}
+
+
+class FqnCache:
+    """
+    Caches the FQNs of the accounts (``@user@instance``) by URL, for the
+    queries that only select the account URL.
+    """
+
+    def __init__(self):
+        self._fqns: dict[str, str] = {}
+
+    def get(self, url: str) -> str:
+        fqn = self._fqns.get(url)
+        if fqn is None:
+            fqn = self._fqns[url] = ModelAccount(url=url).fqn
+
+        return fqn
+
+
+def media_path(author_fqn: str, media_id: str, url: str) -> str:
+    """
+    :return: Path of a stored attachment, relative to the server root.
+    """
+    return f"/media/{author_fqn}/{media_id}.{url.split('.')[-1]}"
+
+
+class AccountDicts:
+    """
+    Builds the serialized form of accounts from projected rows.
+
+    The computed fields (``fqn``, ``avatar_path``, ``api_url``...) are only
+    derived once per account and reused for every row of the same query.
+    """
+
+    def __init__(self):
+        self._accounts: dict[str, dict[str, Any]] = {}
+
+    def get(self, row: Sequence[Any]) -> dict[str, Any]:
+        """
+        :param row: Values of :data:`account_columns`, in the same order.
+        :return: The account as a JSON-compatible dict, with the same shape
+            as a serialized :class:`gaza_archive.model.Account`.
+        """
+        url = row[0]
+        account = self._accounts.get(url)
+        if account is None:
+            account = self._accounts[url] = ModelAccount(
+                url=url,
+                id=row[1],
+                display_name=row[2],
+                avatar_url=row[3],
+                header_url=row[4],
+                campaign_url=row[5],
+                profile_note=row[6],
+                profile_fields=row[7] or {},
+                created_at=row[8],
+                instance_down_since=row[9],
+                source_removed_since=row[10],
+            ).model_dump(mode="json")
+
+        return account
+
+
+def post_dict(row: Sequence[Any], author: dict[str, Any]) -> dict[str, Any]:
+    """
+    :param row: Values of :data:`post_columns`, in the same order.
+    :param author: Serialized author of the post.
+    :return: The post as a dict with the same shape as a serialized
+        :class:`gaza_archive.model.Post`.
+    """
+    return {
+        "url": row[0],
+        "id": row[1],
+        "author": author,
+        "content": row[2],
+        "in_reply_to_id": row[3],
+        "in_reply_to_account_id": row[4],
+        "quote": row[5],
+        "attachments": [],
+        "created_at": row[6],
+        "updated_at": row[7],
+    }
+
+
+def media_dict(row: Sequence[Any], post: dict[str, Any]) -> dict[str, Any]:
+    """
+    :param row: Values of :data:`media_columns`, in the same order.
+    :param post: Serialized parent post (without attachments).
+    :return: The media as a dict with the same shape as a serialized
+        :class:`gaza_archive.model.Media`.
+    """
+    url = row[0]
+    path = media_path(post["author"]["fqn"], row[1], url)
+    is_image = row[2] == "image"
+    return {
+        "url": url,
+        "id": row[1],
+        "type": row[2],
+        "post": post,
+        "description": row[3],
+        "path": path,
+        "thumbnail_path": derivative_path(path, "thumb") if is_image else None,
+        "preview_path": derivative_path(path, "preview") if is_image else None,
+    }
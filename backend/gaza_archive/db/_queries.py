@@ -0,0 +1,293 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from time import monotonic, perf_counter
+from typing import Any, Iterator
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import DBAPIError
+
+from ..errors import QueryTimeoutError, QueryTooLargeError
+
+log = getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Counts the SQL statements executed on an engine within a context (e.g. an
+    API request).
+    """
+
+    _current: ContextVar["QueryCounter | None"] = ContextVar(
+        "query_counter", default=None
+    )
+
+    def __init__(self, parent: "QueryCounter | None" = None):
+        """
+        :param parent: The counter of the enclosing context, if any, which
+            also counts the statements of this one.
+        """
+        self.count = 0
+        self.parent = parent
+
+    @classmethod
+    def install(cls, engine: Engine):
+        """
+        Register the statement listener on an engine.
+        """
+        event.listen(engine, "before_cursor_execute", cls._on_execute)
+
+    @classmethod
+    @contextmanager
+    def track(cls) -> Iterator["QueryCounter"]:
+        """
+        Count the statements executed within this context.
+
+        The counter is shared with any thread or task spawned from this context
+        (e.g. FastAPI's threadpool for sync routes). The statements are also
+        counted by the enclosing contexts, if any.
+        """
+        counter = cls(parent=cls._current.get())
+        token = cls._current.set(counter)
+        try:
+            yield counter
+        finally:
+            cls._current.reset(token)
+
+    @classmethod
+    def _on_execute(cls, *_, **__):
+        counter = cls._current.get()
+        while counter is not None:
+            counter.count += 1
+            counter = counter.parent
+
+
+class QueryBudget:
+    """
+    Time and size budget of the SQL statements executed within a context
+    (e.g. an expensive API query).
+
+    The time budget is enforced by the database: statements still running
+    when it runs out are interrupted through a progress handler on SQLite,
+    and through ``statement_timeout`` on PostgreSQL.
+    """
+
+    _current: ContextVar["QueryBudget | None"] = ContextVar(
+        "query_budget", default=None
+    )
+
+    # Number of SQLite virtual machine instructions between two checks of the
+    # deadline
+    sqlite_progress_interval = 10_000
+
+    def __init__(self, timeout: float | None, max_rows: int | None = None):
+        """
+        :param timeout: Time budget of all the statements, in seconds, or
+            None for no time limit.
+        :param max_rows: Maximum number of rows that a query may return (see
+            :meth:`row_limit` and :meth:`check_rows`), or None for no limit.
+        """
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.deadline = monotonic() + timeout if timeout else None
+
+    @property
+    def remaining(self) -> float | None:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - monotonic(), 0)
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and monotonic() >= self.deadline
+
+    @classmethod
+    def install(cls, engine: Engine):
+        """
+        Register the listeners that enforce the time budget on an engine.
+        """
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", cls._on_sqlite_connect)
+        elif engine.dialect.name == "postgresql":
+            event.listen(engine, "before_cursor_execute", cls._on_postgresql_execute)
+        else:
+            log.warning(
+                "Query time budgets are not supported on the %s dialect",
+                engine.dialect.name,
+            )
+
+    @classmethod
+    @contextmanager
+    def limit(
+        cls, timeout: float | None, max_rows: int | None = None
+    ) -> Iterator["QueryBudget"]:
+        """
+        Enforce a budget on the statements executed within this context.
+
+        :param timeout: Time budget, in seconds.
+        :param max_rows: Maximum number of rows of a query.
+        :raises QueryTimeoutError: If a statement is interrupted because the
+            time budget ran out.
+        """
+        budget = cls(timeout, max_rows=max_rows)
+        token = cls._current.set(budget)
+        try:
+            yield budget
+        except DBAPIError as e:
+            if not budget.expired:
+                raise
+
+            raise QueryTimeoutError(
+                f"The query took longer than {budget.timeout:g} seconds", e
+            ) from e
+        finally:
+            cls._current.reset(token)
+
+    @classmethod
+    def row_limit(cls, limit: int | None) -> int | None:
+        """
+        :param limit: The limit requested for a query, if any.
+        :return: The limit to apply to the query: the requested one, capped
+            to one row more than the budget allows, so :meth:`check_rows` can
+            tell whether the result was truncated.
+        """
+        budget = cls._current.get()
+        if budget is None or budget.max_rows is None:
+            return limit
+        if limit is None:
+            return budget.max_rows + 1
+        return min(limit, budget.max_rows + 1)
+
+    @classmethod
+    def check_rows(cls, count: int):
+        """
+        :param count: Number of rows returned by a query limited through
+            :meth:`row_limit`.
+        :raises QueryTooLargeError: If there are more rows than the budget
+            allows.
+        """
+        budget = cls._current.get()
+        if budget and budget.max_rows is not None and count > budget.max_rows:
+            raise QueryTooLargeError(
+                f"The query returns more than {budget.max_rows} rows. "
+                "Narrow down the filters or set a lower limit",
+                max_rows=budget.max_rows,
+            )
+
+    @classmethod
+    def _on_sqlite_connect(cls, dbapi_connection, _):
+        def check_deadline() -> int:
+            budget = cls._current.get()
+            # A non-zero value interrupts the statement
+            return int(budget is not None and budget.expired)
+
+        dbapi_connection.set_progress_handler(
+            check_deadline, cls.sqlite_progress_interval
+        )
+
+    @classmethod
+    def _on_postgresql_execute(cls, _conn, cursor, *_, **__):
+        budget = cls._current.get()
+        remaining = budget.remaining if budget else None
+        if remaining is None:
+            return
+
+        # Executed on the raw cursor, so it doesn't go through the listeners.
+        # It only lasts until the end of the transaction. 0 would disable it.
+        timeout_ms = max(int(remaining * 1000), 1)
+        cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+class SlowQueryLog:
+    """
+    Logs the SQL statements that take longer than a threshold, with their
+    parameters and their query plan.
+    """
+
+    _explain_statements = {
+        "sqlite": "EXPLAIN QUERY PLAN ",
+        "postgresql": "EXPLAIN ",
+    }
+
+    def __init__(self, threshold: float):
+        """
+        :param threshold: Minimum duration of the logged statements, in
+            seconds.
+        """
+        self.threshold = threshold
+
+    def install(self, engine: Engine):
+        """
+        Register the timing listeners on an engine.
+        """
+        event.listen(engine, "before_cursor_execute", self._on_before_execute)
+        event.listen(engine, "after_cursor_execute", self._on_after_execute)
+        event.listen(engine, "handle_error", self._on_error)
+
+    @staticmethod
+    def _on_before_execute(conn, *_, **__):
+        conn.info.setdefault("query_start_time", []).append(perf_counter())
+
+    def _on_after_execute(
+        self, conn, _cursor, statement, parameters, _context, executemany
+    ):
+        elapsed = perf_counter() - conn.info["query_start_time"].pop()
+        if elapsed >= self.threshold and not executemany:
+            self._log(conn, statement, parameters, elapsed)
+
+    def _on_error(self, context):
+        conn = context.connection
+        start_times = conn.info.get("query_start_time") if conn else None
+        if not start_times:
+            return
+
+        elapsed = perf_counter() - start_times.pop()
+        if (
+            elapsed >= self.threshold
+            and context.execution_context is not None
+            and not context.execution_context.executemany
+        ):
+            self._log(
+                conn,
+                context.statement,
+                context.parameters,
+                elapsed,
+                error=context.original_exception,
+            )
+
+    def _explain(self, conn, statement: str, parameters: Any) -> str:
+        explain = self._explain_statements.get(conn.dialect.name)
+        if not explain or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return "n/a"
+
+        # The plan is computed outside of any time budget
+        token = QueryBudget._current.set(None)
+        explain_cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            explain_cursor.execute(explain + statement, parameters)
+            return "\n".join(
+                str(row[-1] if conn.dialect.name == "sqlite" else row[0])
+                for row in explain_cursor.fetchall()
+            )
+        except Exception as e:
+            return f"unavailable ({e})"
+        finally:
+            explain_cursor.close()
+            QueryBudget._current.reset(token)
+
+    def _log(
+        self,
+        conn,
+        statement: str,
+        parameters: Any,
+        elapsed: float,
+        error: BaseException | None = None,
+    ):
+        log.warning(
+            "Slow query (%.2f seconds%s): %s\nParameters: %s\nPlan:\n%s",
+            elapsed,
+            f", failed: {error}" if error else "",
+            statement,
+            parameters,
+            self._explain(conn, statement, parameters),
+        )
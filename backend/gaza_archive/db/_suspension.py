@@ -3,8 +3,9 @@ from contextlib import contextmanager
 from datetime import datetime, timezone
 from logging import getLogger
 from threading import RLock
-from typing import Iterator
+from typing import Iterator, Sequence
 
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from ..model.suspension import (
@@ -31,6 +32,12 @@ class SuspensionStates(ABC):
     @contextmanager
     def get_session(self) -> Iterator[Session]: ...
 
+    @abstractmethod
+    def _bump_data_version(self, session: Session, scope: str): ...
+
+    @abstractmethod
+    def _publish(self, event_type: str, items: Sequence[BaseModel]): ...
+
     def get_suspension_states(self, account_url: str) -> dict[str, SuspensionState]:
         """Get all suspension states for an account across servers."""
         with self.get_session() as session:
@@ -113,6 +120,7 @@ class SuspensionStates(ABC):
             ).delete(synchronize_session=False)
 
             # Insert new states
+            audits: list[DbAccountSuspensionStateAudit] = []
             for server_url, state in states.items():
                 db_state = DbAccountSuspensionState(
                     account_url=account_url,
@@ -135,9 +143,17 @@ class SuspensionStates(ABC):
                             changed_at=datetime.now(timezone.utc),
                         )
                         session.add(audit)
+                        audits.append(audit)
 
+            if not create_audit or existing_states != states:
+                self._bump_data_version(session, "suspensions")
+            # Assign the IDs of the audit records, which are part of the events
+            session.flush()
+            changes = [audit.to_model() for audit in audits]
             session.commit()
 
+        self._publish("account_state", changes)
+
     def get_accounts_needing_state_refresh(self) -> list[str]:
         """Get accounts that need state refresh (those from verified source)."""
         # This will be called from the background job with accounts from
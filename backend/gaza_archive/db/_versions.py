@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from logging import getLogger
+from typing import Collection, Iterator
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ._model import DataVersion as DbDataVersion, utcnow
+
+log = getLogger(__name__)
+
+# Scopes of the data version counters, one per group of tables written together
+data_scopes = (
+    "accounts",
+    "posts",
+    "campaigns",
+    "suspensions",
+    "exchange_rates",
+    "bots",
+    "media_files",
+)
+
+
+class DataVersions(ABC):
+    """
+    Database interface for the data version counters.
+    """
+
+    @abstractmethod
+    @contextmanager
+    def get_session(self) -> Iterator[Session]: ...
+
+    def _init_data_versions(self):
+        """
+        Create the missing version counters, so that bumps are plain updates.
+        """
+        with self.get_session() as session:
+            existing = {row[0] for row in session.query(DbDataVersion.scope).all()}
+            for scope in data_scopes:
+                if scope not in existing:
+                    session.add(DbDataVersion(scope=scope, version=0))
+
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another process created the counters in the meantime
+                session.rollback()
+
+    def _bump_data_version(self, session: Session, scope: str):
+        """
+        Bump the version of a data scope within the writer's transaction.
+        """
+        assert scope in data_scopes, f"Unknown data scope: {scope}"
+        session.query(DbDataVersion).filter(DbDataVersion.scope == scope).update(
+            {
+                DbDataVersion.version: DbDataVersion.version + 1,
+                DbDataVersion.updated_at: utcnow(),
+            },
+            synchronize_session=False,
+        )
+
+    def get_data_version(
+        self, scopes: Collection[str] | None = None
+    ) -> tuple[int, datetime | None]:
+        """
+        :param scopes: Only take these data scopes into account (default: all).
+        :return: A ``(version, updated_at)`` tuple. The version is increased
+            by every write to any of the data scopes, and ``updated_at`` is the
+            time of the latest one.
+        """
+        with self.get_session() as session:
+            query = session.query(
+                func.coalesce(func.sum(DbDataVersion.version), 0),
+                func.max(DbDataVersion.updated_at),
+            )
+            if scopes is not None:
+                query = query.filter(DbDataVersion.scope.in_(scopes))
+
+            version, updated_at = query.one()
+            return int(version), updated_at
@@ -65,3 +65,19 @@ class DownloadError(Error, RuntimeError):
     """
     Raised when a download operation fails.
     """
+
+
+class QueryTimeoutError(Error, TimeoutError):
+    """
+    Raised when a database query runs past its time budget and is aborted.
+    """
+
+
+class QueryTooLargeError(Error):
+    """
+    Raised when a database query returns more rows than its budget allows.
+    """
+
+    def __init__(self, *args, max_rows: int = 0, **kwargs):
+        self.max_rows = max_rows
+        super().__init__(*args, **kwargs)
@@ -43,6 +43,9 @@ class Loop(Thread):
         Main loop
         """
         self.client.start_campaigns_bot()
+        self.refresh_bots_info()
+        self.init_media_manifest()
+        self.resume_partial_downloads()
 
         if not self.config.enable_crawlers:
             log.info("Crawlers are disabled. Exiting.")
@@ -50,6 +53,7 @@ class Loop(Thread):
 
         while not self._stop_event.is_set():
             try:
+                self.refresh_bots_info()
                 accounts = self.refresh_accounts()
                 self.refresh_campaigns(accounts)
                 self.refresh_suspensions(accounts)
@@ -59,6 +63,41 @@ class Loop(Thread):
             finally:
                 self._stop_event.wait(self.config.poll_interval)
 
+    def init_media_manifest(self):
+        """
+        Index the stored media files on the first run, or after an upgrade
+        from a version without the media manifest. Afterwards the downloader
+        keeps it up to date.
+        """
+        try:
+            if not self.db.has_media_files():
+                self.client.rebuild_media_manifest()
+        except Exception as e:
+            log.error("Could not build the media manifest: %s", e)
+            log.exception(e)
+
+    def resume_partial_downloads(self):
+        """
+        Complete the media downloads interrupted by the last shutdown.
+        """
+        if not self.config.download_media:
+            return
+
+        try:
+            self.client.resume_partial_downloads()
+        except Exception as e:
+            log.error("Could not resume the interrupted downloads: %s", e)
+            log.exception(e)
+
+    def refresh_bots_info(self):
+        """
+        Fetch the info of the bot accounts, if it's not cached yet.
+
+        The bot account URLs are stored in the database, where the API reads
+        them from, so the API never has to talk to the Mastodon instances.
+        """
+        _ = self.client.bot_account_info, self.client.bot_campaign_info
+
     def refresh_suspensions(self, accounts: list[Account]):
         # Check if it's time for suspension state refresh
         now = time()
@@ -304,4 +343,5 @@ class Loop(Thread):
         Stop the main loop.
         """
         self.client.stop_campaigns_bot()
+        self.client.thumbnails.shutdown()
         self._stop_event.set()
@@ -1,7 +1,7 @@
-from ._api import ApiSortType, api_split_args
+from ._api import ApiSortType, api_is_url, api_split_args
 from ._base import Item
-from .bot import BotState
 from .account import Account
+from .bot import BotName, BotState
 from .campaign import (
     Campaign,
     CampaignAccountStats,
@@ -9,13 +9,20 @@ from .campaign import (
     CampaignDonationInfo,
     CampaignStats,
     CampaignStatsAmount,
+    CampaignSyncState,
+)
+from .media import (
+    Media,
+    MediaFile,
+    derivative_path,
+    derivative_sizes,
+    original_path,
 )
-from .media import Media
 from .post import Post
 from .suspension import (
-    SuspensionState,
     AccountSuspensionState,
     AccountSuspensionStateAudit,
+    SuspensionState,
 )
 
 # Rebuild models after all are imported to resolve forward references
@@ -27,6 +34,7 @@ __all__ = [
     "AccountSuspensionState",
     "AccountSuspensionStateAudit",
     "ApiSortType",
+    "BotName",
     "BotState",
     "Campaign",
     "CampaignAccountStats",
@@ -34,9 +42,15 @@ __all__ = [
     "CampaignDonationInfo",
     "CampaignStats",
     "CampaignStatsAmount",
+    "CampaignSyncState",
     "Item",
     "Media",
+    "MediaFile",
     "Post",
     "SuspensionState",
+    "api_is_url",
     "api_split_args",
+    "derivative_path",
+    "derivative_sizes",
+    "original_path",
 ]
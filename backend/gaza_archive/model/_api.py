@@ -8,8 +8,8 @@ class ApiSortType(Enum):
     Allowed sort types on the API.
     """
 
-    ASC = 'asc'
-    DESC = 'desc'
+    ASC = "asc"
+    DESC = "desc"
 
     @classmethod
     def parse(cls, value: str) -> tuple[str, "ApiSortType"]:
@@ -22,9 +22,7 @@ class ApiSortType(Enum):
         """
         tokens = value.split(":")
         key, sort_type_str = (
-            (tokens[0], tokens[1].lower())
-            if len(tokens) > 1
-            else (tokens[0], "asc")
+            (tokens[0], tokens[1].lower()) if len(tokens) > 1 else (tokens[0], "asc")
         )
 
         try:
@@ -50,4 +48,12 @@ def api_split_args(value: str | Collection[str]) -> list[str]:
 
         value = split_args
 
-    return list(value)
\ No newline at end of file
+    return list(value)
+
+
+def api_is_url(value: str) -> bool:
+    """
+    :return: Whether an item reference passed to the API is a URL, rather
+        than an ID or a FQN.
+    """
+    return value.startswith(("http://", "https://"))
@@ -1,5 +1,15 @@
 from dataclasses import dataclass
 from datetime import datetime
+from enum import Enum
+
+
+class BotName(str, Enum):
+    """
+    Names of the bots, used as keys of their stored state.
+    """
+
+    ACCOUNTS = "mastodon_accounts_bot"
+    CAMPAIGNS = "mastodon_campaigns_bot"
 
 
 @dataclass
@@ -9,4 +19,5 @@ class BotState:
     """
 
     bot_name: str
-    last_updated_at: datetime | None = None
\ No newline at end of file
+    last_updated_at: datetime | None = None
+    account_url: str | None = None
@@ -53,6 +53,19 @@ class Campaign(Item):
         raise ValueError(f"Unsupported campaign URL: {self.url}")
 
 
+class CampaignSyncState(BaseModel):
+    """
+    Stored synchronization state of a campaign - everything needed to resume
+    fetching its donations, without loading the donations themselves.
+    """
+
+    url: str
+    donations_cursor: str | None = None
+    state: SuspensionState | None = None
+    down_since: datetime | None = None
+    donations_count: int = 0
+
+
 class CampaignStatsAmount(BaseModel):
     """
     Model for amount objects in campaign stats.
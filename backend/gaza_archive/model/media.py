@@ -1,4 +1,7 @@
 from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
 from typing import TYPE_CHECKING
 
 from pydantic import computed_field
@@ -9,6 +12,33 @@ if TYPE_CHECKING:
     from .post import Post
 
 
+# Maximum width/height, in pixels, of the WebP derivatives rendered for each
+# image attachment
+derivative_sizes = {"thumb": 320, "preview": 1280}
+
+
+def derivative_path(path: str, name: str) -> str:
+    """
+    :param path: Path of the original file, e.g. ``/media/user@host/1.jpg``.
+    :param name: Name of the derivative (see :data:`derivative_sizes`).
+    :return: Path of the derivative, next to the original, e.g.
+        ``/media/user@host/1.jpg.thumb.webp``.
+    """
+    return f"{path}.{name}.webp"
+
+
+def original_path(path: str) -> str | None:
+    """
+    :return: Path of the original file of a derivative, or None if the path
+        isn't a derivative.
+    """
+    for name in derivative_sizes:
+        suffix = f".{name}.webp"
+        if path.endswith(suffix):
+            return path.removesuffix(suffix)
+    return None
+
+
 class Media(Item):
     """
     Media class representing media attachments in posts.
@@ -27,3 +57,50 @@ class Media(Item):
             "username/post_id.extension".
         """
         return f"/media/{self.post.author.fqn}/{self.id}.{self.url.split('.')[-1]}"
+
+    @computed_field
+    @property
+    def thumbnail_path(self) -> str | None:
+        """
+        :return: Path of the small WebP thumbnail of an image, for grid views.
+            It redirects to the original file until the thumbnail is rendered.
+        """
+        return derivative_path(self.path, "thumb") if self.type == "image" else None
+
+    @computed_field
+    @property
+    def preview_path(self) -> str | None:
+        """
+        :return: Path of the WebP preview of an image, large enough for a
+            single attachment view. It redirects to the original file until
+            the preview is rendered.
+        """
+        return derivative_path(self.path, "preview") if self.type == "image" else None
+
+
+@dataclass
+class MediaFile:
+    """
+    A file (or a directory) of the media storage, as recorded in the media
+    manifest.
+    """
+
+    # Path relative to the media directory, e.g. ``@user@instance/123.jpg``
+    path: str
+    size: int
+    mtime: datetime
+    # MIME type, if known
+    type: str | None = None
+    # SHA-256 of the content, recorded when the file is downloaded
+    sha256: str | None = None
+    # For directory listings: directories report the total size and the
+    # latest modification time of the files under them
+    is_dir: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def directory(self) -> str:
+        return self.path.rsplit("/", 1)[0] if "/" in self.path else ""
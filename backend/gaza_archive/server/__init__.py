@@ -1,27 +1,93 @@
 import asyncio
-import importlib
-import os
 from logging import getLogger
 from threading import Event, Thread
+from time import monotonic
 
 import uvicorn
-from fastapi import HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request
 
 from ..config import Config
 from ..db import Db
-from ._app import app, render_index
-from ._ctx import get_ctx
+from ._app import (
+    analytics_lane,
+    app,
+    event_stream,
+    feed_cache,
+    feed_prewarmer,
+    index_page,
+    lookup_lane,
+    render_index,
+)
+from ._ctx import get_ctx, set_ctx
 
 log = getLogger(__name__)
 
+# Reference for the startup time reports
+_started_at = monotonic()
+_routes_loaded = False
+
+
+def _warm_up():
+    """
+    Fill the caches used by the first requests: the account state counts and
+    the index page. It runs in the background once the server accepts
+    requests, so a large database doesn't delay the startup.
+    """
+    started_at = monotonic()
+    try:
+        get_ctx().db.warm_up()
+        index_page.get()
+    except Exception as e:
+        log.warning("Could not warm up the API caches: %s", e)
+        return
+
+    log.info("API caches warmed up in %.2fs", monotonic() - started_at)
+
+
+async def _on_startup():
+    log.info("API ready %.2fs after startup", monotonic() - _started_at)
+    Thread(target=_warm_up, name="api-warmup", daemon=True).start()
+
+
+def create_app() -> FastAPI:
+    """
+    Register the API routes on the app and return it.
+
+    It can be used as an app factory by uvicorn, e.g. to run the API in
+    multiple worker processes.
+    """
+    global _routes_loaded  # pylint: disable=global-statement
+    if _routes_loaded:
+        return app
+
+    # Imported here, as the route modules import this package
+    from ._routes import routers
+
+    for router in routers:
+        app.include_router(router)
+
+    # Add catch-all route for serving the Vue.js app AFTER all other routes
+    @app.get("/{full_path:path}", include_in_schema=False)
+    async def _(request: Request, full_path: str):
+        # Only serve the Vue app for non-API routes
+        if full_path.startswith("api/"):
+            raise HTTPException(status_code=404, detail="API endpoint not found")
+
+        return await render_index(request)
+
+    app.router.on_startup.append(_on_startup)
+    if feed_cache.enabled and feed_prewarmer.interval > 0:
+        feed_prewarmer.start()
+
+    _routes_loaded = True
+    return app
+
 
 class ApiServer(Thread):
     """
     API server class.
     """
 
-    _routes_dir = os.path.join(os.path.dirname(__file__), "_routes")
-
     def __init__(self, config: Config, db: Db, *_, **__):
         super().__init__()
         self.config = config
@@ -29,30 +95,10 @@ class ApiServer(Thread):
         self.server: uvicorn.Server | None = None
         self.shutdown_event = Event()  # Event to signal shutdown
         self.should_stop = False
-        self._init_routes()
-
-    def _init_routes(self):
-        # Dynamically import and include routers
-        for filename in os.listdir(self._routes_dir):
-            filename = os.path.basename(filename)
-            if filename.endswith(".py") and filename != "__init__.py":
-                module_name = (
-                    f"._routes.{filename[:-3]}"  # Remove ".py" from the filename
-                )
-                module = importlib.import_module(module_name, package=__package__)
-
-                # Check if the module has a `router` attribute
-                if hasattr(module, "router"):
-                    app.include_router(module.router)
-
-        # Add catch-all route for serving the Vue.js app AFTER all other routes
-        @app.get("/{full_path:path}", include_in_schema=False)
-        async def _(request: Request, full_path: str):
-            # Only serve the Vue app for non-API routes
-            if full_path.startswith("api/"):
-                raise HTTPException(status_code=404, detail="API endpoint not found")
-
-            return render_index(request)
+        # Share the database of the crawlers rather than opening another one
+        set_ctx(config, db)
+        event_stream.attach(db)
+        create_app()
 
     def run(self):
         super().run()
@@ -81,6 +127,8 @@ class ApiServer(Thread):
                 )
                 if self.server:
                     log.info("Shutdown signal received, stopping server...")
+                    # Open streams would otherwise keep the server running
+                    event_stream.close()
                     self.server.should_exit = True
                     await server_task
 
@@ -89,6 +137,9 @@ class ApiServer(Thread):
             loop.run_until_complete(
                 asyncio.gather(server_task, shutdown_task, return_exceptions=True)
             )
+            feed_prewarmer.stop()
+            lookup_lane.shutdown()
+            analytics_lane.shutdown()
         except KeyboardInterrupt:
             pass
         except Exception as e:
@@ -109,4 +160,4 @@ class ApiServer(Thread):
         super().join(timeout)
 
 
-__all__ = ["ApiServer", "get_ctx", "app"]
+__all__ = ["ApiServer", "app", "create_app", "get_ctx", "set_ctx"]
@@ -1,14 +1,39 @@
 import os
+from logging import getLogger
 from pathlib import Path
-
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from urllib.parse import quote, urlencode
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    RedirectResponse,
+    Response,
+)
 from jinja2 import Environment, FileSystemLoader
-
-from ..loop import get_client
-from ..model import Account
+from starlette.concurrency import run_in_threadpool
+
+from ..db import QueryCounter
+from ..errors import QueryTimeoutError, QueryTooLargeError
+from ..model import MediaFile, original_path
+from ._cache import (
+    FeedCache,
+    ResponseCache,
+    etag_matches,
+    http_date,
+    version_etag,
+)
+from ._compression import compressed_response, is_compressible
 from ._ctx import get_ctx
+from ._executor import DbLane
+from ._feeds import FeedPrewarmer
+from ._files import AssetFiles, immutable_cache_control, send_file
+from ._index import IndexPage
+from ._rate_limit import RateLimiter, rate_limited_path_prefix
+from ._stream import EventStream
+
+log = getLogger(__name__)
 
 app = FastAPI(
     title="Gaza Verified Archive API",
@@ -31,50 +56,266 @@ jinja_env = Environment(
     cache_size=0,  # Disable template caching to avoid race conditions
 )
 
-app.mount("/assets", StaticFiles(directory=assets_dir), name="static")
+# Maximum number of SQL statements that an API request is expected to run.
+# Requests above the budget are logged, as they usually indicate N+1 lazy loads.
+query_budget = 10
+
+# Blocking database work of the API runs on dedicated, bounded thread pools:
+# one for the lookups, and one for the expensive statistics queries, so slow
+# analytics can't starve the cheap endpoints
+lookup_lane = DbLane(
+    "lookups",
+    workers=config.api_db_workers,
+    max_queue=config.api_db_queue_size,
+    retry_after=1,
+)
+analytics_lane = DbLane(
+    "analytics",
+    workers=config.api_analytics_db_workers,
+    max_queue=config.api_db_queue_size,
+    retry_after=5,
+)
+
+# API responses only change when the stored data changes, so they are cached
+# and revalidated against the data version
+response_cache = ResponseCache(
+    ttl=config.api_cache_ttl,
+    max_size=config.api_cache_size,
+)
+cached_path_prefix = "/api/v1/"
+uncached_path_prefixes = ("/api/v1/internal/", "/api/v1/stream")
+# Feeds have their own cache, see below
+uncached_path_suffixes = ("/rss",)
+
+# Rendered feeds are cached until the data they show changes, and the most
+# polled ones are rendered in the background as soon as new data is stored
+feed_cache = FeedCache(max_size=config.feed_cache_size_mb * 1024 * 1024)
+feed_prewarmer = FeedPrewarmer(feed_cache, interval=config.feed_prewarm_interval)
+
+# Each API client has a budget of tokens, taken by its requests according to
+# their estimated cost, so a single scraper can't saturate the database
+rate_limiter = RateLimiter.from_config(config)
+
+# Newly archived data is pushed to the clients of /api/v1/stream. It's fed by
+# the database of the crawlers, when they run in the same process as the API.
+event_stream = EventStream(
+    config,
+    buffer_size=config.stream_buffer_size,
+    max_clients=config.stream_max_clients,
+)
+
+# The index template is compiled once, and the page is only re-rendered when
+# the accounts or the bots change
+index_page = IndexPage(jinja_env.get_template("index.html"), lambda: get_ctx().db)
+media_index_template = jinja_env.get_template("media_index.html")
 
+app.mount("/assets", AssetFiles(assets_dir, dist_dir), name="static")
 
-def render_index(request: Request):
-    client = get_client()
-    bot_account_info = None
-    bot_campaign_info = None
 
-    if client:
-        bot_account_info = client.bot_account_info
-        bot_campaign_info = client.bot_campaign_info
+@app.middleware("http")
+async def cache_responses(request: Request, call_next):
+    path = request.url.path
+    if (
+        request.method != "GET"
+        or not path.startswith(cached_path_prefix)
+        or path.startswith(uncached_path_prefixes)
+        or path.endswith(uncached_path_suffixes)
+    ):
+        return await call_next(request)
 
-        if bot_account_info and bot_account_info.get("url"):
-            bot_account_info = {
-                "url": bot_account_info["url"],
-                "fqn": Account(url=bot_account_info["url"]).fqn,
-            }
+    try:
+        version, updated_at = await lookup_lane.run(get_ctx().db.get_data_version)
+    except HTTPException as e:
+        return JSONResponse(
+            {"detail": e.detail}, status_code=e.status_code, headers=e.headers
+        )
+    key = ResponseCache.key(request)
+    cache_headers = {
+        "ETag": version_etag(version, key),
+        "Cache-Control": "no-cache",
+    }
+    if updated_at:
+        cache_headers["Last-Modified"] = http_date(updated_at)
+
+    # Only answered with a 304 once the request is known to produce a 200 -
+    # from the cache, or from the handler - so invalid requests still fail
+    if_none_match = request.headers.get("if-none-match")
+    not_modified = bool(
+        if_none_match and etag_matches(cache_headers["ETag"], if_none_match)
+    )
+
+    cached = response_cache.get(key, version)
+    if cached:
+        if not_modified:
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers=cache_headers)
+
+        return await compressed_response(
+            request,
+            cached.body,
+            {**cached.headers, **cache_headers},
+            min_size=config.compression_min_size,
+            status_code=cached.status_code,
+            encoded=cached.encoded,
+        )
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    response.headers.update(cache_headers)
+    if "content-length" not in response.headers:
+        # Don't buffer streamed responses
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = dict(response.headers)
+    entry = response_cache.set(key, version, response.status_code, headers, body)
+    if not_modified:
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=cache_headers)
+
+    return await compressed_response(
+        request,
+        body,
+        headers,
+        min_size=config.compression_min_size,
+        status_code=response.status_code,
+        encoded=entry.encoded if entry else None,
+    )
 
-        if bot_campaign_info and bot_campaign_info.get("url"):
-            bot_campaign_info = {
-                "url": bot_campaign_info["url"],
-                "fqn": Account(url=bot_campaign_info["url"]).fqn,
-            }
 
-    template = jinja_env.get_template("index.html")
-    html_content = template.render(
-        request=request,
-        accounts=list(get_ctx().db.get_accounts().values()),
-        bot_account_info=bot_account_info,
-        bot_campaign_info=bot_campaign_info,
+# Registered after the cache middleware, so it wraps it: the header reports
+# the queries of the current request, not those of a cached response
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    with QueryCounter.track() as counter:
+        response = await call_next(request)
+
+    if request.url.path.startswith("/api/") and counter.count > query_budget:
+        log.warning(
+            "%s %s executed %d queries (budget: %d)",
+            request.method,
+            request.url.path,
+            counter.count,
+            query_budget,
+        )
+
+    if config.debug:
+        response.headers["X-Query-Count"] = str(counter.count)
+    return response
+
+
+@app.exception_handler(QueryTimeoutError)
+async def query_timeout(_: Request, e: QueryTimeoutError):
+    return JSONResponse(
+        {"detail": e.message},
+        status_code=503,
+        headers={"Retry-After": str(analytics_lane.retry_after)},
+    )
+
+
+@app.exception_handler(QueryTooLargeError)
+async def query_too_large(_: Request, e: QueryTooLargeError):
+    return JSONResponse({"detail": e.message}, status_code=422)
+
+
+# Registered after the cache middleware, so it runs before it and cached
+# responses count against the budget of the clients too
+@app.middleware("http")
+async def limit_rate(request: Request, call_next):
+    if not rate_limiter or not request.url.path.startswith(rate_limited_path_prefix):
+        return await call_next(request)
+
+    rate_limit = await run_in_threadpool(rate_limiter.check, request)
+    if not rate_limit.allowed:
+        return JSONResponse(
+            {"detail": "Rate limit exceeded"},
+            status_code=429,
+            headers=rate_limit.headers,
+        )
+
+    response = await call_next(request)
+    response.headers.update(rate_limit.headers)
+    return response
+
+
+# Registered last, so it wraps the other middlewares. Cached responses are
+# already compressed by the cache middleware, with the compressed bodies kept
+# in the cache too.
+@app.middleware("http")
+async def compress_responses(request: Request, call_next):
+    response = await call_next(request)
+    content_length = response.headers.get("content-length")
+    if (
+        request.method == "HEAD"
+        or "content-encoding" in response.headers
+        # Streamed responses aren't buffered
+        or not content_length
+        or not is_compressible(
+            response.headers.get("content-type"),
+            int(content_length),
+            config.compression_min_size,
+        )
+    ):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    return await compressed_response(
+        request,
+        body,
+        dict(response.headers),
+        min_size=config.compression_min_size,
+        status_code=response.status_code,
+    )
+
+
+async def render_index(request: Request) -> Response:
+    """
+    Serve the cached index page, or a 304 if the client already has it.
+    """
+    page = await lookup_lane.run(index_page.get)
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": "no-cache",
+        "Content-Type": "text/html; charset=utf-8",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(page.etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    return await compressed_response(
+        request,
+        page.body,
+        headers,
+        min_size=config.compression_min_size,
+        encoded=page.encoded,
     )
-    return HTMLResponse(content=html_content)
 
 
 @app.get("/", include_in_schema=False)
 async def read_root(request: Request):
-    return render_index(request)
+    return await render_index(request)
 
 
 # Database download endpoint
 @app.get("/app.db", include_in_schema=False)
 async def download_database():
-    return FileResponse(
-        os.path.join(config.storage_path, "app.db"),
+    if config.hide_all_user_content:
+        raise HTTPException(status_code=403, detail="User content is hidden")
+
+    storage_root = Path(config.storage_path).resolve()
+    db_path = storage_root / "app.db"
+    if not db_path.is_file():
+        # Not using SQLite
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return send_file(
+        db_path,
+        storage_root,
+        "data",
+        # It changes with every crawl
+        headers={"Cache-Control": "no-cache"},
         media_type="application/octet-stream",
         filename="app.db",
     )
@@ -85,86 +326,150 @@ async def favicon():
     return FileResponse(os.path.join(dist_dir, "favicon.ico"))
 
 
+def list_media_directory(
+    directory: str, sort: str, limit: int, offset: int
+) -> tuple[list[MediaFile], int]:
+    """
+    List a media directory from the manifest.
+
+    :raises HTTPException: 400 on an invalid sort field, 404 if the directory
+        doesn't exist.
+    """
+    try:
+        listing = get_ctx().db.get_media_directory(
+            directory, sort=sort, limit=limit, offset=offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return listing
+
+
+async def serve_media_file(
+    request: Request, path: Path, storage_root: Path
+) -> Response:
+    """
+    Serve a media file, with immutable cache headers: archived attachments
+    never change. The ETag is the content hash recorded in the media
+    manifest, if any.
+    """
+    headers = {"Cache-Control": immutable_cache_control}
+    media_file = await lookup_lane.run(
+        get_ctx().db.get_media_file,
+        path.relative_to(storage_root / "media").as_posix(),
+    )
+    if media_file and media_file.sha256 and media_file.size == path.stat().st_size:
+        headers["ETag"] = f'"{media_file.sha256}"'
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(headers["ETag"], if_none_match):
+            return Response(status_code=304, headers=headers)
+
+    return send_file(path, storage_root, "data", headers=headers)
+
+
+@app.get("/media", include_in_schema=False)
 @app.get("/media/{file_path:path}", include_in_schema=False)
-async def serve_media(_: Request, file_path: str = ""):
+async def serve_media(
+    request: Request,
+    file_path: str = "",
+    sort: str = Query("name", description="Sort field, optionally with :desc"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    format: str = Query("html", pattern="^(html|json)$"),
+):
     if config.hide_all_user_content or config.hide_media:
         raise HTTPException(status_code=403, detail="Media is hidden")
 
-    media_root = Path(config.storage_path) / "media"
+    storage_root = Path(config.storage_path).resolve()
+    media_root = storage_root / "media"
     requested_path = media_root / file_path
 
     # Security check - ensure we're not going outside media directory
     try:
         requested_path = requested_path.resolve()
-        media_root = media_root.resolve()
-        requested_path.relative_to(media_root)
+        directory = requested_path.relative_to(media_root).as_posix()
     except (OSError, ValueError):
         raise HTTPException(status_code=404, detail="Not found")
 
-    if not requested_path.exists():
-        raise HTTPException(status_code=404, detail="Not found")
-
     # If it's a file, serve it directly
     if requested_path.is_file():
-        return FileResponse(requested_path)
-
-    # If it's a directory, show directory listing
-    if requested_path.is_dir():
-        items = []
-
-        # Add parent directory link if not at root
-        if file_path:
-            parent_path = (
-                str(Path(file_path).parent)
-                if Path(file_path).parent != Path(".")
-                else ""
-            )
-            items.append(
-                {
-                    "name": "../",
-                    "is_dir": True,
-                    "path": f"/media/{parent_path}",
-                    "size": "-",
-                }
-            )
-
-        # List directory contents
-        for item in sorted(requested_path.iterdir()):
-            relative_item_path = file_path + "/" + item.name if file_path else item.name
-            items.append(
-                {
-                    "name": item.name + ("/" if item.is_dir() else ""),
-                    "is_dir": item.is_dir(),
-                    "path": f"/media/{relative_item_path}",
-                    "size": f"{item.stat().st_size} bytes" if item.is_file() else "-",
-                }
-            )
-
-        # Generate HTML directory listing
-        html_content = f"""
-        <html>
-        <head><title>Index of /media/{file_path}</title></head>
-        <body>
-        <h1>Index of /media/{file_path}</h1>
-        <table style="width: 30em; max-width: 90%; border-collapse: collapse">
-        <tr><th>Name</th><th>Size</th></tr>
-        """
-
-        for item in items:
-            html_content += f'<tr><td><a href="{item["path"]}">{item["name"]}</a></td><td>{item["size"]}</td></tr>'
-
-        html_content += """
-        </table>
-        </body>
-        </html>
-        """
-
-        return HTMLResponse(content=html_content)
-
-
-@app.get("/media", include_in_schema=False)
-async def serve_media_root(request: Request):
-    if config.hide_all_user_content or config.hide_media:
-        raise HTTPException(status_code=403, detail="Media is hidden")
+        return await serve_media_file(request, requested_path, storage_root)
+
+    # Thumbnails that aren't rendered yet fall back to the original file
+    original = original_path(directory)
+    if original and (media_root / original).is_file():
+        return RedirectResponse(
+            f"/media/{quote(original)}",
+            status_code=307,
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    # Directories are listed from the media manifest rather than from the
+    # filesystem, so large directories don't have to be scanned on each request
+    directory = "" if directory == "." else directory
+    version, updated_at = await lookup_lane.run(
+        get_ctx().db.get_data_version, ("media_files",)
+    )
+    # Specific to the listing, so the ETag of another one can't skip e.g. the
+    # check that the directory exists
+    headers = {
+        "ETag": version_etag(version, ResponseCache.key(request)),
+        "Cache-Control": "no-cache",
+    }
+    if updated_at:
+        headers["Last-Modified"] = http_date(updated_at)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    entries, total = await lookup_lane.run(
+        list_media_directory, directory, sort, limit, offset
+    )
 
-    return await serve_media(request, "")
+    if format == "json":
+        return JSONResponse(
+            {
+                "path": directory,
+                "entries": [
+                    {
+                        "name": entry.name,
+                        "path": entry.path,
+                        "is_dir": entry.is_dir,
+                        "size": entry.size,
+                        "type": entry.type,
+                        "mtime": entry.mtime.isoformat() if entry.mtime else None,
+                    }
+                    for entry in entries
+                ],
+                "total": total,
+                "limit": limit,
+                "offset": offset,
+            },
+            headers=headers,
+        )
+
+    def query(**params) -> str:
+        return urlencode({"sort": sort, "limit": limit, "offset": offset, **params})
+
+    return HTMLResponse(
+        content=media_index_template.render(
+            path=directory,
+            parent=directory.rpartition("/")[0] if directory else None,
+            columns=[
+                ("name", "Name"),
+                ("size", "Size"),
+                ("mtime", "Modified"),
+                ("type", "Type"),
+            ],
+            entries=entries,
+            total=total,
+            sort=sort,
+            limit=limit,
+            offset=offset,
+            query=query,
+        ),
+        headers=headers,
+    )
@@ -0,0 +1,362 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+from typing import Any, Iterator
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    :return: Whether the ETag matches an ``If-None-Match`` header (weak
+        comparison).
+    """
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def version_etag(version: int, key: tuple[str, str]) -> str:
+    """
+    :return: A weak ETag for a resource at a data version. It includes the
+        key of the resource, so it can't validate a different one.
+    """
+    digest = sha256("?".join(key).encode()).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """
+    :return: The datetime formatted for HTTP headers (e.g. ``Last-Modified``).
+        Naive datetimes are assumed to be in UTC.
+    """
+    return format_datetime(
+        value.replace(tzinfo=value.tzinfo or timezone.utc), usegmt=True
+    )
+
+
+@dataclass
+class CachedResponse:
+    """
+    A response stored in the :class:`ResponseCache`.
+    """
+
+    version: int
+    expires_at: float
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    # Compressed versions of the body, by encoding
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of API responses.
+
+    Entries are keyed by path and normalized query string, and they are only
+    served while the data version they were generated for is still current
+    and their TTL hasn't expired.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        """
+        :param ttl: How long entries are kept, in seconds. 0 disables the cache.
+        :param max_size: Maximum number of entries.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    @staticmethod
+    def key(request: Request) -> tuple[str, str]:
+        """
+        :return: The cache key of a request - its path and its query string,
+            with the parameters sorted.
+        """
+        query = parse_qsl(request.url.query, keep_blank_values=True)
+        return request.url.path, urlencode(sorted(query))
+
+    def get(self, key: tuple[str, str], version: int) -> CachedResponse | None:
+        """
+        :return: The cached response for the given key, if it was generated
+            for the given data version and it hasn't expired.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.version == version and entry.expires_at > monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            if entry:
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        key: tuple[str, str],
+        version: int,
+        status_code: int,
+        headers: dict[str, str],
+        body: bytes,
+    ) -> CachedResponse | None:
+        """
+        :return: The new entry, or None if the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries[key] = CachedResponse(
+                version=version,
+                expires_at=monotonic() + self.ttl,
+                status_code=status_code,
+                headers=headers,
+                body=body,
+            )
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+            return entry
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        :return: Size and hit/miss counters of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+@dataclass
+class CachedFeed:
+    """
+    A rendered feed stored in the :class:`FeedCache`.
+    """
+
+    version: int
+    updated_at: datetime | None
+    body: bytes
+    # Compressed versions of the body, by encoding. They aren't counted in
+    # the size of the cache, as they are a fraction of the body.
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+
+class FeedCache:
+    """
+    In-process LRU cache of rendered RSS feeds.
+
+    Entries are keyed by feed name and normalized parameters, and they are
+    served until the data version of the feed changes - there is no TTL. The
+    cache is bounded by the total size of the bodies, and feeds larger than
+    1/16 of it are streamed without being cached.
+    """
+
+    def __init__(self, max_size: int):
+        """
+        :param max_size: Maximum total size of the cached feeds, in bytes. 0
+            disables the cache.
+        """
+        self.max_size = max_size
+        self.max_entry_size = max_size // 16
+        self._entries: OrderedDict[tuple[str, str], CachedFeed] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(name: str, params: dict[str, Any]) -> tuple[str, str]:
+        """
+        :return: The cache key of a feed - its name and its parameters, sorted
+            and without the unset ones, so equivalent requests share entries.
+        """
+        return name, urlencode(
+            sorted(
+                (param, value)
+                for param, value in params.items()
+                if value is not None and value != []
+            ),
+            doseq=True,
+        )
+
+    def get(self, key: tuple[str, str], version: int) -> CachedFeed | None:
+        """
+        :return: The cached feed for the given key, if it was rendered for the
+            given data version.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            if entry:
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        key: tuple[str, str],
+        version: int,
+        updated_at: datetime | None,
+        body: bytes,
+    ):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = CachedFeed(
+                version=version, updated_at=updated_at, body=body
+            )
+            self._size += len(body)
+
+            while self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: tuple[str, str]):
+        self._size -= len(self._entries.pop(key).body)
+
+    def fill(
+        self,
+        key: tuple[str, str],
+        version: int,
+        updated_at: datetime | None,
+        chunks: Iterator[bytes],
+    ) -> Iterator[bytes]:
+        """
+        Pass the chunks of a feed through, and cache the feed once all of them
+        have been consumed, unless it's too large.
+        """
+        body: list[bytes] | None = [] if self.enabled else None
+        size = 0
+        for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                if size <= self.max_entry_size:
+                    body.append(chunk)
+                else:
+                    body = None
+                    with self._lock:
+                        self.uncacheable += 1
+
+            yield chunk
+
+        if body is not None:
+            self.set(key, version, updated_at, b"".join(body))
+
+    def warm(
+        self,
+        key: tuple[str, str],
+        version: int,
+        updated_at: datetime | None,
+        chunks: Iterator[bytes],
+    ) -> bool:
+        """
+        Render a feed into the cache, unless it's already cached for the
+        given version.
+
+        :return: False if the feed is too large to be cached - its rendering
+            is interrupted as soon as that's known.
+        """
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.version == version:
+                return True
+
+        body: list[bytes] = []
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > self.max_entry_size:
+                    return False
+                body.append(chunk)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+
+        self.set(key, version, updated_at, b"".join(body))
+        return True
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        :return: Size and hit/miss counters of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable,
+            }
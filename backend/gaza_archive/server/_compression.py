@@ -0,0 +1,121 @@
+import gzip
+from importlib.util import find_spec
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+# Brotli is optional: without it, responses are only compressed with gzip
+encodings = ("br", "gzip") if find_spec("brotli") else ("gzip",)
+
+# Content types worth compressing. Media files are already compressed.
+compressible_types = (
+    "application/json",
+    "application/rss+xml",
+    "application/xml",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+def negotiate(
+    accept_encoding: str | None, available: tuple[str, ...] = encodings
+) -> str | None:
+    """
+    :param accept_encoding: The ``Accept-Encoding`` header of the request.
+    :param available: The supported encodings, by preference.
+    :return: The preferred encoding accepted by the client, if any.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: dict[str, float] = {}
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        accepted[name.strip().lower()] = quality
+
+    best = max(
+        available,
+        key=lambda encoding: accepted.get(encoding, accepted.get("*", 0.0)),
+    )
+    return best if accepted.get(best, accepted.get("*", 0.0)) > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def is_compressible(content_type: str | None, size: int, min_size: int) -> bool:
+    return bool(
+        content_type
+        and content_type.startswith(compressible_types)
+        and size >= min_size
+    )
+
+
+def add_vary(headers: dict[str, str]):
+    vary = headers.get("vary")
+    if not vary:
+        headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["vary"] = f"{vary}, Accept-Encoding"
+
+
+async def compressed_response(
+    request: Request,
+    body: bytes,
+    headers: dict[str, str],
+    *,
+    min_size: int,
+    status_code: int = 200,
+    encoded: dict[str, bytes] | None = None,
+) -> Response:
+    """
+    Build a response compressed with the encoding preferred by the client,
+    if the content type is compressible and the body is large enough.
+
+    :param request: The request, for its ``Accept-Encoding`` header.
+    :param body: The uncompressed body.
+    :param headers: The response headers, including ``Content-Type``.
+    :param min_size: Minimum size of the bodies to compress, in bytes.
+    :param status_code: The response status code.
+    :param encoded: Compressed versions of the body, by encoding, e.g. kept
+        along with a cached response. Missing encodings are added to it, so
+        each version of a payload is only compressed once.
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    if not is_compressible(headers.get("content-type"), len(body), min_size):
+        return Response(content=body, status_code=status_code, headers=headers)
+
+    add_vary(headers)
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if not encoding:
+        return Response(content=body, status_code=status_code, headers=headers)
+
+    data = encoded.get(encoding) if encoded is not None else None
+    if data is None:
+        data = await run_in_threadpool(compress, body, encoding)
+        if encoded is not None:
+            encoded[encoding] = data
+
+    headers.pop("content-length", None)
+    headers["content-encoding"] = encoding
+    # The compressed body isn't byte-identical to the uncompressed one
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+    return Response(content=data, status_code=status_code, headers=headers)
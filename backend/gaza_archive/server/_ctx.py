@@ -1,18 +1,32 @@
-from dataclasses import dataclass
+from threading import Lock
 from typing import Optional
 
 from ..config import Config
 from ..db import Db
 
 
-@dataclass
 class Context:
     """
     API server context.
+
+    The database is only opened when it's first used, so importing the
+    server doesn't pay for it, and so a process that already has one (see
+    :func:`set_ctx`) doesn't open a second one.
     """
 
-    config: Config
-    db: Db
+    def __init__(self, config: Config, db: Db | None = None):
+        self.config = config
+        self._db = db
+        self._db_lock = Lock()
+
+    @property
+    def db(self) -> Db:
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    self._db = Db(self.config, read_only=self.config.api_read_only)
+
+        return self._db
 
 
 def get_ctx() -> Context:
@@ -22,11 +36,25 @@ def get_ctx() -> Context:
     global _ctx  # pylint: disable=global-statement
 
     if _ctx is None:
-        config = Config.from_env()
-        db = Db(config)
+        with _ctx_lock:
+            if _ctx is None:
+                _ctx = Context(config=Config.from_env())
+
+    return _ctx
+
+
+def set_ctx(config: Config, db: Db) -> Context:
+    """
+    Use an existing configuration and database for the API server, e.g. the
+    ones of the crawlers running in the same process.
+    """
+    global _ctx  # pylint: disable=global-statement
+
+    with _ctx_lock:
         _ctx = Context(config=config, db=db)
 
     return _ctx
 
 
 _ctx: Optional[Context] = None
+_ctx_lock = Lock()
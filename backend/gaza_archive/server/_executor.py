@@ -0,0 +1,241 @@
+import asyncio
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial, wraps
+from logging import getLogger
+from threading import Lock
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+from fastapi import HTTPException
+
+log = getLogger(__name__)
+
+T = TypeVar("T")
+
+# Marks the end of an iterator consumed by DbLane.iterate and DbLane.stream
+_end: Any = object()
+
+
+def _close(items: Iterator, future: Future | None):
+    """
+    Close a (generator) iterator consumed on a lane.
+    """
+    close = getattr(items, "close", None)
+    if not close:
+        return
+
+    if future and not future.done():
+        # Cancelled while the iterator is running on a worker: close it there
+        # once the current item is done
+        future.add_done_callback(lambda _: close())
+    else:
+        close()
+
+
+class DbLane:
+    """
+    A bounded thread pool for blocking database work.
+
+    Requests beyond the pool size wait in a queue of limited depth. When the
+    queue is full the request is rejected with a 503 and a ``Retry-After``
+    header, instead of piling up and starving the other lanes.
+
+    It can also be used as a decorator on sync route handlers, which turns
+    them into async handlers that run on the lane rather than on the default
+    AnyIO thread pool.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        max_queue: int,
+        retry_after: int,
+        max_streams: int | None = None,
+    ):
+        """
+        :param name: Name of the lane, used for thread names and logging.
+        :param workers: Number of worker threads.
+        :param max_queue: Maximum number of calls waiting for a worker.
+        :param retry_after: Value of the ``Retry-After`` header, in seconds,
+            when a call is rejected.
+        :param max_streams: Maximum number of open :meth:`stream` iterators.
+            Each of them keeps a database connection (or a SQLite read
+            transaction) until it ends. Default: ``workers``.
+        """
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.max_streams = workers if max_streams is None else max_streams
+        self._streams = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f"db-{name}"
+        )
+        self._lock = Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _acquire(self, check_limit: bool = True):
+        with self._lock:
+            if check_limit and self._pending >= self.workers + self.max_queue:
+                log.warning(
+                    "The %s lane is full (%d pending calls), rejecting request",
+                    self.name,
+                    self._pending,
+                )
+                raise self._reject()
+
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def _reject(self) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=503,
+            detail="The server is busy, please retry later",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def _acquire_stream(self):
+        with self._lock:
+            if self._streams >= self.max_streams:
+                log.warning(
+                    "The %s lane has %d open streams, rejecting request",
+                    self.name,
+                    self._streams,
+                )
+                raise self._reject()
+
+            self._streams += 1
+
+    def _release_stream(self, items: Iterator, started: list[bool]):
+        if not started:
+            # Never consumed, e.g. the client left before the response
+            # started: the query is still open
+            _close(items, None)
+
+        with self._lock:
+            self._streams -= 1
+
+    def _submit(
+        self, func: Callable[..., T], *args, check_limit: bool = True
+    ) -> Future[T]:
+        self._acquire(check_limit=check_limit)
+        try:
+            future = self._executor.submit(copy_context().run, func, *args)
+        except RuntimeError:
+            self._release()
+            raise
+
+        # Release the slot when the call is done, not when the request is,
+        # so that calls from disconnected clients still count until they end
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run a blocking function on the lane.
+
+        The caller's context variables (e.g. the request's query counter) are
+        propagated to the worker thread.
+
+        :raises HTTPException: 503 if the lane queue is full.
+        """
+        return await asyncio.wrap_future(self._submit(partial(func, *args, **kwargs)))
+
+    async def iterate(self, items: Iterator[T]) -> AsyncIterator[T]:
+        """
+        Consume a blocking iterator on the lane, one item per call, e.g. to
+        stream a response body.
+
+        Unlike :meth:`run` it never rejects calls, as a response that has
+        already started can't be turned into a 503: use :meth:`stream` to
+        apply the queue limit before the response starts.
+        """
+        future: Future | None = None
+        try:
+            while True:
+                future = self._submit(next, items, _end, check_limit=False)
+                item = await asyncio.wrap_future(future)
+                if item is _end:
+                    return
+
+                yield item
+        finally:
+            _close(items, future)
+
+    async def stream(self, items: Iterator[T]) -> AsyncIterator[T]:
+        """
+        Like :meth:`iterate`, but the first item is fetched with :meth:`run`
+        before returning, so a full lane or an error raised by the iterator
+        before the first item still result in a proper error response.
+
+        The stream holds one of the ``max_streams`` slots of the lane until
+        it ends, as the iterator keeps its query open in between the items.
+
+        :raises HTTPException: 503 if the lane queue is full, or if too many
+            streams are open.
+        """
+        self._acquire_stream()
+        future: Future | None = None
+        try:
+            future = self._submit(next, items, _end)
+            first = await asyncio.wrap_future(future)
+        except BaseException:
+            # Release e.g. the database session of the query
+            _close(items, future)
+            with self._lock:
+                self._streams -= 1
+            raise
+
+        started: list[bool] = []
+
+        async def _stream() -> AsyncIterator[T]:
+            started.append(True)
+            try:
+                if first is _end:
+                    return
+
+                yield first
+                async for item in self.iterate(items):
+                    yield item
+            finally:
+                release()
+
+        body = _stream()
+        # Also released if the body is never consumed
+        release = weakref.finalize(body, self._release_stream, items, started)
+        return body
+
+    def __call__(self, handler: Callable[..., T]) -> Callable[..., Any]:
+        @wraps(handler)
+        async def wrapper(*args, **kwargs) -> T:
+            return await self.run(handler, *args, **kwargs)
+
+        return wrapper
+
+    def stats(self) -> dict[str, int]:
+        """
+        :return: Size and counters of the lane.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": min(self._pending, self.workers),
+                "queued": max(self._pending - self.workers, 0),
+                "streams": self._streams,
+                "max_streams": self.max_streams,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,204 @@
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from importlib.util import find_spec
+from itertools import batched
+from typing import Any, Callable, Iterable, Iterator
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from ._executor import DbLane
+
+# Number of rows encoded in each chunk of the response body (and in each
+# Parquet row group)
+batch_size = 1000
+
+
+class ExportFormat(str, Enum):
+    """
+    Supported formats of the bulk exports.
+    """
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+media_types = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+# Types that are written as they are in CSV files
+_plain_types = (str, int, float, bool)
+
+
+def _to_text(value: Any) -> Any:
+    """
+    Flatten the values that CSV and Parquet columns can't store natively.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+def encode_ndjson(
+    rows: Iterable[dict[str, Any]], _: dict[str, type]
+) -> Iterator[bytes]:
+    for batch in batched(rows, batch_size):
+        yield b"".join(
+            orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in batch
+        )
+
+
+def encode_csv(
+    rows: Iterable[dict[str, Any]], fields: dict[str, type]
+) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    converters = [
+        _to_text if type_ not in _plain_types else None for type_ in fields.values()
+    ]
+
+    for batch in batched(rows, batch_size):
+        writer.writerows(
+            [
+                convert(value) if convert else value
+                for convert, value in zip(converters, row.values())
+            ]
+            for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        # Empty dataset: only the header
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that accumulates the written bytes until they're drained,
+    so the Parquet writer output can be streamed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:  # type: ignore[override]
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def encode_parquet(
+    rows: Iterable[dict[str, Any]], fields: dict[str, type]
+) -> Iterator[bytes]:
+    # Optional dependency, only needed by Parquet exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64(),
+        bool: pa.bool_(),
+        datetime: pa.timestamp("us"),
+    }
+
+    # Other types (e.g. JSON columns) are stored as JSON strings
+    schema = pa.schema(
+        [
+            (field, arrow_types.get(type_, pa.string()))
+            for field, type_ in fields.items()
+        ]
+    )
+    json_fields = [field for field, type_ in fields.items() if type_ not in arrow_types]
+    sink = _ChunkSink()
+
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batched(rows, batch_size):
+            columns = {field: [row[field] for row in batch] for field in fields}
+            for field in json_fields:
+                columns[field] = [_to_text(value) for value in columns[field]]
+
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+
+    # Footer
+    yield sink.drain()
+
+
+encoders: dict[
+    ExportFormat,
+    Callable[[Iterable[dict[str, Any]], dict[str, type]], Iterator[bytes]],
+] = {
+    ExportFormat.NDJSON: encode_ndjson,
+    ExportFormat.CSV: encode_csv,
+    ExportFormat.PARQUET: encode_parquet,
+}
+
+
+def check_format(fmt: ExportFormat):
+    """
+    :raises HTTPException: 501 if the dependencies of the format are missing.
+    """
+    if fmt == ExportFormat.PARQUET and not find_spec("pyarrow"):
+        raise HTTPException(
+            status_code=501,
+            detail="Parquet exports require pyarrow to be installed on the server",
+        )
+
+
+async def stream_export(
+    lane: DbLane,
+    name: str,
+    fmt: ExportFormat,
+    rows: Iterator[dict[str, Any]],
+    fields: dict[str, type],
+) -> StreamingResponse:
+    """
+    Stream the encoded rows as a chunked response.
+
+    The rows are fetched and encoded on the lane, one chunk at a time, so the
+    memory usage doesn't depend on the size of the dataset. The first chunk
+    is fetched before the response starts, so a full lane or an invalid
+    filter still result in a proper error response.
+
+    :param lane: Lane that runs the query and the encoding.
+    :param name: Name of the dataset, used for the attachment file name.
+    :param fmt: Output format.
+    :param rows: Iterator over the dataset rows.
+    :param fields: Names and types of the fields of the rows.
+    """
+    check_format(fmt)
+    return StreamingResponse(
+        await lane.stream(encoders[fmt](rows, fields)),
+        media_type=media_types[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{fmt.value}"',
+        },
+    )
@@ -0,0 +1,453 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+from itertools import batched
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Iterator
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from ..model import Account, ApiSortType, api_split_args
+from ._cache import FeedCache, etag_matches, http_date, version_etag
+from ._compression import compressed_response
+from ._ctx import get_ctx
+from ._executor import DbLane
+from .feeds import FeedsGenerator
+
+log = getLogger(__name__)
+
+media_type = "application/rss+xml"
+
+# Number of feed items serialized in each chunk of the response body
+batch_size = 100
+
+# Besides the global feeds, the prewarmer keeps up to this many of the feeds
+# requested in the last ``recent_feeds_ttl`` seconds up to date
+max_recent_feeds = 200
+recent_feeds_ttl = 24 * 60 * 60
+
+
+@dataclass
+class Feed:
+    """
+    An RSS feed, identified by its name and its normalized parameters.
+    """
+
+    name: str
+    params: dict[str, Any]
+    # Data scopes that the feed depends on
+    scopes: tuple[str, ...]
+    # Renders the feed as XML fragments. It reads from the database, so it
+    # should run on a DB lane.
+    render: Callable[[], Iterator[str]]
+    # Raises an HTTPException if the feed can't be served, e.g. if its account
+    # doesn't exist. It runs before any conditional check, on a DB lane too.
+    check: Callable[[], None] | None = None
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return FeedCache.key(self.name, self.params)
+
+    def chunks(self) -> Iterator[bytes]:
+        for fragments in batched(self.render(), batch_size):
+            yield "".join(fragments).encode()
+
+
+class RecentFeeds:
+    """
+    LRU of the feeds requested by the clients, so the prewarmer only renders
+    the per-account feeds that someone actually polls.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        :param max_size: Maximum number of feeds.
+        :param ttl: Feeds not requested for this long are dropped, in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._feeds: OrderedDict[tuple[str, str], tuple[Feed, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def add(self, feed: Feed):
+        with self._lock:
+            self._feeds[feed.key] = (feed, monotonic())
+            self._feeds.move_to_end(feed.key)
+            while len(self._feeds) > self.max_size:
+                self._feeds.popitem(last=False)
+
+    def get(self) -> list[Feed]:
+        """
+        :return: The feeds requested recently, the most recent last.
+        """
+        expired_before = monotonic() - self.ttl
+        with self._lock:
+            while self._feeds and next(iter(self._feeds.values()))[1] < expired_before:
+                self._feeds.popitem(last=False)
+
+            return [feed for feed, _ in self._feeds.values()]
+
+
+recent_feeds = RecentFeeds(max_size=max_recent_feeds, ttl=recent_feeds_ttl)
+
+
+def _to_account_url(account: str) -> str:
+    try:
+        return Account.to_url(account)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid account format: {e}"
+        ) from e
+
+
+def _check_account(account_url: str):
+    if not get_ctx().db.has_account(account_url):
+        raise HTTPException(status_code=404, detail="Account not found")
+
+
+def posts_feed(
+    *,
+    account: str | None = None,
+    exclude_replies: bool = False,
+    min_id: int | None = None,
+    max_id: int | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+) -> Feed:
+    """
+    :param account: Only include the posts of this account (URL or FQN).
+    :raises HTTPException: 400 if the account is invalid. A missing account
+        results in a 404 when the feed is served.
+    """
+    ctx = get_ctx()
+    account_url = _to_account_url(account) if account else None
+    exclude_replies = exclude_replies or ctx.config.hide_replies
+
+    def render() -> Iterator[str]:
+        yield from FeedsGenerator(ctx.config).generate_posts_feed(
+            (
+                ctx.db.iter_post_rows(
+                    exclude_replies=exclude_replies,
+                    min_id=min_id,
+                    max_id=max_id,
+                    account=account_url,
+                    limit=limit,
+                    offset=offset,
+                )
+                if not ctx.config.hide_all_user_content
+                else []
+            ),
+            account=Account(url=account_url) if account_url else None,
+        )
+
+    return Feed(
+        name="posts",
+        params={
+            "account": account_url,
+            "exclude_replies": exclude_replies,
+            "min_id": min_id,
+            "max_id": max_id,
+            "limit": limit,
+            "offset": offset,
+        },
+        scopes=("accounts", "posts") if account_url else ("posts",),
+        render=render,
+        check=partial(_check_account, account_url) if account_url else None,
+    )
+
+
+def media_feed(
+    *,
+    account: str | None = None,
+    min_id: int | None = None,
+    max_id: int | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+) -> Feed:
+    """
+    :param account: Only include the media of this account (URL or FQN).
+    :raises HTTPException: 400 if the account is invalid, 403 if media are
+        hidden. A missing account results in a 404 when the feed is served.
+    """
+    ctx = get_ctx()
+    account_url = _to_account_url(account) if account else None
+    media_hidden = ctx.config.hide_all_user_content or ctx.config.hide_media
+    if media_hidden and not account_url:
+        raise HTTPException(status_code=403, detail="Media is hidden")
+
+    def render() -> Iterator[str]:
+        yield from FeedsGenerator(ctx.config).generate_media_feed(
+            (
+                ctx.db.iter_attachment_rows(
+                    min_id=min_id,
+                    max_id=max_id,
+                    account=account_url,
+                    limit=limit,
+                    offset=offset,
+                )
+                if not ctx.config.hide_all_user_content
+                else []
+            ),
+            account=Account(url=account_url) if account_url else None,
+        )
+
+    return Feed(
+        name="media",
+        params={
+            "account": account_url,
+            "min_id": min_id,
+            "max_id": max_id,
+            "limit": limit,
+            "offset": offset,
+        },
+        scopes=("accounts", "posts") if account_url else ("posts",),
+        render=render,
+        check=partial(_check_account, account_url) if account_url else None,
+    )
+
+
+def accounts_feed(*, limit: int | None = None, offset: int | None = None) -> Feed:
+    ctx = get_ctx()
+
+    def render() -> Iterator[str]:
+        yield from FeedsGenerator(ctx.config).generate_accounts_feed(
+            ctx.db.iter_account_rows(limit=limit, offset=offset)
+        )
+
+    return Feed(
+        name="accounts",
+        params={"limit": limit, "offset": offset},
+        scopes=("accounts",),
+        render=render,
+    )
+
+
+def donations_feed(
+    *,
+    accounts: list[str] | None = None,
+    donors: list[str] | None = None,
+    start_time: str | None = None,
+    end_time: str | None = None,
+    sort: list[str] | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+    currency: str | None = None,
+) -> Feed:
+    """
+    A missing permission (e.g. filtering by donor when donors are hidden)
+    results in a :class:`PermissionError` when the feed is rendered.
+    """
+    ctx = get_ctx()
+
+    def render() -> Iterator[str]:
+        yield from FeedsGenerator(ctx.config).generate_donations_feed(
+            ctx.db.get_donations(
+                accounts=accounts,
+                donors=donors,
+                start_time=(
+                    datetime.fromisoformat(start_time.replace("Z", "+00:00"))
+                    if start_time
+                    else None
+                ),
+                end_time=(
+                    datetime.fromisoformat(end_time.replace("Z", "+00:00"))
+                    if end_time
+                    else None
+                ),
+                sort=(
+                    [ApiSortType.parse(arg) for arg in api_split_args(sort)]
+                    if sort
+                    else None
+                ),
+                limit=limit,
+                offset=offset,
+                currency=currency,
+            )
+        )
+
+    return Feed(
+        name="donations",
+        params={
+            "accounts": accounts,
+            "donors": donors,
+            "start_time": start_time,
+            "end_time": end_time,
+            "sort": sort,
+            "limit": limit,
+            "offset": offset,
+            "currency": currency,
+        },
+        scopes=("accounts", "campaigns", "exchange_rates"),
+        render=render,
+    )
+
+
+def default_feeds() -> Iterator[Feed]:
+    """
+    :return: The feeds most polled by feed readers: the global feeds, with
+        the default parameters of the API routes, and the feeds requested
+        recently (see :data:`recent_feeds`), the most recent first.
+    """
+    ctx = get_ctx()
+    feeds = [
+        posts_feed(limit=50),
+        accounts_feed(),
+        donations_feed(sort=["donation.created_at:desc"], limit=25),
+    ]
+    if not (ctx.config.hide_all_user_content or ctx.config.hide_media):
+        feeds.append(media_feed(limit=50))
+
+    keys = {feed.key for feed in feeds}
+    yield from feeds
+    for feed in reversed(recent_feeds.get()):
+        if feed.key not in keys:
+            yield feed
+
+
+def _not_modified(request: Request, etag: str, updated_at: datetime | None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(etag, if_none_match)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not (if_modified_since and updated_at):
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    # Last-Modified has a resolution of one second
+    return updated_at.replace(
+        microsecond=0, tzinfo=updated_at.tzinfo or timezone.utc
+    ) <= since.replace(tzinfo=since.tzinfo or timezone.utc)
+
+
+async def serve_feed(
+    request: Request, feed: Feed, lane: DbLane, cache: FeedCache
+) -> Response:
+    """
+    Serve a feed from the cache, or render and stream it - and cache it once
+    it's been fully rendered. Clients that already have the current version
+    of the feed get a 304.
+
+    :param request: The feed request, for the conditional headers.
+    :param feed: The feed to serve.
+    :param lane: Lane that runs the database queries.
+    :param cache: The cache of the rendered feeds.
+    """
+    version, updated_at = await lane.run(get_ctx().db.get_data_version, feed.scopes)
+    # Before the conditional checks, so a 304 can't answer for a feed that
+    # would be a 404
+    if feed.check:
+        await lane.run(feed.check)
+
+    key = feed.key
+    # Specific to the feed, so the ETag of another one doesn't match
+    headers = {"ETag": version_etag(version, key), "Cache-Control": "no-cache"}
+    if updated_at:
+        headers["Last-Modified"] = http_date(updated_at)
+
+    if _not_modified(request, headers["ETag"], updated_at):
+        cache.record_not_modified()
+        recent_feeds.add(feed)
+        return Response(status_code=304, headers=headers)
+
+    cached = cache.get(key, version)
+    if cached:
+        recent_feeds.add(feed)
+        return await compressed_response(
+            request,
+            cached.body,
+            {**headers, "Content-Type": media_type},
+            min_size=get_ctx().config.compression_min_size,
+            encoded=cached.encoded,
+        )
+
+    try:
+        body = await lane.stream(cache.fill(key, version, updated_at, feed.chunks()))
+    except PermissionError as e:
+        return Response(content=str(e), status_code=403)
+
+    # Only once the feed is known to be valid, e.g. that its account exists
+    recent_feeds.add(feed)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+class FeedPrewarmer(Thread):
+    """
+    Renders the :func:`default_feeds` into the cache in the background every
+    time the crawler stores new data, so feed readers get cache hits even
+    right after a crawl.
+    """
+
+    def __init__(self, cache: FeedCache, interval: float):
+        """
+        :param cache: The cache of the rendered feeds.
+        :param interval: How often the data version is checked, in seconds.
+        """
+        super().__init__(name="feed-prewarmer", daemon=True)
+        self.cache = cache
+        self.interval = interval
+        self._version: int | None = None
+        self._stop_event = Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.prewarm()
+            except Exception as e:
+                log.warning("Could not prewarm the feeds: %s", e)
+
+            self._stop_event.wait(self.interval)
+
+    def prewarm(self):
+        """
+        Render the default feeds that aren't cached for the current data
+        version, if any data changed since the last run.
+        """
+        db = get_ctx().db
+        version, _ = db.get_data_version()
+        if version == self._version:
+            return
+
+        started_at = monotonic()
+        versions: dict[tuple[str, ...], tuple[int, datetime | None]] = {}
+        cached = 0
+        for feed in default_feeds():
+            if self._stop_event.is_set():
+                return
+
+            if feed.scopes not in versions:
+                versions[feed.scopes] = db.get_data_version(feed.scopes)
+
+            feed_version, updated_at = versions[feed.scopes]
+            try:
+                if feed.check:
+                    feed.check()
+                cached += self.cache.warm(
+                    feed.key, feed_version, updated_at, feed.chunks()
+                )
+            except (HTTPException, PermissionError) as e:
+                log.debug("Skipping the %s feed %s: %s", feed.name, feed.params, e)
+            except Exception as e:
+                # It will be rendered on request instead
+                log.warning(
+                    "Could not prewarm the %s feed %s: %s", feed.name, feed.params, e
+                )
+
+        self._version = version
+        log.info(
+            "Feeds prewarmed in %.2f seconds: %d cached",
+            monotonic() - started_at,
+            cached,
+        )
+
+    def stop(self):
+        self._stop_event.set()
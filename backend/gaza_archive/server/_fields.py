@@ -0,0 +1,200 @@
+from enum import Enum
+from typing import Annotated, Any, get_args
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, create_model
+
+from ..model import Account, api_split_args
+from ._responses import OrjsonResponse
+
+# Selected fields, by name. Nested objects map to the tree of their selected
+# fields, and None selects the whole value.
+FieldTree = dict[str, "FieldTree | None"]
+
+fields_description = (
+    "Only return these fields of the items (comma-separated, or repeated). "
+    "Fields of nested objects are selected with dots, e.g. `author.fqn`."
+)
+include_description = (
+    "With `author`, the authors are returned once, in a top-level `accounts` "
+    "map by URL, and the items reference them by URL. The response is then an "
+    "object with the items under `items`."
+)
+
+
+class ApiInclude(str, Enum):
+    """
+    Related objects that can be side-loaded by the list endpoints.
+    """
+
+    AUTHOR = "author"
+
+
+PartialItems = Annotated[
+    list[dict[str, Any]],
+    Field(
+        title="Partial items",
+        description="The items, with only the fields selected by `fields`.",
+    ),
+]
+
+_response_models: dict[type[BaseModel], Any] = {}
+
+
+def shaped_response_model(model: type[BaseModel]) -> Any:
+    """
+    :return: The response model of a list endpoint that supports sparse
+        fieldsets and side-loading (see :func:`shaped_response`): the list of
+        items, the list of partial items with ``fields``, or the
+        ``items``/``accounts`` object with ``include=author``. It's only used
+        for the OpenAPI schema, as the handlers return the response.
+    """
+    if model not in _response_models:
+        with_authors = create_model(
+            f"{model.__name__}ListWithAuthors",
+            __doc__=f"{model.__name__} list with ``include=author``.",
+            items=(
+                list[dict[str, Any]],
+                Field(
+                    description=(
+                        "The items, with the URL of their author as `author`, "
+                        "and only the fields selected by `fields`, if any."
+                    ),
+                ),
+            ),
+            accounts=(
+                dict[str, Account | dict[str, Any]],
+                Field(
+                    description=(
+                        "The authors of the items, by URL. With `fields`, "
+                        "only their fields selected under `author.`."
+                    ),
+                ),
+            ),
+        )
+        _response_models[model] = list[model] | PartialItems | with_authors
+
+    return _response_models[model]
+
+
+def _nested_model(annotation: Any) -> type[BaseModel] | None:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model:
+            return model
+
+    return None
+
+
+def _model_fields(model: type[BaseModel]) -> dict[str, type[BaseModel] | None]:
+    """
+    :return: The serialized fields of a model, including the computed ones,
+        with the model of their nested objects, if any.
+    """
+    return {
+        **{
+            name: _nested_model(field.annotation)
+            for name, field in model.model_fields.items()
+        },
+        **{
+            name: _nested_model(field.return_type)
+            for name, field in model.model_computed_fields.items()
+        },
+    }
+
+
+def parse_fields(fields: list[str], model: type[BaseModel]) -> FieldTree:
+    """
+    Parse a sparse fieldset, e.g. ``["id,content", "author.fqn"]``.
+
+    :param fields: Field paths, comma-separated or as separate values.
+    :param model: Model of the items.
+    :raises ValueError: If a field doesn't exist.
+    """
+    tree: FieldTree = {}
+    for path in api_split_args(fields):
+        node: FieldTree = tree
+        node_model: type[BaseModel] | None = model
+        names = path.split(".")
+        for depth, name in enumerate(names):
+            if not node_model or name not in _model_fields(node_model):
+                raise ValueError(f"Unknown field: {path}")
+
+            if depth == len(names) - 1:
+                node[name] = None
+                break
+
+            if name in node and node[name] is None:
+                # The whole object is already selected
+                break
+
+            node = node.setdefault(name, {})  # type: ignore[assignment]
+            node_model = _model_fields(node_model)[name]
+
+    return tree
+
+
+def shape(
+    value: Any,
+    fields: FieldTree | None,
+    accounts: dict[str, Any] | None = None,
+) -> Any:
+    """
+    Select the fields of serialized items, and optionally side-load their
+    authors. The items aren't modified.
+
+    :param value: A serialized item, or a list of them.
+    :param fields: The selected fields, or None for all of them.
+    :param accounts: If set, the ``author`` objects are moved to this map,
+        by URL, and replaced by their URL.
+    """
+    if fields is None and accounts is None:
+        return value
+    if isinstance(value, list):
+        return [shape(item, fields, accounts) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    shaped = {}
+    names = value if fields is None else [name for name in fields if name in value]
+    for name in names:
+        item = value[name]
+        subfields = fields[name] if fields is not None else None
+        if name == "author" and accounts is not None and isinstance(item, dict):
+            if item["url"] not in accounts:
+                accounts[item["url"]] = shape(item, subfields)
+            shaped[name] = item["url"]
+        else:
+            shaped[name] = shape(item, subfields, accounts)
+
+    return shaped
+
+
+def shaped_response(
+    items: list[dict[str, Any]],
+    model: type[BaseModel],
+    fields: list[str] | None = None,
+    include: list[ApiInclude] | None = None,
+) -> OrjsonResponse:
+    """
+    :param items: Serialized items, e.g. from the ``get_*_dicts`` methods of
+        :class:`gaza_archive.db.Db`.
+    :param model: Model of the items, to validate the fields.
+    :param fields: Sparse fieldset (see :func:`parse_fields`).
+    :param include: Related objects to side-load.
+    :raises HTTPException: 400 if a field doesn't exist.
+    """
+    try:
+        field_tree = parse_fields(fields, model) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    if not (include and ApiInclude.AUTHOR in include):
+        return OrjsonResponse(shape(items, field_tree))
+
+    accounts: dict[str, Any] = {}
+    shaped = shape(items, field_tree, accounts)
+    return OrjsonResponse({"items": shaped, "accounts": accounts})
@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+from ._compression import negotiate
+from ._ctx import get_ctx
+
+# For files whose content never changes for a given URL: the archived media,
+# and the frontend assets, whose names contain a hash of their content
+immutable_cache_control = "public, max-age=31536000, immutable"
+
+
+def send_file(
+    path: Path,
+    root: Path,
+    location: str,
+    headers: dict[str, str] | None = None,
+    **kwargs,
+) -> Response:
+    """
+    Send a file, either through the reverse proxy or from this process.
+
+    If ``ACCEL_REDIRECT_PREFIX`` is set, the response is empty and it has an
+    ``X-Accel-Redirect`` header to ``{prefix}/{location}/{path}``, so nginx
+    serves the file from an internal location that maps ``root``. Otherwise
+    it's a :class:`FileResponse`, which also handles range requests.
+
+    Any access checks must be done before calling it.
+
+    :param path: Resolved path of the file.
+    :param root: Resolved path of the directory that ``location`` maps.
+    :param location: Name of the internal location of the file, under the
+        prefix: ``data`` for ``STORAGE_PATH`` and ``dist`` for the frontend
+        build.
+    :param headers: Extra response headers, e.g. ``Cache-Control``. nginx
+        keeps them when it serves the file.
+    :param kwargs: Extra arguments for the :class:`FileResponse`.
+    """
+    headers = headers or {}
+    prefix = get_ctx().config.accel_redirect_prefix
+    if prefix:
+        uri = f"{prefix}/{location}/{quote(path.relative_to(root).as_posix())}"
+        return Response(headers={**headers, "X-Accel-Redirect": uri})
+
+    return FileResponse(path, headers=headers, **kwargs)
+
+
+class AssetFiles(StaticFiles):
+    """
+    Static files of the frontend build, served with immutable cache headers
+    and offloaded to nginx if ``ACCEL_REDIRECT_PREFIX`` is set.
+
+    Files are served from their precompressed ``.br``/``.gz`` siblings,
+    generated by the frontend build, when the client accepts them.
+    """
+
+    # The precompressed siblings, by encoding
+    precompressed = {"br": ".br", "gzip": ".gz"}
+
+    def __init__(self, directory: str, dist_dir: str):
+        """
+        :param directory: Directory of the assets.
+        :param dist_dir: Directory of the frontend build, mapped by the
+            ``dist`` internal location.
+        """
+        super().__init__(directory=directory)
+        self.dist_dir = Path(dist_dir).resolve()
+
+    def file_response(
+        self,
+        full_path: str | Path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        headers = {"Cache-Control": immutable_cache_control}
+        if get_ctx().config.accel_redirect_prefix:
+            return send_file(
+                Path(full_path).resolve(), self.dist_dir, "dist", headers=headers
+            )
+
+        headers["Vary"] = "Accept-Encoding"
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        for encoding, suffix in self.precompressed.items():
+            if not negotiate(accept_encoding, available=(encoding,)):
+                continue
+
+            sibling = f"{full_path}{suffix}"
+            try:
+                sibling_stat = os.stat(sibling)
+            except FileNotFoundError:
+                continue
+
+            # The content type is still guessed from the original extension
+            response = super().file_response(sibling, sibling_stat, scope, status_code)
+            response.headers.update(headers)
+            response.headers["Content-Encoding"] = encoding
+            return response
+
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers.update(headers)
+        return response
@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+from hashlib import sha256
+from threading import Lock
+from typing import Callable
+
+from jinja2 import Template
+
+from ..db import Db
+from ..model import Account, BotName
+
+
+def get_bots_info(db: Db) -> tuple[dict | None, dict | None]:
+    """
+    :return: The ``url`` and ``fqn`` of the accounts and campaigns bots, as
+        stored by the crawler. It never makes HTTP requests.
+    """
+    account_urls = db.get_bot_account_urls()
+    return tuple(  # type: ignore
+        {"url": url, "fqn": Account(url=url).fqn} if url else None
+        for url in (
+            account_urls.get(BotName.ACCOUNTS.value),
+            account_urls.get(BotName.CAMPAIGNS.value),
+        )
+    )
+
+
+@dataclass
+class RenderedPage:
+    """
+    A rendered page and its strong ETag.
+    """
+
+    version: int
+    body: bytes
+    etag: str
+    # Compressed versions of the body, by encoding
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+
+class IndexPage:
+    """
+    The rendered index page.
+
+    The page only depends on the list of accounts and on the bots info, so it
+    is rendered once and cached until their data version changes.
+    """
+
+    def __init__(self, template: Template, get_db: Callable[[], Db]):
+        """
+        :param template: The compiled index template.
+        :param get_db: Returns the database used to check the data version
+            and to fetch the accounts. It's called on each :meth:`get`, rather
+            than here, so the database isn't opened when the module is
+            imported.
+        """
+        self.template = template
+        self.get_db = get_db
+        self._page: RenderedPage | None = None
+        self._lock = Lock()
+
+    def get(self) -> RenderedPage:
+        """
+        :return: The cached page, or a freshly rendered one if the accounts or
+            the bots info changed since the last render.
+        """
+        db = self.get_db()
+        version, _ = db.get_data_version(scopes=("accounts", "bots"))
+        page = self._page
+        if page and page.version == version:
+            return page
+
+        with self._lock:
+            if self._page and self._page.version == version:
+                return self._page
+
+            bot_account_info, bot_campaign_info = get_bots_info(db)
+            body = self.template.render(
+                accounts=[Account(url=url) for url in db.get_account_urls()],
+                bot_account_info=bot_account_info,
+                bot_campaign_info=bot_campaign_info,
+            ).encode()
+
+            self._page = RenderedPage(
+                version=version,
+                body=body,
+                etag=f'"{sha256(body).hexdigest()[:32]}"',
+            )
+            return self._page
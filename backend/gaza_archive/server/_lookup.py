@@ -0,0 +1,50 @@
+from typing import Any, Callable
+
+from pydantic import BaseModel, Field
+
+from ..model import api_is_url
+
+# Maximum number of items that can be resolved by a single lookup request
+max_lookup_refs = 100
+
+
+class LookupRequest(BaseModel):
+    """
+    Body of the batch lookup endpoints.
+    """
+
+    refs: list[str] = Field(
+        ...,
+        min_length=1,
+        max_length=max_lookup_refs,
+        description=(
+            f"References of the items to resolve (at most {max_lookup_refs}): "
+            "URLs or IDs for posts and media, URLs or FQNs for accounts."
+        ),
+    )
+
+
+def lookup_dicts(
+    refs: list[str], get_dicts: Callable[..., list[dict[str, Any]]]
+) -> dict[str, dict[str, Any] | None]:
+    """
+    Resolve a batch of item references with at most one query by URL and one
+    by ID, so each of them can use its own index.
+
+    :param refs: URLs or IDs of the items.
+    :param get_dicts: A ``get_*_dicts`` method of
+        :class:`gaza_archive.db.Db` that accepts ``urls`` and ``ids`` filters.
+    :return: Each reference mapped to its item, or None if it wasn't found.
+        If several items share an ID, the first one returned is used.
+    """
+    urls = list(dict.fromkeys(ref for ref in refs if api_is_url(ref)))
+    ids = list(dict.fromkeys(ref for ref in refs if not api_is_url(ref)))
+    by_url: dict[str, dict[str, Any]] = {}
+    by_id: dict[str, dict[str, Any]] = {}
+    if urls:
+        by_url = {item["url"]: item for item in get_dicts(urls=urls)}
+    if ids:
+        for item in get_dicts(ids=ids):
+            by_id.setdefault(item["id"], item)
+
+    return {ref: by_url.get(ref) if api_is_url(ref) else by_id.get(ref) for ref in refs}
@@ -0,0 +1,346 @@
+import math
+import re
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import sha256
+from logging import getLogger
+from threading import Lock
+from typing import Collection
+
+from fastapi import Request
+from starlette.datastructures import QueryParams
+
+from ..config import Config
+from ..model import api_split_args
+
+log = getLogger(__name__)
+
+# Only the API is rate limited. The frontend, its assets and the media files
+# are cheap to serve, and usually offloaded to nginx.
+rate_limited_path_prefix = "/api/"
+
+# Endpoints that aggregate donations, whose cost depends on their parameters
+aggregate_paths = re.compile(r"^/api/v1/campaigns/(accounts(/[^/]+)?|donors)$")
+# Endpoints with a fixed cost, by path prefix. Everything else costs 1.
+fixed_costs = {"/api/v1/export/": 10}
+
+# Days covered by each time bucket of the aggregates
+time_bucket_days = {"day": 1, "week": 7, "month": 30, "year": 365}
+# Time range assumed for the aggregates without start or end time, in days
+unbounded_range_days = 730
+# Rows assumed for the aggregates without limit
+unbounded_limit = 1000
+
+
+def _parse_time(value: str | None) -> datetime | None:
+    if not value:
+        return None
+
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _range_days(params: QueryParams) -> float:
+    start = _parse_time(params.get("start_time"))
+    end = _parse_time(params.get("end_time"))
+    if not (start and end):
+        return unbounded_range_days
+
+    try:
+        days = (end - start).total_seconds() / 86400
+    except TypeError:
+        # Naive and aware datetimes
+        return unbounded_range_days
+
+    return min(max(days, 1), unbounded_range_days)
+
+
+def aggregate_cost(params: QueryParams) -> int:
+    """
+    Estimate the cost of a donations aggregate query: each ``group_by``
+    dimension costs 1, plus 1 for each 100 time buckets in the requested time
+    range, and 1 for each 100 rows of the limit.
+
+    :param params: Query parameters of the request.
+    """
+    group_by = api_split_args(params.getlist("group_by"))
+    # The implicit account or donor dimension, plus the base cost
+    cost = 2 + len(group_by)
+    for field in group_by:
+        _, _, unit = field.partition(":")
+        if unit in time_bucket_days:
+            cost += math.ceil(_range_days(params) / time_bucket_days[unit] / 100)
+
+    try:
+        limit = int(params["limit"]) if params.get("limit") else unbounded_limit
+    except ValueError:
+        limit = unbounded_limit
+
+    return cost + math.ceil(min(max(limit, 1), unbounded_limit) / 100)
+
+
+def request_cost(request: Request) -> int:
+    """
+    :return: The number of tokens taken by a request.
+    """
+    path = request.url.path
+    if aggregate_paths.match(path):
+        return aggregate_cost(request.query_params)
+
+    for prefix, cost in fixed_costs.items():
+        if path.startswith(prefix):
+            return cost
+
+    return 1
+
+
+def _refill(
+    tokens: float, updated_at: float, now: float, capacity: float, rate: float
+) -> float:
+    return min(capacity, tokens + max(now - updated_at, 0) * rate)
+
+
+class BucketStore(ABC):
+    """
+    Storage of the token buckets of the clients.
+    """
+
+    @abstractmethod
+    def take(
+        self, key: str, cost: float, capacity: float, rate: float
+    ) -> tuple[bool, float]:
+        """
+        Take tokens from a bucket, after refilling it, if it has enough.
+
+        :param key: Identifier of the client.
+        :param cost: Number of tokens to take.
+        :param capacity: Size of the bucket. New buckets start full.
+        :param rate: Tokens added to the bucket per second.
+        :return: Whether the tokens were taken, and the tokens left.
+        """
+
+
+class MemoryBucketStore(BucketStore):
+    """
+    Token buckets kept in the memory of the process. Each API worker process
+    has its own buckets.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        """
+        :param max_keys: Maximum number of buckets. The least recently used
+            ones are dropped first, which resets them to full.
+        """
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def take(
+        self, key: str, cost: float, capacity: float, rate: float
+    ) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = _refill(*bucket, now, capacity, rate) if bucket else capacity
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, tokens
+
+
+class SqliteBucketStore(BucketStore):
+    """
+    Token buckets stored in a SQLite file, shared by all the API worker
+    processes that use the same file.
+    """
+
+    # Drop the buckets idle for longer than this, in seconds. They would be
+    # full again anyway, unless the refill rate is really low.
+    idle_ttl = 3600
+    # Number of takes between two cleanups of the idle buckets
+    cleanup_interval = 1000
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the SQLite file. It's created if it doesn't exist.
+        """
+        self.path = path
+        self._lock = Lock()
+        self._takes = 0
+        self._conn = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def take(
+        self, key: str, cost: float, capacity: float, rate: float
+    ) -> tuple[bool, float]:
+        # Wall clock time, as it's shared with the other processes
+        now = time.time()
+        with self._lock:
+            # Lock the database for writing, so concurrent takes from other
+            # processes are serialized
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                tokens = _refill(*row, now, capacity, rate) if row else capacity
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets "
+                    "(key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+
+                self._takes += 1
+                if self._takes % self.cleanup_interval == 0:
+                    self._conn.execute(
+                        "DELETE FROM rate_limit_buckets WHERE updated_at < ?",
+                        (now - self.idle_ttl,),
+                    )
+
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return allowed, tokens
+
+
+@dataclass
+class RateLimit:
+    """
+    Outcome of the rate limit check of a request.
+    """
+
+    allowed: bool
+    cost: int
+    capacity: int
+    remaining: float
+    rate: float
+
+    @property
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.capacity),
+            "X-RateLimit-Remaining": str(math.floor(self.remaining)),
+            # Seconds until the bucket is full again
+            "X-RateLimit-Reset": str(
+                math.ceil((self.capacity - self.remaining) / self.rate)
+            ),
+            "X-RateLimit-Cost": str(self.cost),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(
+                math.ceil((self.cost - self.remaining) / self.rate)
+            )
+        return headers
+
+
+class RateLimiter:
+    """
+    Per-client token bucket rate limiter of the API.
+
+    Each client has a bucket of ``capacity`` tokens, refilled at ``rate``
+    tokens per second, and each request takes tokens from it according to
+    its estimated cost (see :func:`request_cost`). Clients are identified by
+    their API token, if it's one of the configured ones, or by their IP
+    address otherwise.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        rate: float,
+        store: BucketStore,
+        tokens: Collection[str] = (),
+    ):
+        """
+        :param capacity: Maximum number of tokens of a client, i.e. the
+            maximum burst.
+        :param rate: Tokens given back to each client per second.
+        :param store: Storage of the buckets.
+        :param tokens: API tokens that identify their clients, passed in the
+            ``Authorization: Bearer <token>`` header.
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.store = store
+        self.tokens = frozenset(tokens)
+
+    @classmethod
+    def from_config(cls, config: Config) -> "RateLimiter | None":
+        """
+        :return: The rate limiter configured by ``RATE_LIMIT_*``, or None if
+            rate limiting is disabled.
+        """
+        if config.rate_limit_capacity <= 0 or config.rate_limit_rate <= 0:
+            return None
+
+        store: BucketStore = (
+            SqliteBucketStore(config.rate_limit_store)
+            if config.rate_limit_store
+            else MemoryBucketStore()
+        )
+        return cls(
+            capacity=config.rate_limit_capacity,
+            rate=config.rate_limit_rate,
+            store=store,
+            tokens=config.rate_limit_tokens,
+        )
+
+    def client_key(self, request: Request) -> str:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token in self.tokens:
+            # Don't keep the tokens themselves in the store
+            return f"token:{sha256(token.encode()).hexdigest()[:32]}"
+
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def check(self, request: Request) -> RateLimit:
+        """
+        Take the cost of a request from the bucket of its client. It may
+        block on the store, so it should run on a thread pool.
+        """
+        # Expensive requests can still run on a full bucket
+        cost = min(request_cost(request), self.capacity)
+        allowed, remaining = self.store.take(
+            self.client_key(request), cost, self.capacity, self.rate
+        )
+        if not allowed:
+            log.debug(
+                "Rate limit exceeded by %s on %s %s (cost: %d)",
+                self.client_key(request),
+                request.method,
+                request.url.path,
+                cost,
+            )
+
+        return RateLimit(
+            allowed=allowed,
+            cost=cost,
+            capacity=self.capacity,
+            remaining=remaining,
+            rate=self.rate,
+        )
@@ -0,0 +1,17 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSON response serialized with orjson.
+
+    Routes that return it directly bypass FastAPI's ``response_model``
+    validation, so the content must already have the documented shape (see the
+    ``get_*_dicts`` methods of :class:`gaza_archive.db.Db`).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
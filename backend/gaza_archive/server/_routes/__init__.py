@@ -0,0 +1,20 @@
+from ._accounts import router as accounts_router
+from ._campaigns import router as campaigns_router
+from ._export import router as export_router
+from ._internal import router as internal_router
+from ._media import router as media_router
+from ._posts import router as posts_router
+from ._stream import router as stream_router
+
+# Routers of the API, included by :func:`gaza_archive.server.create_app`
+routers = [
+    accounts_router,
+    campaigns_router,
+    export_router,
+    internal_router,
+    media_router,
+    posts_router,
+    stream_router,
+]
+
+__all__ = ["routers"]
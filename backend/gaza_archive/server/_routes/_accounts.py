@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Path, Query, Response
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
 
 from ...model import Account, Media, Post
 from ...model.suspension import (
@@ -10,7 +10,16 @@ from ...model.suspension import (
     SuspensionState,
 )
 from .. import get_ctx
-from ..feeds import FeedsGenerator
+from .._app import analytics_lane, feed_cache, lookup_lane
+from .._feeds import accounts_feed, media_feed, posts_feed, serve_feed
+from .._fields import (
+    ApiInclude,
+    fields_description,
+    include_description,
+    shaped_response,
+    shaped_response_model,
+)
+from .._lookup import LookupRequest
 
 router = APIRouter(prefix="/api/v1/accounts", tags=["accounts"])
 
@@ -22,7 +31,8 @@ def _get_account_posts(
     max_id: int | None = None,
     limit: int | None = None,
     offset: int | None = None,
-) -> list[Post]:
+    as_dicts: bool = False,
+) -> list[Post] | list[dict]:
     try:
         account_url = Account.to_url(account)
     except ValueError as e:
@@ -41,8 +51,9 @@ def _get_account_posts(
     if ctx.config.hide_replies:
         exclude_replies = True
 
+    get_posts = ctx.db.get_post_dicts if as_dicts else ctx.db.get_posts
     return list(
-        ctx.db.get_posts(
+        get_posts(
             exclude_replies=exclude_replies,
             account=account_url,
             min_id=min_id,
@@ -59,7 +70,8 @@ def _get_account_media(
     max_id: int | None = None,
     limit: int | None = None,
     offset: int | None = None,
-) -> list[Media]:
+    as_dicts: bool = False,
+) -> list[Media] | list[dict]:
     try:
         account_url = Account.to_url(account)
     except ValueError as e:
@@ -75,7 +87,10 @@ def _get_account_media(
     if ctx.config.hide_all_user_content:
         return []
 
-    return ctx.db.get_attachments(
+    get_attachments = (
+        ctx.db.get_attachment_dicts if as_dicts else ctx.db.get_attachments
+    )
+    return get_attachments(
         account=account_url,
         min_id=min_id,
         max_id=max_id,
@@ -89,6 +104,7 @@ def _is_inactive_state(state: str | None) -> bool:
 
 
 @router.get("", response_model=list[Account])
+@lookup_lane
 def get_accounts(
     response: Response,
     limit: int | None = Query(
@@ -109,40 +125,29 @@ def get_accounts(
     Get all accounts.
     """
     ctx = get_ctx()
-    all_accounts = list(ctx.db.get_accounts().values())
-
+    counts = ctx.db.count_accounts_by_state()
     if state:
-        filtered_by_state = [
-            account for account in all_accounts if account.state == state.value
-        ]
-    else:
-        filtered_by_state = all_accounts
+        counts = {state.value: counts.get(state.value, 0)}
 
-    total_count = len(filtered_by_state)
+    total_count = sum(counts.values())
     inactive_count = sum(
-        1 for account in filtered_by_state if _is_inactive_state(account.state)
+        count
+        for account_state, count in counts.items()
+        if _is_inactive_state(account_state)
     )
 
-    if hide_inactive:
-        filtered = [
-            account
-            for account in filtered_by_state
-            if not _is_inactive_state(account.state)
-        ]
-    else:
-        filtered = filtered_by_state
-
-    start = offset or 0
-    end = start + limit if limit is not None else None
-    paginated = filtered[start:end]
+    accounts = ctx.db.get_accounts(
+        limit=limit, offset=offset, state=state, hide_inactive=hide_inactive
+    )
 
     response.headers["X-Total-Count"] = str(total_count)
     response.headers["X-Inactive-Count"] = str(inactive_count)
-    return paginated
+    return list(accounts.values())
 
 
 @router.get("/rss", response_model=str)
-def get_accounts_feed(
+async def get_accounts_feed(
+    request: Request,
     limit: int | None = Query(
         None, description="Maximum number of accounts to return."
     ),
@@ -154,35 +159,27 @@ def get_accounts_feed(
     """
     Get all accounts (RSS feed).
     """
-    ctx = get_ctx()
-    accounts = list(ctx.db.get_accounts(limit=limit, offset=offset).values())
-    return Response(
-        content=FeedsGenerator(ctx.config).generate_accounts_feed(accounts),
-        media_type="application/rss+xml",
+    return await serve_feed(
+        request,
+        accounts_feed(limit=limit, offset=offset),
+        lookup_lane,
+        feed_cache,
     )
 
 
 @router.get("/stats")
+@analytics_lane
 def get_accounts_stats() -> dict:
     """
     Get account statistics by suspension state.
     """
-    ctx = get_ctx()
-    all_accounts = list(ctx.db.get_accounts().values())
+    counts = get_ctx().db.count_accounts_by_state()
 
-    total = len(all_accounts)
+    total = sum(counts.values())
     by_state: dict[str, int] = {}
     for state in SuspensionState:
-        by_state[state.value] = 0
-    unknown = 0
-    for account in all_accounts:
-        account_state = account.state
-        if account_state is None:
-            unknown += 1
-        elif account_state in by_state:
-            by_state[account_state] += 1
-        else:
-            unknown += 1
+        by_state[state.value] = counts.get(state.value, 0)
+    unknown = total - sum(by_state.values())
 
     if unknown:
         by_state["UNKNOWN"] = unknown
@@ -198,12 +195,31 @@ def get_accounts_stats() -> dict:
     }
 
 
+@router.post("/lookup", response_model=dict[str, Account | None])
+@lookup_lane
+def lookup_accounts(request: LookupRequest) -> dict[str, Account | None]:
+    """
+    Resolve a batch of accounts by URL or FQN, in one query. Accounts that
+    don't exist are mapped to null.
+    """
+    try:
+        urls = {ref: Account.to_url(ref) for ref in request.refs}
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid account format: {e}"
+        ) from e
+
+    accounts = get_ctx().db.get_accounts(urls=list(set(urls.values())))
+    return {ref: accounts.get(url) for ref, url in urls.items()}
+
+
 @router.get("/{account}", response_model=Account)
+@lookup_lane
 def get_account(
     account: str = Path(
         ...,
         description="Account FQN, in the format `@username@instance`, or full URL.",
-    )
+    ),
 ) -> Account:
     """
     Get account by URL.
@@ -221,7 +237,8 @@ def get_account(
     return db_account
 
 
-@router.get("/{account}/posts", response_model=list[Post])
+@router.get("/{account}/posts", response_model=shaped_response_model(Post))
+@lookup_lane
 def get_account_posts(
     account: str = Path(
         ...,
@@ -241,22 +258,31 @@ def get_account_posts(
         None,
         description="Number of posts to skip before starting to collect the result set.",
     ),
-) -> list[Post]:
+    fields: list[str] | None = Query(None, description=fields_description),
+    include: list[ApiInclude] | None = Query(None, description=include_description),
+) -> Response:
     """
     Get posts for a specific account.
     """
-    return _get_account_posts(
-        account=account,
-        exclude_replies=exclude_replies,
-        min_id=min_id,
-        max_id=max_id,
-        limit=limit,
-        offset=offset,
+    return shaped_response(
+        _get_account_posts(  # type: ignore[arg-type]
+            account=account,
+            exclude_replies=exclude_replies,
+            min_id=min_id,
+            max_id=max_id,
+            limit=limit,
+            offset=offset,
+            as_dicts=True,
+        ),
+        Post,
+        fields,
+        include,
     )
 
 
 @router.get("/{account}/posts/rss", response_model=str)
-def get_account_posts_feed(
+async def get_account_posts_feed(
+    request: Request,
     account: str = Path(
         ...,
         description="Account FQN, in the format `@username@instance`, or full URL.",
@@ -279,25 +305,23 @@ def get_account_posts_feed(
     """
     Get posts for a specific account (RSS feed).
     """
-    posts = _get_account_posts(
-        account=account,
-        exclude_replies=exclude_replies,
-        min_id=min_id,
-        max_id=max_id,
-        limit=limit,
-        offset=offset,
-    )
-
-    ctx = get_ctx()
-    return Response(
-        content=FeedsGenerator(ctx.config).generate_posts_feed(
-            posts=posts, account=ctx.db.get_account(Account.to_url(account))
+    return await serve_feed(
+        request,
+        posts_feed(
+            account=account,
+            exclude_replies=exclude_replies,
+            min_id=min_id,
+            max_id=max_id,
+            limit=limit,
+            offset=offset,
         ),
-        media_type="application/rss+xml",
+        lookup_lane,
+        feed_cache,
     )
 
 
-@router.get("/{account}/media", response_model=list[Media])
+@router.get("/{account}/media", response_model=shaped_response_model(Media))
+@lookup_lane
 def get_account_media(
     account: str = Path(
         ...,
@@ -316,21 +340,30 @@ def get_account_media(
         None,
         description="Number of media items to skip before starting to collect the result set.",
     ),
-) -> list[Media]:
+    fields: list[str] | None = Query(None, description=fields_description),
+    include: list[ApiInclude] | None = Query(None, description=include_description),
+) -> Response:
     """
     Get media attachments for a specific account.
     """
-    return _get_account_media(
-        account=account,
-        min_id=min_id,
-        max_id=max_id,
-        limit=limit,
-        offset=offset,
+    return shaped_response(
+        _get_account_media(  # type: ignore[arg-type]
+            account=account,
+            min_id=min_id,
+            max_id=max_id,
+            limit=limit,
+            offset=offset,
+            as_dicts=True,
+        ),
+        Media,
+        fields,
+        include,
     )
 
 
 @router.get("/{account}/media/rss", response_model=str)
-def get_account_media_feed(
+async def get_account_media_feed(
+    request: Request,
     account: str = Path(
         ...,
         description="Account FQN, in the format `@username@instance`, or full URL.",
@@ -352,24 +385,22 @@ def get_account_media_feed(
     """
     Get media attachments for a specific account (RSS feed).
     """
-    media = _get_account_media(
-        account=account,
-        min_id=min_id,
-        max_id=max_id,
-        limit=limit,
-        offset=offset,
-    )
-
-    ctx = get_ctx()
-    return Response(
-        content=FeedsGenerator(ctx.config).generate_media_feed(
-            media, account=ctx.db.get_account(Account.to_url(account))
+    return await serve_feed(
+        request,
+        media_feed(
+            account=account,
+            min_id=min_id,
+            max_id=max_id,
+            limit=limit,
+            offset=offset,
         ),
-        media_type="application/rss+xml",
+        lookup_lane,
+        feed_cache,
     )
 
 
 @router.get("/{account}/suspensions", response_model=List[AccountSuspensionState])
+@lookup_lane
 def get_account_suspensions(
     account: str = Path(
         ...,
@@ -418,6 +449,7 @@ def get_account_suspensions(
 @router.get(
     "/{account}/suspensions/audit", response_model=List[AccountSuspensionStateAudit]
 )
+@lookup_lane
 def get_account_suspensions_audit(
     account: str = Path(
         ...,
@@ -1,16 +1,30 @@
 from datetime import datetime
 from typing import Collection
 
-from fastapi import APIRouter, Path, Query
+from fastapi import APIRouter, Path, Query, Request
 from fastapi.responses import Response
 
+from ...db import QueryBudget
 from ...model import ApiSortType, CampaignDonationInfo, CampaignStats, api_split_args
 from .. import get_ctx
-from ..feeds import FeedsGenerator
+from .._app import analytics_lane, feed_cache, lookup_lane
+from .._feeds import donations_feed, serve_feed
+from .._responses import OrjsonResponse
 
 router = APIRouter(prefix="/api/v1/campaigns", tags=["campaigns"])
 
 
+def _query_budget():
+    """
+    Budget of the campaign queries, which can aggregate the whole donations
+    table depending on their filters.
+    """
+    config = get_ctx().config
+    return QueryBudget.limit(
+        config.api_query_timeout or None, max_rows=config.api_max_rows or None
+    )
+
+
 def _get_campaigns(
     *,
     accounts: str | Collection[str] | None = None,
@@ -39,18 +53,19 @@ def _get_campaigns(
         [ApiSortType.parse(arg) for arg in api_split_args(sort)] if sort else None
     )
 
-    return get_ctx().db.get_campaigns(
-        accounts=accounts,
-        donors=donors,
-        start_time=start_time_dt,
-        end_time=end_time_dt,
-        group_by=group_by,
-        sort=sort_keys,
-        limit=limit,
-        offset=offset,
-        currency=currency,
-        show_deleted=show_deleted,
-    )
+    with _query_budget():
+        return get_ctx().db.get_campaigns(
+            accounts=accounts,
+            donors=donors,
+            start_time=start_time_dt,
+            end_time=end_time_dt,
+            group_by=group_by,
+            sort=sort_keys,
+            limit=limit,
+            offset=offset,
+            currency=currency,
+            show_deleted=show_deleted,
+        )
 
 
 def _get_donations(
@@ -64,34 +79,41 @@ def _get_donations(
     offset: int | None = None,
     currency: str | None = None,
     show_deleted: bool = False,
-) -> list[CampaignDonationInfo]:
+    as_dicts: bool = False,
+) -> list[CampaignDonationInfo] | list[dict]:
     """
     Get campaigns donations.
     """
-    return get_ctx().db.get_donations(
-        accounts=accounts,
-        donors=donors,
-        start_time=(
-            datetime.fromisoformat(start_time.replace("Z", "+00:00"))
-            if start_time
-            else None
-        ),
-        end_time=(
-            datetime.fromisoformat(end_time.replace("Z", "+00:00"))
-            if end_time
-            else None
-        ),
-        sort=(
-            [ApiSortType.parse(arg) for arg in api_split_args(sort)] if sort else None
-        ),
-        limit=limit,
-        offset=offset,
-        currency=currency,
-        show_deleted=show_deleted,
-    )
+    db = get_ctx().db
+    get_donations = db.get_donation_dicts if as_dicts else db.get_donations
+    with _query_budget():
+        return get_donations(
+            accounts=accounts,
+            donors=donors,
+            start_time=(
+                datetime.fromisoformat(start_time.replace("Z", "+00:00"))
+                if start_time
+                else None
+            ),
+            end_time=(
+                datetime.fromisoformat(end_time.replace("Z", "+00:00"))
+                if end_time
+                else None
+            ),
+            sort=(
+                [ApiSortType.parse(arg) for arg in api_split_args(sort)]
+                if sort
+                else None
+            ),
+            limit=limit,
+            offset=offset,
+            currency=currency,
+            show_deleted=show_deleted,
+        )
 
 
 @router.get("/accounts", response_model=CampaignStats)
+@analytics_lane
 def get_accounts_campaigns(
     accounts: list[str] = Query(
         [],
@@ -178,6 +200,7 @@ def get_accounts_campaigns(
 
 
 @router.get("/accounts/{account}", response_model=CampaignStats)
+@analytics_lane
 def get_account_campaigns(
     account: str = Path(
         ...,
@@ -264,6 +287,7 @@ def get_account_campaigns(
 
 
 @router.get("/donations", response_model=list[CampaignDonationInfo])
+@lookup_lane
 def get_donations(
     accounts: list[str] = Query(
         [],
@@ -312,22 +336,26 @@ def get_donations(
     """
 
     try:
-        return _get_donations(
-            accounts=accounts,
-            donors=donors,
-            start_time=start_time,
-            end_time=end_time,
-            sort=sort,
-            limit=limit,
-            offset=offset,
-            currency=currency,
-            show_deleted=show_deleted,
+        return OrjsonResponse(
+            _get_donations(
+                accounts=accounts,
+                donors=donors,
+                start_time=start_time,
+                end_time=end_time,
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                currency=currency,
+                show_deleted=show_deleted,
+                as_dicts=True,
+            )
         )
     except PermissionError as e:
         return Response(content=str(e), status_code=403)
 
 
 @router.get("/accounts/{account}/donations", response_model=list[CampaignDonationInfo])
+@lookup_lane
 def get_account_donations(
     account: str = Path(
         ...,
@@ -376,22 +404,26 @@ def get_account_donations(
     """
 
     try:
-        return _get_donations(
-            accounts=[account],
-            donors=donors,
-            start_time=start_time,
-            end_time=end_time,
-            sort=sort,
-            limit=limit,
-            offset=offset,
-            currency=currency,
-            show_deleted=show_deleted,
+        return OrjsonResponse(
+            _get_donations(
+                accounts=[account],
+                donors=donors,
+                start_time=start_time,
+                end_time=end_time,
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                currency=currency,
+                show_deleted=show_deleted,
+                as_dicts=True,
+            )
         )
     except PermissionError as e:
         return Response(content=str(e), status_code=403)
 
 
 @router.get("/donors", response_model=CampaignStats)
+@analytics_lane
 def get_accounts_donors(
     accounts: list[str] = Query(
         [],
@@ -479,7 +511,8 @@ def get_accounts_donors(
 
 
 @router.get("/donations/rss", response_model=str)
-def get_donations_feed(
+async def get_donations_feed(
+    request: Request,
     accounts: list[str] = Query(
         [],
         description="Filter by account URLs or FQDNs. Wildcards are supported.",
@@ -521,29 +554,26 @@ def get_donations_feed(
     """
     Get donations (RSS feed).
     """
-    ctx = get_ctx()
-    donations = _get_donations(
-        accounts=accounts,
-        donors=donors,
-        start_time=start_time,
-        end_time=end_time,
-        sort=sort,
-        limit=limit,
-        offset=offset,
-        currency=currency,
+    return await serve_feed(
+        request,
+        donations_feed(
+            accounts=accounts,
+            donors=donors,
+            start_time=start_time,
+            end_time=end_time,
+            sort=sort,
+            limit=limit,
+            offset=offset,
+            currency=currency,
+        ),
+        lookup_lane,
+        feed_cache,
     )
 
-    try:
-        return Response(
-            content=FeedsGenerator(ctx.config).generate_donations_feed(donations),
-            media_type="application/rss+xml",
-        )
-    except PermissionError as e:
-        return Response(content=str(e), status_code=403)
-
 
 @router.get("/accounts/{account}/donations/rss", response_model=str)
-def get_account_donations_feed(
+async def get_account_donations_feed(
+    request: Request,
     account: str = Path(
         ...,
         description="Account URLs or FQDNs.",
@@ -585,10 +615,9 @@ def get_account_donations_feed(
     """
     Get donations for a specific account (RSS feed).
     """
-    ctx = get_ctx()
-
-    try:
-        donations = _get_donations(
+    return await serve_feed(
+        request,
+        donations_feed(
             accounts=[account],
             donors=donors,
             start_time=start_time,
@@ -597,11 +626,7 @@ def get_account_donations_feed(
             limit=limit,
             offset=offset,
             currency=currency,
-        )
-    except PermissionError as e:
-        return Response(content=str(e), status_code=403)
-
-    return Response(
-        content=FeedsGenerator(ctx.config).generate_donations_feed(donations),
-        media_type="application/rss+xml",
+        ),
+        lookup_lane,
+        feed_cache,
     )
@@ -0,0 +1,189 @@
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+
+from ...db import export_fields
+from ...model import Account
+from .. import get_ctx
+from .._app import analytics_lane
+from .._export import ExportFormat, stream_export
+
+router = APIRouter(prefix="/api/v1/export", tags=["export"])
+
+
+def _validate_account(account: str, wildcards: bool = False) -> str:
+    """
+    Validated before the export starts, as the query only fails once the
+    response is being streamed.
+
+    :param wildcards: Whether the filter supports wildcards (only the
+        donations filter does), which are then passed through.
+    """
+    if wildcards and "*" in account:
+        return account
+
+    try:
+        return Account.to_url(account)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid account format: {e}"
+        ) from e
+
+
+def _parse_time(value: str | None, name: str) -> datetime | None:
+    if not value:
+        return None
+
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid {name}: expected an ISO 8601 time"
+        ) from e
+
+
+format_query = Query(
+    ExportFormat.NDJSON,
+    alias="format",
+    description="Output format: ndjson (default), csv or parquet.",
+)
+
+
+@router.get("/posts", response_class=StreamingResponse)
+async def export_posts(
+    fmt: ExportFormat = format_query,
+    exclude_replies: bool = Query(
+        False, description="Whether to exclude replies (default: False)."
+    ),
+    min_id: int | None = Query(
+        None, description="Minimum post ID to return (exclusive)."
+    ),
+    max_id: int | None = Query(
+        None, description="Maximum post ID to return (exclusive)."
+    ),
+    account: str | None = Query(
+        None, description="Only export the posts of this account (URL or FQN)."
+    ),
+):
+    """
+    Export all the posts matching the filters, as a stream of rows.
+    Authors are referenced by URL - see ``/api/v1/export/accounts``.
+    """
+    ctx = get_ctx()
+    if ctx.config.hide_all_user_content:
+        raise HTTPException(status_code=403, detail="User content is hidden")
+
+    return await stream_export(
+        analytics_lane,
+        "posts",
+        fmt,
+        ctx.db.iter_post_rows(
+            exclude_replies=exclude_replies or ctx.config.hide_replies,
+            min_id=min_id,
+            max_id=max_id,
+            account=_validate_account(account) if account else None,
+        ),
+        export_fields["posts"],
+    )
+
+
+@router.get("/media", response_class=StreamingResponse)
+async def export_media(
+    fmt: ExportFormat = format_query,
+    min_id: int | None = Query(
+        None, description="Minimum media ID to return (exclusive)."
+    ),
+    max_id: int | None = Query(
+        None, description="Maximum media ID to return (exclusive)."
+    ),
+    account: str | None = Query(
+        None, description="Only export the media of this account (URL or FQN)."
+    ),
+):
+    """
+    Export all the media attachments matching the filters, as a stream of
+    rows. Posts and authors are referenced by URL.
+    """
+    ctx = get_ctx()
+    if ctx.config.hide_all_user_content or ctx.config.hide_media:
+        raise HTTPException(status_code=403, detail="Media is hidden")
+
+    return await stream_export(
+        analytics_lane,
+        "media",
+        fmt,
+        ctx.db.iter_attachment_rows(
+            min_id=min_id,
+            max_id=max_id,
+            account=_validate_account(account) if account else None,
+        ),
+        export_fields["media"],
+    )
+
+
+@router.get("/accounts", response_class=StreamingResponse)
+async def export_accounts(fmt: ExportFormat = format_query):
+    """
+    Export all the accounts, as a stream of rows.
+    """
+    return await stream_export(
+        analytics_lane,
+        "accounts",
+        fmt,
+        get_ctx().db.iter_account_rows(),
+        export_fields["accounts"],
+    )
+
+
+@router.get("/donations", response_class=StreamingResponse)
+async def export_donations(
+    fmt: ExportFormat = format_query,
+    accounts: list[str] = Query(
+        [],
+        description="Filter by account URLs or FQDNs. Wildcards are supported.",
+    ),
+    donors: list[str] = Query(
+        [],
+        description="Filter by donor names. Wildcards are supported.",
+    ),
+    start_time: str | None = Query(
+        None,
+        description="Filter donations created after this time (ISO 8601 format).",
+    ),
+    end_time: str | None = Query(
+        None,
+        description="Filter donations created before this time (ISO 8601 format).",
+    ),
+    currency: str | None = Query(
+        None,
+        description="Currency code for amounts (default: USD).",
+    ),
+    show_deleted: bool = Query(
+        False,
+        description="Include donations from deleted campaigns.",
+    ),
+):
+    """
+    Export all the campaign donations matching the filters, as a stream of
+    rows. Accounts are referenced by URL.
+    """
+    rows = get_ctx().db.iter_donation_rows(
+        accounts=[_validate_account(account, wildcards=True) for account in accounts],
+        donors=donors,
+        start_time=_parse_time(start_time, "start_time"),
+        end_time=_parse_time(end_time, "end_time"),
+        currency=currency,
+        show_deleted=show_deleted,
+    )
+
+    try:
+        return await stream_export(
+            analytics_lane,
+            "donations",
+            fmt,
+            rows,
+            export_fields["donations"],
+        )
+    except PermissionError as e:
+        return Response(content=str(e), status_code=403)
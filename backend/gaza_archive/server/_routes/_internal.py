@@ -8,10 +8,9 @@ from ...db._model import (
     Campaign as DbCampaign,
     CampaignDonation as DbCampaignDonation,
 )
-
-from ...loop import get_client
-from ...model import Account
+from .._app import analytics_lane, feed_cache, lookup_lane, response_cache
 from .._ctx import get_ctx
+from .._index import get_bots_info
 
 router = APIRouter(
     prefix="/api/v1/internal",
@@ -21,7 +20,7 @@ router = APIRouter(
 
 
 @router.get("/db_fields")
-def get_db_fields() -> dict[str, str]:
+async def get_db_fields() -> dict[str, str]:
     """
     Get list of database fields for campaigns allowed for filter/sort/group_by.
 
@@ -44,6 +43,7 @@ def get_db_fields() -> dict[str, str]:
 
 
 @router.get("/currencies")
+@lookup_lane
 def get_supported_currencies() -> list[str]:
     """
     Get list of supported currencies for exchange rates.
@@ -56,7 +56,7 @@ def get_supported_currencies() -> list[str]:
 
 
 @router.get("/config")
-def get_config() -> dict[str, Any]:
+async def get_config() -> dict[str, Any]:
     """
     Get current application configuration.
 
@@ -73,34 +73,42 @@ def get_config() -> dict[str, Any]:
 
 
 @router.get("/bots/accounts")
+@lookup_lane
 def get_bot_accounts_info() -> dict[str, Any] | None:
     """
     Get information about the accounts bot.
     """
-    client = get_client()
-    assert client, "Client is not initialized"
-    if not client.bot_account_info:
-        return None
-
-    account = Account(url=client.bot_account_info["url"])
-    return {
-        "url": client.bot_account_info["url"],
-        "fqn": account.fqn,
-    }
+    return get_bots_info(get_ctx().db)[0]
 
 
 @router.get("/bots/campaigns")
+@lookup_lane
 def get_bot_campaigns_info() -> dict[str, Any] | None:
     """
     Get information about the campaigns bot.
     """
-    client = get_client()
-    assert client, "Client is not initialized"
-    if not client.bot_campaign_info:
-        return None
+    return get_bots_info(get_ctx().db)[1]
 
-    account = Account(url=client.bot_campaign_info["url"])
-    return {
-        "url": client.bot_campaign_info["url"],
-        "fqn": account.fqn,
-    }
+
+@router.get("/cache")
+async def get_cache_stats() -> dict[str, int | float]:
+    """
+    Get the statistics of the API response cache.
+    """
+    return response_cache.stats()
+
+
+@router.get("/cache/feeds")
+async def get_feed_cache_stats() -> dict[str, int | float]:
+    """
+    Get the statistics of the rendered feeds cache.
+    """
+    return feed_cache.stats()
+
+
+@router.get("/executor")
+async def get_executor_stats() -> dict[str, dict[str, int]]:
+    """
+    Get the statistics of the database thread pools of the API.
+    """
+    return {lane.name: lane.stats() for lane in (lookup_lane, analytics_lane)}
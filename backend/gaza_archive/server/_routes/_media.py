@@ -1,13 +1,24 @@
-from fastapi import APIRouter, HTTPException, Path, Query, Response
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
 
 from ...model import Media
 from .. import get_ctx
-from ..feeds import FeedsGenerator
+from .._app import feed_cache, lookup_lane
+from .._feeds import media_feed, serve_feed
+from .._fields import (
+    ApiInclude,
+    fields_description,
+    include_description,
+    shaped_response,
+    shaped_response_model,
+)
+from .._lookup import LookupRequest, lookup_dicts
+from .._responses import OrjsonResponse
 
 router = APIRouter(prefix="/api/v1/media", tags=["media"])
 
 
-@router.get("", response_model=list[Media])
+@router.get("", response_model=shaped_response_model(Media))
+@lookup_lane
 def get_attachments(
     min_id: int | None = Query(
         None, description="Minimum media ID to return (exclusive)."
@@ -25,7 +36,9 @@ def get_attachments(
         None,
         description="Number of attachments to skip before starting to collect the result set.",
     ),
-) -> list[Media]:
+    fields: list[str] | None = Query(None, description=fields_description),
+    include: list[ApiInclude] | None = Query(None, description=include_description),
+) -> Response:
     """
     List all media.
     """
@@ -33,18 +46,22 @@ def get_attachments(
     if ctx.config.hide_all_user_content or ctx.config.hide_media:
         raise HTTPException(status_code=403, detail="Media is hidden")
 
-    return list(
-        ctx.db.get_attachments(
+    return shaped_response(
+        ctx.db.get_attachment_dicts(
             min_id=min_id,
             max_id=max_id,
             limit=limit,
             offset=offset,
-        )
+        ),
+        Media,
+        fields,
+        include,
     )
 
 
 @router.get("/rss", response_model=str)
-def get_attachments_feed(
+async def get_attachments_feed(
+    request: Request,
     min_id: int | None = Query(
         None, description="Minimum media ID to return (exclusive)."
     ),
@@ -65,25 +82,30 @@ def get_attachments_feed(
     """
     Get media (RSS feed).
     """
+    return await serve_feed(
+        request,
+        media_feed(min_id=min_id, max_id=max_id, limit=limit, offset=offset),
+        lookup_lane,
+        feed_cache,
+    )
+
+
+@router.post("/lookup", response_model=dict[str, Media | None])
+@lookup_lane
+def lookup_attachments(request: LookupRequest) -> Response:
+    """
+    Resolve a batch of media by URL or ID. Media that don't exist are mapped
+    to null.
+    """
     ctx = get_ctx()
     if ctx.config.hide_all_user_content or ctx.config.hide_media:
         raise HTTPException(status_code=403, detail="Media is hidden")
 
-    media = list(
-        ctx.db.get_attachments(
-            min_id=min_id,
-            max_id=max_id,
-            limit=limit,
-            offset=offset,
-        )
-    )
-    return Response(
-        content=FeedsGenerator(ctx.config).generate_media_feed(media),
-        media_type="application/rss+xml",
-    )
+    return OrjsonResponse(lookup_dicts(request.refs, ctx.db.get_attachment_dicts))
 
 
 @router.get("/{media}", response_model=Media)
+@lookup_lane
 def get_attachment(
     media: str = Path(..., description="Media URL."),
 ) -> Media:
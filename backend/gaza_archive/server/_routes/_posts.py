@@ -1,15 +1,26 @@
 from urllib.parse import unquote
 
-from fastapi import APIRouter, HTTPException, Path, Query, Response
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
 
 from ...model import Post
 from .. import get_ctx
-from ..feeds import FeedsGenerator
+from .._app import feed_cache, lookup_lane
+from .._feeds import posts_feed, serve_feed
+from .._fields import (
+    ApiInclude,
+    fields_description,
+    include_description,
+    shaped_response,
+    shaped_response_model,
+)
+from .._lookup import LookupRequest, lookup_dicts
+from .._responses import OrjsonResponse
 
 router = APIRouter(prefix="/api/v1/posts", tags=["posts"])
 
 
-@router.get("", response_model=list[Post])
+@router.get("", response_model=shaped_response_model(Post))
+@lookup_lane
 def get_posts(
     exclude_replies: bool = Query(
         False, description="Whether to exclude replies (default: False)."
@@ -30,30 +41,36 @@ def get_posts(
         None,
         description="Number of posts to skip before starting to collect the result set.",
     ),
-) -> list[Post]:
+    fields: list[str] | None = Query(None, description=fields_description),
+    include: list[ApiInclude] | None = Query(None, description=include_description),
+) -> Response:
     """
     List all posts.
     """
     ctx = get_ctx()
     if ctx.config.hide_all_user_content:
-        return []
+        return shaped_response([], Post, fields, include)
 
     if ctx.config.hide_replies:
         exclude_replies = True
 
-    return list(
-        ctx.db.get_posts(
+    return shaped_response(
+        ctx.db.get_post_dicts(
             exclude_replies=exclude_replies,
             min_id=min_id,
             max_id=max_id,
             limit=limit,
             offset=offset,
-        )
+        ),
+        Post,
+        fields,
+        include,
     )
 
 
 @router.get("/rss", response_model=str)
-def get_posts_feed(
+async def get_posts_feed(
+    request: Request,
     exclude_replies: bool = Query(
         False, description="Whether to exclude replies (default: False)."
     ),
@@ -77,32 +94,43 @@ def get_posts_feed(
     """
     Get posts (RSS feed).
     """
-    ctx = get_ctx()
-    if ctx.config.hide_all_user_content:
-        return Response(
-            content=FeedsGenerator(ctx.config).generate_posts_feed([]),
-            media_type="application/rss+xml",
-        )
-
-    if ctx.config.hide_replies:
-        exclude_replies = True
-
-    posts = list(
-        ctx.db.get_posts(
+    return await serve_feed(
+        request,
+        posts_feed(
             exclude_replies=exclude_replies,
             min_id=min_id,
             max_id=max_id,
             limit=limit,
             offset=offset,
-        )
-    )
-    return Response(
-        content=FeedsGenerator(ctx.config).generate_posts_feed(posts),
-        media_type="application/rss+xml",
+        ),
+        lookup_lane,
+        feed_cache,
     )
 
 
+@router.post("/lookup", response_model=dict[str, Post | None])
+@lookup_lane
+def lookup_posts(request: LookupRequest) -> Response:
+    """
+    Resolve a batch of posts by URL or ID. Posts that don't exist, or that
+    are hidden, are mapped to null.
+    """
+    ctx = get_ctx()
+    if ctx.config.hide_all_user_content:
+        return OrjsonResponse(dict.fromkeys(request.refs))
+
+    posts = lookup_dicts(request.refs, ctx.db.get_post_dicts)
+    if ctx.config.hide_replies:
+        posts = {
+            ref: post if post and not post["in_reply_to_id"] else None
+            for ref, post in posts.items()
+        }
+
+    return OrjsonResponse(posts)
+
+
 @router.get("/{post}", response_model=Post)
+@lookup_lane
 def get_post(
     post: str = Path(
         ...,
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ...db import event_types
+from ...model import api_split_args
+from .._app import event_stream
+
+router = APIRouter(prefix="/api/v1/stream", tags=["stream"])
+
+
+@router.get("", response_class=StreamingResponse)
+async def stream_events(
+    types: list[str] | None = Query(
+        None,
+        description=(
+            "Only stream these event types (comma-separated, or repeated): "
+            + ", ".join(f"`{event_type}`" for event_type in event_types)
+            + ". Default: all."
+        ),
+    ),
+    last_event_id: int | None = Query(
+        None,
+        description=(
+            "Resume after this event. Alternative to the `Last-Event-ID` "
+            "header, for clients that can't set it."
+        ),
+    ),
+    last_event_id_header: int | None = Header(
+        None,
+        alias="Last-Event-ID",
+        description="Resume after this event, sent by EventSource on reconnect.",
+    ),
+) -> StreamingResponse:
+    """
+    Stream the newly archived posts, media, donations and account state
+    changes as Server-Sent Events.
+
+    Each event has an `id`, its type as `event`, and the item as JSON `data`.
+    Posts and media have the same shape as in the other endpoints. Donations
+    are the stored records (campaign URL, amount in USD, donor), without the
+    account, and account state changes are audit records. The donations of
+    the excluded campaign accounts are not streamed.
+
+    Clients that reconnect with the ID of the last event they got receive the
+    events they missed, as long as they are still buffered. Otherwise they get
+    a `reset` event first, and they should fetch the latest data from the
+    other endpoints again.
+    """
+    if not event_stream.enabled:
+        raise HTTPException(
+            status_code=501,
+            detail="The event stream is only available when the API runs "
+            "in the same process as the crawlers",
+        )
+
+    if event_stream.full:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many stream clients",
+            headers={"Retry-After": "60"},
+        )
+
+    selected_types = set(api_split_args(types)) if types else None
+    unknown_types = (selected_types or set()) - set(event_types)
+    if unknown_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown event types: {', '.join(sorted(unknown_types))}",
+        )
+
+    return StreamingResponse(
+        event_stream.events(
+            last_event_id=(
+                last_event_id if last_event_id is not None else last_event_id_header
+            ),
+            types=selected_types,
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Don't let nginx buffer the events
+            "X-Accel-Buffering": "no",
+        },
+    )
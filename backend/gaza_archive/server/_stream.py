@@ -0,0 +1,275 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from logging import getLogger
+from threading import Lock
+from typing import Any, AsyncIterator, Collection, Sequence
+
+import orjson
+from pydantic import BaseModel
+
+from ..config import Config
+from ..db import Db
+from ..model import Account, CampaignDonation, Media, Post
+
+log = getLogger(__name__)
+
+# Idle streams get a comment every this many seconds, so proxies and clients
+# don't drop them
+keepalive_interval = 15
+# Reconnection delay suggested to the clients, in milliseconds
+reconnect_delay_ms = 5000
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """
+    An event of the stream, already encoded as a Server-Sent Events frame, so
+    it's serialized only once for all the clients.
+    """
+
+    id: int
+    type: str
+    frame: bytes
+
+
+def encode_event(event_id: int, event_type: str, data: Any) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        event_id,
+        event_type.encode(),
+        orjson.dumps(data),
+    )
+
+
+def _media_data(media: Media, post: dict[str, Any]) -> dict[str, Any]:
+    """
+    :param post: Serialized parent post, without attachments.
+    :return: The media with the same shape as in the API responses.
+    """
+    return {**media.model_dump(mode="json", exclude={"post"}), "post": post}
+
+
+def _post_data(post: Post) -> dict[str, Any]:
+    parent = post.model_dump(mode="json", exclude={"attachments"})
+    return {
+        **parent,
+        "attachments": [_media_data(media, parent) for media in post.attachments],
+    }
+
+
+class EventStream:
+    """
+    Fan-out of the newly archived data to the clients of ``/api/v1/stream``.
+
+    The events published by the database are encoded once and kept in a ring
+    buffer, shared by all the clients. Each client only keeps the ID of the
+    last event it received, so it can also resume from the ``Last-Event-ID``
+    of a previous connection, as long as that event is still buffered.
+    """
+
+    def __init__(self, config: Config, buffer_size: int, max_clients: int):
+        """
+        :param config: The application configuration, for the content that
+            should be hidden.
+        :param buffer_size: Number of recent events kept for the clients that
+            reconnect.
+        :param max_clients: Maximum number of connected clients.
+        """
+        self.config = config
+        self.max_clients = max_clients
+        # Their donations are hidden, as in the other campaign endpoints
+        self._excluded_campaign_accounts = {
+            Account.to_url(account) for account in config.exclude_campaign_accounts
+        }
+        self.clients = 0
+        self._events: deque[StreamEvent] = deque(maxlen=max(buffer_size, 1))
+        # IDs are sequential, starting from the time of the startup, so the
+        # IDs of a previous run are most likely older than the buffer
+        self._next_id = int(time.time() * 1000)
+        self._lock = Lock()
+        self._db: Db | None = None
+        self._closed = False
+        # Set when new events are published, and replaced by a new one. Bound
+        # to the event loop of the server, when the first client connects.
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed: asyncio.Event | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the stream receives the events of the database. It only does
+        in the process that writes the data, not in read-only API workers.
+        """
+        return self._db is not None and self.max_clients > 0 and not self._closed
+
+    @property
+    def full(self) -> bool:
+        return self.clients >= self.max_clients
+
+    def attach(self, db: Db):
+        """
+        Start receiving the new data committed through a database instance.
+        """
+        if self._db is db:
+            return
+
+        if self._db:
+            self._db.unsubscribe(self.publish)
+        db.subscribe(self.publish)
+        self._db = db
+
+    def _excluded_campaigns(self) -> set[str]:
+        """
+        :return: The URLs of the campaigns of the excluded accounts (see
+            ``EXCLUDE_CAMPAIGN_ACCOUNTS``). They're looked up on each batch of
+            donations, as the campaign of an account can change.
+        """
+        if not (self._db and self._excluded_campaign_accounts):
+            return set()
+        return self._db.get_account_campaign_urls(self._excluded_campaign_accounts)
+
+    def _event_data(
+        self, item: BaseModel, excluded_campaigns: Collection[str] = ()
+    ) -> Any | None:
+        """
+        :param excluded_campaigns: URLs of the campaigns whose donations are
+            hidden.
+        :return: The serialized item, or None if it should be hidden.
+        """
+        if isinstance(item, Post):
+            if self.config.hide_all_user_content or (
+                self.config.hide_replies and item.in_reply_to_id
+            ):
+                return None
+            return _post_data(item)
+
+        if isinstance(item, Media):
+            if (
+                self.config.hide_all_user_content
+                or self.config.hide_media
+                or (self.config.hide_replies and item.post.in_reply_to_id)
+            ):
+                return None
+            return _media_data(
+                item, item.post.model_dump(mode="json", exclude={"attachments"})
+            )
+
+        if isinstance(item, CampaignDonation):
+            if item.campaign_url in excluded_campaigns:
+                return None
+            if self.config.hide_donors:
+                return {**item.model_dump(mode="json"), "donor": None}
+
+        return item.model_dump(mode="json")
+
+    def publish(self, event_type: str, items: Sequence[BaseModel]):
+        """
+        Database event listener. It's called on the threads of the writers.
+        """
+        excluded_campaigns = (
+            self._excluded_campaigns() if event_type == "donation" else set()
+        )
+        data = [
+            value
+            for value in (self._event_data(item, excluded_campaigns) for item in items)
+            if value is not None
+        ]
+        if not data:
+            return
+
+        with self._lock:
+            for value in data:
+                self._events.append(
+                    StreamEvent(
+                        id=self._next_id,
+                        type=event_type,
+                        frame=encode_event(self._next_id, event_type, value),
+                    )
+                )
+                self._next_id += 1
+
+        self._notify_threadsafe()
+
+    def _notify_threadsafe(self):
+        loop = self._loop
+        if loop and not loop.is_closed():
+            loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        # Wake up all the clients at once, and give the next ones a new event
+        changed, self._changed = self._changed, asyncio.Event()
+        if changed:
+            changed.set()
+
+    def _since(self, last_id: int | None) -> tuple[list[StreamEvent], int, bool]:
+        """
+        :return: The buffered events after ``last_id``, the ID of the last
+            event, and whether ``last_id`` is unknown, i.e. too old or from
+            another process, and the events in between are lost.
+        """
+        with self._lock:
+            last = self._next_id - 1
+            if last_id is None:
+                return [], last, False
+
+            first = self._events[0].id if self._events else self._next_id
+            if last_id > last or last_id < first - 1:
+                return [], last, True
+
+            return list(islice(self._events, last_id - first + 1, None)), last, False
+
+    async def events(
+        self,
+        last_event_id: int | None = None,
+        types: Collection[str] | None = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream the events to a client until it disconnects or the stream is
+        closed.
+
+        :param last_event_id: Resume after this event. If it's no longer
+            buffered, a ``reset`` event is sent first, and the client should
+            fetch the current data from the API again. By default only the
+            new events are streamed.
+        :param types: Only stream these event types (default: all).
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+
+        self.clients += 1
+        log.debug("Stream client connected (%d clients)", self.clients)
+        try:
+            yield b"retry: %d\n\n" % reconnect_delay_ms
+            cursor = last_event_id
+            while not self._closed:
+                # Taken before reading the buffer, so the events published in
+                # the meantime aren't missed
+                changed = self._changed
+                assert changed
+                events, last, reset = self._since(cursor)
+                chunks = [b"event: reset\ndata: {}\n\n"] if reset else []
+                chunks += [
+                    event.frame for event in events if not types or event.type in types
+                ]
+                cursor = last
+                if chunks:
+                    yield b"".join(chunks)
+
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive_interval)
+                except TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.clients -= 1
+
+    def close(self):
+        """
+        End the streams of all the clients, e.g. on shutdown.
+        """
+        self._closed = True
+        if self._db:
+            self._db.unsubscribe(self.publish)
+        self._notify_threadsafe()
@@ -1,173 +1,184 @@
-import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Any, Iterable, Iterator
+from xml.sax.saxutils import escape
 
 from ..config import Config
-from ..model import Account, CampaignDonationInfo, Media, Post
+from ..model import Account, CampaignDonationInfo
 
 
-class FeedsGenerator:
-    def __init__(self, config: Config):
-        self.config = config
+def _element(tag: str, text: str | None = None) -> str:
+    """
+    Serialize an element with an optional text, the same way as
+    :mod:`xml.etree.ElementTree` does.
+    """
+    if not text:
+        return f"<{tag} />"
+    return f"<{tag}>{escape(text)}</{tag}>"
 
-    def generate_accounts_feed(self, accounts: list[Account]) -> str:
-        rss = ET.Element("rss", version="2.0")
-        channel = ET.SubElement(rss, "channel")
 
-        title = ET.SubElement(channel, "title")
-        title.text = "Accounts Feed"
+def _date(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
 
-        link = ET.SubElement(channel, "link")
-        link.text = self.config.base_url
 
-        description = ET.SubElement(channel, "description")
-        description.text = "RSS feed of accounts"
+def _channel(title: str, link: str, description: str) -> str:
+    return (
+        '<rss version="2.0"><channel>'
+        + _element("title", title)
+        + _element("link", link)
+        + _element("description", description)
+    )
 
-        for account in accounts:
-            item = ET.SubElement(channel, "item")
 
-            item_title = ET.SubElement(item, "title")
-            item_title.text = account.display_name or account.username
+_footer = "</channel></rss>"
 
-            item_link = ET.SubElement(item, "link")
-            item_link.text = account.url
 
-            item_description = ET.SubElement(item, "description")
-            item_description.text = (
-                f"User: {account.fqn}<br/>"
-                f'Original URL: <a href="{account.url}">{account.url}</a><br/>'
-                f'Archived URL: <a href="{self.config.base_url}/accounts/{account.fqn}">/accounts/{account.fqn}</a><br/>'
-            )
+class FeedsGenerator:
+    """
+    Generates RSS feeds as a stream of XML fragments - the channel header, one
+    fragment per item and the footer - so the items can be serialized while
+    they are read from the database.
+    """
 
-            guid = ET.SubElement(item, "guid")
-            guid.text = account.url
+    def __init__(self, config: Config):
+        self.config = config
 
-        return ET.tostring(rss, encoding="utf-8").decode("utf-8")
+    def generate_accounts_feed(
+        self, accounts: Iterable[dict[str, Any]]
+    ) -> Iterator[str]:
+        """
+        :param accounts: Account rows, with at least the ``url``,
+            ``display_name`` and ``fqn`` fields.
+        """
+        yield _channel("Accounts Feed", self.config.base_url, "RSS feed of accounts")
 
-    def generate_posts_feed(
-        self, posts: list[Post], account: Account | None = None
-    ) -> str:
-        rss = ET.Element("rss", version="2.0")
-        channel = ET.SubElement(rss, "channel")
+        for account in accounts:
+            url, fqn = account["url"], account["fqn"]
+            yield (
+                "<item>"
+                + _element("title", account["display_name"] or fqn.split("@")[1])
+                + _element("link", url)
+                + _element(
+                    "description",
+                    f"User: {fqn}<br/>"
+                    f'Original URL: <a href="{url}">{url}</a><br/>'
+                    f'Archived URL: <a href="{self.config.base_url}/accounts/{fqn}">/accounts/{fqn}</a><br/>',
+                )
+                + _element("guid", url)
+                + "</item>"
+            )
 
-        title = ET.SubElement(channel, "title")
-        title.text = "Posts Feed"
-        link = ET.SubElement(channel, "link")
-        description = ET.SubElement(channel, "description")
+        yield _footer
 
+    def generate_posts_feed(
+        self, posts: Iterable[dict[str, Any]], account: Account | None = None
+    ) -> Iterator[str]:
+        """
+        :param posts: Post rows, with at least the ``url``, ``author_url``,
+            ``content`` and ``created_at`` fields.
+        :param account: Author of the posts, for account feeds.
+        """
+        author_fqns: dict[str, str] = {}
         if account:
-            title.text += f" for {account.fqn}"
-            link.text = self.config.base_url + f"/accounts/{account.fqn}"
-            description.text = f"Posts by {account.fqn}"
+            yield _channel(
+                f"Posts Feed for {account.fqn}",
+                self.config.base_url + f"/accounts/{account.fqn}",
+                f"Posts by {account.fqn}",
+            )
         else:
-            link.text = self.config.base_url + "/posts"
-            description.text = (
-                "Feed containing recent posts from all verified accounts in Gaza"
+            yield _channel(
+                "Posts Feed",
+                self.config.base_url + "/posts",
+                "Feed containing recent posts from all verified accounts in Gaza",
             )
 
         for post in posts:
-            item = ET.SubElement(channel, "item")
-
-            item_title = ET.SubElement(item, "title")
-            item_title.text = "Published"
-            if post.author:
-                item_title.text += f" by {post.author.fqn}"
-            if post.created_at:
-                item_title.text += f" on {post.created_at.date()}"
-
-            item_link = ET.SubElement(item, "link")
-            item_link.text = post.url
-
-            item_description = ET.SubElement(item, "description")
-            item_description.text = post.content
-
-            guid = ET.SubElement(item, "guid")
-            guid.text = post.url
-
-            pub_date = ET.SubElement(item, "pubDate")
-            if post.created_at:
-                pub_date.text = post.created_at.isoformat()
-
-        return ET.tostring(rss, encoding="utf-8").decode("utf-8")
-
-    def generate_donations_feed(self, donations: list[CampaignDonationInfo]) -> str:
-        rss = ET.Element("rss", version="2.0")
-        channel = ET.SubElement(rss, "channel")
-
-        title = ET.SubElement(channel, "title")
-        title.text = "Campaign Donations Feed"
+            author_fqn = author_fqns.get(post["author_url"])
+            if author_fqn is None:
+                author_fqn = author_fqns[post["author_url"]] = Account(
+                    url=post["author_url"]
+                ).fqn
+
+            title = f"Published by {author_fqn}"
+            if post["created_at"]:
+                title += f" on {post['created_at'].date()}"
+
+            yield (
+                "<item>"
+                + _element("title", title)
+                + _element("link", post["url"])
+                + _element("description", post["content"])
+                + _element("guid", post["url"])
+                + _element("pubDate", _date(post["created_at"]))
+                + "</item>"
+            )
 
-        link = ET.SubElement(channel, "link")
-        link.text = self.config.base_url + "/donations"
+        yield _footer
 
-        description = ET.SubElement(channel, "description")
-        description.text = "RSS feed of campaign donations"
+    def generate_donations_feed(
+        self, donations: Iterable[CampaignDonationInfo]
+    ) -> Iterator[str]:
+        yield _channel(
+            "Campaign Donations Feed",
+            self.config.base_url + "/donations",
+            "RSS feed of campaign donations",
+        )
 
         for donation in donations:
-            item = ET.SubElement(channel, "item")
-
-            item_title = ET.SubElement(item, "title")
-            item_title.text = (
-                f"{donation.amount} donation to {donation.account.display_name}"
+            yield (
+                "<item>"
+                + _element(
+                    "title",
+                    f"{donation.amount} donation to {donation.account.display_name}",
+                )
+                + _element(
+                    "link",
+                    self.config.base_url
+                    + f"/campaigns/accounts/{donation.account.fqn}"
+                    + f"#donations-{donation.id}",
+                )
+                + _element(
+                    "description",
+                    f"Donor: {donation.donor}<br/>"
+                    f"Amount: {donation.amount}<br/>"
+                    f"Campaign: {donation.campaign_url}<br/>",
+                )
+                + _element("guid", f"{donation.campaign_url}#{donation.id}")
+                + _element("pubDate", _date(donation.created_at))
+                + "</item>"
             )
 
-            item_link = ET.SubElement(item, "link")
-            item_link.text = (
-                self.config.base_url
-                + f"/campaigns/accounts/{donation.account.fqn}#donations-{donation.id}"
-            )
-
-            item_description = ET.SubElement(item, "description")
-            item_description.text = (
-                f"Donor: {donation.donor}<br/>"
-                f"Amount: {donation.amount}<br/>"
-                f"Campaign: {donation.campaign_url}<br/>"
-            )
-
-            guid = ET.SubElement(item, "guid")
-            guid.text = f"{donation.campaign_url}#{donation.id}"
-
-            pub_date = ET.SubElement(item, "pubDate")
-            if donation.created_at:
-                pub_date.text = donation.created_at.isoformat()
-
-        return ET.tostring(rss, encoding="utf-8").decode("utf-8")
+        yield _footer
 
     def generate_media_feed(
-        self, media_items: list[Media], account: Account | None = None
-    ) -> str:
-        rss = ET.Element("rss", version="2.0")
-        channel = ET.SubElement(rss, "channel")
-
-        title = ET.SubElement(channel, "title")
-        title.text = "Media Feed"
-        link = ET.SubElement(channel, "link")
-        description = ET.SubElement(channel, "description")
-
+        self, media_items: Iterable[dict[str, Any]], account: Account | None = None
+    ) -> Iterator[str]:
+        """
+        :param media_items: Media rows, with at least the ``path``, ``type``,
+            ``description`` and ``post_created_at`` fields.
+        :param account: Author of the media, for account feeds.
+        """
         if account:
-            title.text += f" for {account.fqn}"
-            link.text = self.config.base_url + f"/accounts/{account.fqn}/media"
-            description.text = f"Media by {account.fqn}"
+            yield _channel(
+                f"Media Feed for {account.fqn}",
+                self.config.base_url + f"/accounts/{account.fqn}/media",
+                f"Media by {account.fqn}",
+            )
         else:
-            link.text = self.config.base_url + "/media"
-            description.text = (
-                "Feed containing recent media from all verified accounts in Gaza"
+            yield _channel(
+                "Media Feed",
+                self.config.base_url + "/media",
+                "Feed containing recent media from all verified accounts in Gaza",
             )
 
         for media in media_items:
-            item = ET.SubElement(channel, "item")
-
-            item_title = ET.SubElement(item, "title")
-            item_title.text = media.description or "Media Item"
-
-            item_link = ET.SubElement(item, "link")
-            item_link.text = self.config.base_url + media.path
-
-            item_description = ET.SubElement(item, "description")
-            item_description.text = f"Media Type: {media.type}"
-
-            guid = ET.SubElement(item, "guid")
-            guid.text = media.path
-            pub_date = ET.SubElement(item, "pubDate")
-            if media.post.created_at:
-                pub_date.text = media.post.created_at.isoformat()
+            yield (
+                "<item>"
+                + _element("title", media["description"] or "Media Item")
+                + _element("link", self.config.base_url + media["path"])
+                + _element("description", f"Media Type: {media['type']}")
+                + _element("guid", media["path"])
+                + _element("pubDate", _date(media["post_created_at"]))
+                + "</item>"
+            )
 
-        return ET.tostring(rss, encoding="utf-8").decode("utf-8")
+        yield _footer
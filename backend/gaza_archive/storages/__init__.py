@@ -1,4 +1,4 @@
-from ._base import Storage
+from ._base import DedupeReport, Storage
 from .file import FileStorage
 
-__all__ = ["Storage", "FileStorage"]
+__all__ = ["DedupeReport", "Storage", "FileStorage"]
@@ -1,14 +1,33 @@
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
+from dataclasses import dataclass
+from hashlib import sha256
 from logging import getLogger
-from typing import Any, Callable, Iterator, Generator
+from typing import Any, Callable, Generator, Iterator
 
 from ..config import Config
 from ..errors import DownloadError
+from ..model import MediaFile
 
 log = getLogger(__name__)
 
 
+@dataclass
+class DedupeReport:
+    """
+    Outcome of the deduplication of the stored files.
+    """
+
+    # Number of files checked
+    files: int = 0
+    # Number of files replaced by a reference to an identical one
+    deduplicated: int = 0
+    # Bytes freed by the deduplicated files
+    reclaimed_bytes: int = 0
+    # Number of stored contents no longer referenced by any file, removed
+    removed_blobs: int = 0
+
+
 class Storage(ABC):
     """
     Base class for storage implementations.
@@ -19,35 +38,133 @@ class Storage(ABC):
     @abstractmethod
     def exists(self, path: str) -> bool: ...
 
+    @abstractmethod
+    def read(self, path: str) -> bytes:
+        """
+        :return: The content of a stored file.
+        """
+
+    @abstractmethod
+    def stat(self, path: str) -> MediaFile | None:
+        """
+        :return: The media manifest entry of a stored file, or None if it
+            doesn't exist or it's not a media file.
+        """
+
+    @abstractmethod
+    def scan(self) -> Iterator[MediaFile]:
+        """
+        Walk the stored media files, e.g. to rebuild the media manifest.
+        """
+
     @abstractmethod
     @contextmanager
-    def _start_download(self, url: str, path: str) -> Iterator[Any]:
+    def _start_download(self, url: str, path: str, offset: int = 0) -> Iterator[Any]:
         """
         Context manager for downloading media.
         Yields a callable that returns a generator of bytes.
+
+        The content is written to a partial file, that only replaces the file
+        at ``path`` when the context exits without errors. Otherwise it's
+        kept, so the download can be resumed.
+
+        :param offset: Resume the partial file of a previous download from
+            this offset. 0 starts a new one.
+        """
+
+    @abstractmethod
+    def _read_partial(self, path: str, size: int) -> Iterator[bytes]:
+        """
+        :return: The first ``size`` bytes of the partial file of a download.
+        """
+
+    @abstractmethod
+    def partial_size(self, path: str) -> int:
+        """
+        :return: The size of the partial file left by an interrupted download
+            of a file, or 0 if there's none.
+        """
+
+    @abstractmethod
+    def partial_downloads(self) -> Iterator[tuple[str, str | None]]:
+        """
+        :return: The path and the source URL (if known) of the files whose
+            downloads were interrupted.
+        """
+
+    @abstractmethod
+    def discard_partial(self, path: str) -> None:
+        """
+        Remove the partial file of a download, so it starts again.
         """
 
     @abstractmethod
     def _save(self, handle: Any, data: bytes) -> None: ...
 
+    def _store_blob(self, path: str, digest: str) -> None:
+        """
+        Called after a file is saved, with the SHA-256 of its content, so
+        storages can keep a single copy of identical files.
+        """
+
+    @abstractmethod
+    def dedupe(
+        self, on_deduplicated: Callable[[MediaFile], None] | None = None
+    ) -> DedupeReport:
+        """
+        Deduplicate the files stored before they were content-addressed.
+
+        :param on_deduplicated: Called with each file replaced by a reference
+            to an identical one, with its content hash, e.g. to update the
+            media manifest.
+        """
+
     def save(
         self,
         url: str,
         path: str,
         get_data: Callable[[], Generator[bytes, None, None]],
-    ) -> None:
+        offset: int = 0,
+        size: int | None = None,
+    ) -> str:
+        """
+        :param offset: Append the data to the partial file of an interrupted
+            download, from this offset (see :meth:`partial_size`).
+        :param size: Expected size of the whole file, if known. Files of a
+            different size aren't stored.
+        :return: The SHA-256 of the saved content, as a hex string.
+        """
+        digest = sha256()
+        written = offset
         try:
-            with self._start_download(url=url, path=path) as handle:
+            if offset:
+                for chunk in self._read_partial(path, offset):
+                    digest.update(chunk)
+
+            with self._start_download(url=url, path=path, offset=offset) as handle:
                 for chunk in get_data():
+                    digest.update(chunk)
                     self._save(handle, chunk)
+                    written += len(chunk)
+
+                if size is not None and written != size:
+                    raise DownloadError(
+                        f"Incomplete download of {url}: {written} of {size} bytes"
+                    )
         except Exception as exc:
-            try:
-                self.delete(path)
-            except Exception:
-                pass
+            # Shorter files are kept to be resumed, but longer ones can't be a
+            # prefix of the file
+            if size is not None and written > size:
+                try:
+                    self.discard_partial(path)
+                except Exception:
+                    pass
 
             log.exception(exc)
             raise DownloadError(f"Failed to save media {url}") from exc
 
+        self._store_blob(path, digest.hexdigest())
+        return digest.hexdigest()
+
     @abstractmethod
     def delete(self, path: str) -> None: ...
@@ -1,14 +1,34 @@
 import logging
+import mimetypes
 import os
 import pathlib
+import uuid
 from contextlib import contextmanager
-from typing import IO, Iterator
+from datetime import datetime, timezone
+from hashlib import sha256
+from typing import IO, Callable, Iterator
 
 from ..config import Config
-from ._base import Storage
+from ..model import MediaFile
+from ..utils import naive_utc
+from ._base import DedupeReport, Storage
 
 log = logging.getLogger(__name__)
 
+# Size of the chunks read to hash the stored files
+hash_chunk_size = 1024 * 1024
+
+
+def _fsync_dir(path: str) -> None:
+    """
+    Persist the entries of a directory, e.g. after a rename.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
 
 class FileStorage(Storage):
     """
@@ -20,31 +40,278 @@ class FileStorage(Storage):
         self.config = config
         self.basedir = os.path.abspath(os.path.expanduser(config.storage_path))
         self.media_dir = os.path.join(self.basedir, "media")
+        # One copy of each stored content, by SHA-256. The files under the
+        # media directory are hardlinks to them.
+        self.blobs_dir = os.path.join(self.basedir, "blobs")
+        # Downloads in progress, or interrupted. Outside of the media directory,
+        # so they're never listed or served.
+        self.partial_dir = os.path.join(self.basedir, "partial")
         pathlib.Path(self.media_dir).mkdir(parents=True, exist_ok=True)
         log.info("File storage initialized at %s", self.basedir)
 
     def exists(self, path: str):
         filename = os.path.abspath(os.path.join(self.basedir, path.lstrip("/")))
-        assert filename.startswith(
-            self.basedir
-        ), f"Attempt to check file outside of storage directory: {filename}"
+        assert filename.startswith(self.basedir), (
+            f"Attempt to check file outside of storage directory: {filename}"
+        )
         return os.path.exists(filename)
 
+    def read(self, path: str) -> bytes:
+        filename = os.path.abspath(os.path.join(self.basedir, path.lstrip("/")))
+        assert filename.startswith(self.basedir), (
+            f"Attempt to read file outside of storage directory: {filename}"
+        )
+        with open(filename, "rb") as f:
+            return f.read()
+
+    def _media_file(self, filename: str, size: int, mtime: float) -> MediaFile:
+        path = os.path.relpath(filename, self.media_dir).replace(os.sep, "/")
+        return MediaFile(
+            path=path,
+            size=size,
+            mtime=naive_utc(datetime.fromtimestamp(mtime, tz=timezone.utc)),
+            type=mimetypes.guess_type(path)[0],
+        )
+
+    def stat(self, path: str) -> MediaFile | None:
+        filename = os.path.abspath(os.path.join(self.basedir, path.lstrip("/")))
+        if not filename.startswith(self.media_dir + os.sep):
+            return None
+
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+
+        return self._media_file(filename, st.st_size, st.st_mtime)
+
+    def scan(self) -> Iterator[MediaFile]:
+        dirs = [self.media_dir]
+        while dirs:
+            with os.scandir(dirs.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        yield self._media_file(entry.path, st.st_size, st.st_mtime)
+
+    def _partial_filename(self, path: str) -> str:
+        """
+        :return: The partial file of a download, without extension. The data
+            is in ``<name>.part``, and its source URL in ``<name>.url``.
+        """
+        filename = os.path.abspath(os.path.join(self.partial_dir, path.lstrip("/")))
+        assert filename.startswith(self.partial_dir + os.sep), (
+            f"Attempt to download outside of storage directory: {filename}"
+        )
+        return filename
+
     @contextmanager
-    def _start_download(self, url: str, path: str) -> Iterator[IO]:
-        media_path = os.path.join(self.basedir, path.lstrip("/"))
-        log.info("Downloading attachment %s to %s", url, media_path)
-        pathlib.Path(os.path.dirname(media_path)).mkdir(parents=True, exist_ok=True)
-        with open(media_path, "wb") as handle:
+    def _start_download(self, url: str, path: str, offset: int = 0) -> Iterator[IO]:
+        media_path = os.path.abspath(os.path.join(self.basedir, path.lstrip("/")))
+        assert media_path.startswith(self.basedir + os.sep), (
+            f"Attempt to download outside of storage directory: {media_path}"
+        )
+        partial = self._partial_filename(path)
+        pathlib.Path(os.path.dirname(partial)).mkdir(parents=True, exist_ok=True)
+
+        if offset:
+            log.info(
+                "Resuming download of %s to %s at %d bytes", url, media_path, offset
+            )
+            handle = open(f"{partial}.part", "r+b")
+            handle.truncate(offset)
+            handle.seek(offset)
+        else:
+            log.info("Downloading attachment %s to %s", url, media_path)
+            with open(f"{partial}.url", "w") as f:
+                f.write(url)
+            handle = open(f"{partial}.part", "wb")
+
+        with handle:
             yield handle
+            handle.flush()
+            os.fsync(handle.fileno())
+
+        # Renamed over the existing file, if any, rather than written through
+        # it, as it may be a hardlink shared with other files
+        media_dir = os.path.dirname(media_path)
+        pathlib.Path(media_dir).mkdir(parents=True, exist_ok=True)
+        os.replace(f"{partial}.part", media_path)
+        _fsync_dir(media_dir)
+        os.remove(f"{partial}.url")
+
+    def _read_partial(self, path: str, size: int) -> Iterator[bytes]:
+        with open(f"{self._partial_filename(path)}.part", "rb") as f:
+            while size > 0 and (chunk := f.read(min(hash_chunk_size, size))):
+                size -= len(chunk)
+                yield chunk
+
+    def partial_size(self, path: str) -> int:
+        try:
+            return os.path.getsize(f"{self._partial_filename(path)}.part")
+        except FileNotFoundError:
+            return 0
+
+    def partial_downloads(self) -> Iterator[tuple[str, str | None]]:
+        if not os.path.isdir(self.partial_dir):
+            return
+
+        for root, _, files in os.walk(self.partial_dir):
+            for name in files:
+                filename = os.path.join(root, name)
+                base, ext = os.path.splitext(filename)
+                if ext == ".url" and not os.path.exists(f"{base}.part"):
+                    # Left by an interruption right after the rename
+                    os.remove(filename)
+                if ext != ".part":
+                    continue
+
+                try:
+                    with open(f"{base}.url") as f:
+                        url = f.read().strip() or None
+                except FileNotFoundError:
+                    url = None
+
+                path = os.path.relpath(base, self.partial_dir).replace(os.sep, "/")
+                yield f"/{path}", url
+
+    def discard_partial(self, path: str) -> None:
+        partial = self._partial_filename(path)
+        for filename in (f"{partial}.part", f"{partial}.url"):
+            if os.path.exists(filename):
+                os.remove(filename)
 
     def _save(self, handle: IO, data: bytes) -> None:
         handle.write(data)
 
     def delete(self, path: str):
         filename = os.path.abspath(os.path.join(self.basedir, path.lstrip("/")))
-        assert filename.startswith(
-            self.basedir
-        ), f"Attempt to delete file outside of storage directory: {filename}"
+        assert filename.startswith(self.basedir), (
+            f"Attempt to delete file outside of storage directory: {filename}"
+        )
         if os.path.exists(filename):
             os.remove(filename)
+
+    def _blob_filename(self, digest: str) -> str:
+        # Sharded, so no directory gets too large
+        return os.path.join(self.blobs_dir, digest[:2], digest[2:4], digest)
+
+    def _link_blob(self, filename: str, digest: str) -> int:
+        """
+        Make a file a reference to the blob of its content: it's replaced by
+        a hardlink to the blob if it exists already, or it becomes the blob
+        otherwise. Files are left as they are if hardlinks aren't supported.
+
+        :return: The number of bytes freed.
+        """
+        blob = self._blob_filename(digest)
+        try:
+            st = os.stat(filename)
+            try:
+                blob_st = os.stat(blob)
+            except FileNotFoundError:
+                pathlib.Path(os.path.dirname(blob)).mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(filename, blob)
+                    return 0
+                except FileExistsError:
+                    # Stored by a concurrent download in the meantime
+                    blob_st = os.stat(blob)
+
+            if (blob_st.st_dev, blob_st.st_ino) == (st.st_dev, st.st_ino):
+                return 0
+            if blob_st.st_size != st.st_size:
+                log.warning("Size mismatch between %s and blob %s", filename, blob)
+                return 0
+
+            # Linked under a temporary name and renamed over the file, so the
+            # file path never goes missing
+            tmp = f"{filename}.{uuid.uuid4().hex}.tmp"
+            os.link(blob, tmp)
+            os.replace(tmp, filename)
+        except OSError as e:
+            log.warning("Could not deduplicate %s: %s", filename, e)
+            return 0
+
+        # The content is only freed if no other file linked to it
+        return st.st_size if st.st_nlink == 1 else 0
+
+    def _store_blob(self, path: str, digest: str) -> None:
+        filename = os.path.abspath(os.path.join(self.basedir, path.lstrip("/")))
+        reclaimed = self._link_blob(filename, digest)
+        if reclaimed:
+            log.info("%s is a duplicate, stored once (%d bytes saved)", path, reclaimed)
+
+    def _iter_blobs(self) -> Iterator[os.DirEntry]:
+        if not os.path.isdir(self.blobs_dir):
+            return
+
+        dirs = [self.blobs_dir]
+        while dirs:
+            with os.scandir(dirs.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+
+    def dedupe(
+        self, on_deduplicated: Callable[[MediaFile], None] | None = None
+    ) -> DedupeReport:
+        """
+        Replace the stored media files by hardlinks to the blobs of their
+        content, and remove the blobs that no file links to anymore. Files
+        that are already linked to a blob aren't hashed again, so it can be
+        run again after an interruption.
+        """
+        report = DedupeReport()
+        blob_inodes = set()
+        for entry in self._iter_blobs():
+            st = entry.stat(follow_symlinks=False)
+            blob_inodes.add((st.st_dev, st.st_ino))
+
+        for stored in self.scan():
+            filename = os.path.join(self.media_dir, stored.path)
+            report.files += 1
+            try:
+                st = os.stat(filename)
+                if (st.st_dev, st.st_ino) in blob_inodes:
+                    continue
+
+                digest = sha256()
+                with open(filename, "rb") as f:
+                    while chunk := f.read(hash_chunk_size):
+                        digest.update(chunk)
+            except OSError as e:
+                log.warning("Could not read %s: %s", filename, e)
+                continue
+
+            reclaimed = self._link_blob(filename, digest.hexdigest())
+            st = os.stat(filename)
+            blob_inodes.add((st.st_dev, st.st_ino))
+            if reclaimed:
+                report.deduplicated += 1
+                report.reclaimed_bytes += reclaimed
+                if on_deduplicated:
+                    # The file now has the mtime of the blob
+                    media_file = self._media_file(filename, st.st_size, st.st_mtime)
+                    media_file.sha256 = digest.hexdigest()
+                    on_deduplicated(media_file)
+
+            if report.files % 1000 == 0:
+                log.info(
+                    "Checked %d files, %d duplicates so far",
+                    report.files,
+                    report.deduplicated,
+                )
+
+        # Blobs with a single link are only referenced by the blob directory,
+        # i.e. all their files were deleted
+        for entry in self._iter_blobs():
+            if entry.stat(follow_symlinks=False).st_nlink == 1:
+                os.remove(entry.path)
+                report.removed_blobs += 1
+
+        return report
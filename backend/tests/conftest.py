@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+from dataclasses import replace
+from datetime import datetime
+from typing import Iterator
+
+import pytest
+from sqlalchemy import create_engine, make_url, text
+
+from gaza_archive.config import Config
+from gaza_archive.db import Db
+
+# The application reads its configuration from the environment when it's
+# imported, so it's pointed to a scratch database and storage before that
+_data_dir = tempfile.mkdtemp(prefix="gaza-archive-tests-")
+os.environ.update(
+    DB_URL=f"sqlite:///{_data_dir}/app.db",
+    STORAGE_PATH=os.path.join(_data_dir, "data"),
+    ENABLE_CRAWLERS="false",
+)
+
+
+def pytest_unconfigure():
+    shutil.rmtree(_data_dir, ignore_errors=True)
+
+
+def _postgresql_schema_url(url: str, schema: str) -> str:
+    """
+    :return: The URL of a PostgreSQL database, with the connections bound to
+        ``schema``.
+    """
+    return (
+        make_url(url)
+        .update_query_dict({"options": f"-csearch_path={schema}"})
+        .render_as_string(hide_password=False)
+    )
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def backend_db(request, tmp_path_factory) -> Iterator[Db]:
+    """
+    An empty database on each supported backend: SQLite, and PostgreSQL if
+    ``TEST_DB_URL`` points to one (e.g. the ``postgres`` service of
+    docker-compose). On PostgreSQL each test module gets its own schema,
+    dropped at the end, so the rest of the database is left untouched.
+
+    Today's exchange rates are stored, so amounts are converted without
+    fetching them.
+    """
+    config = Config.from_env()
+    if request.param == "sqlite":
+        path = tmp_path_factory.mktemp("db") / "app.db"
+        db = Db(replace(config, db_url=f"sqlite:///{path}"))
+        admin = schema = None
+    else:
+        url = os.getenv("TEST_DB_URL")
+        if not url:
+            pytest.skip("TEST_DB_URL is not set")
+
+        schema = f"test_{request.module.__name__}_{os.getpid()}"
+        admin = create_engine(url)
+        with admin.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+        db = Db(replace(config, db_url=_postgresql_schema_url(url, schema)))
+
+    db._save_to_cache(datetime.now().strftime("%Y-%m-%d"), {"USD": 1.0})
+    try:
+        yield db
+    finally:
+        db.engine.dispose()
+        if admin:
+            with admin.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+            admin.dispose()
@@ -0,0 +1,164 @@
+"""
+The campaign analytics (time buckets, group_by and sort) return the same
+results on every supported backend (see the ``backend_db`` fixture).
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import DateTime, literal, select
+
+from gaza_archive.db import Db
+from gaza_archive.db._dialects import time_buckets
+from gaza_archive.model import (
+    Account,
+    ApiSortType,
+    Campaign,
+    CampaignDonation,
+    CampaignStats,
+)
+
+# Campaign index -> (amount, time, donor) of its donations
+donations = {
+    0: [
+        (10.0, datetime(2025, 1, 7, 10, 0), "alice"),  # Tuesday
+        (20.0, datetime(2025, 1, 13, 23, 30), "bob"),  # Monday
+    ],
+    1: [(100.0, datetime(2025, 1, 14, 0, 30), "alice")],  # Tuesday
+    2: [
+        (5.0, datetime(2024, 12, 31, 12, 0), None),  # Tuesday
+        (1.0, datetime(2025, 2, 1, 8, 0), "bob"),  # Saturday
+    ],
+}
+
+
+def _account_url(i: int) -> str:
+    return f"https://analytics.social/@user{i}"
+
+
+@pytest.fixture(scope="module")
+def db(backend_db: Db) -> Db:
+    campaigns = []
+    for i, rows in donations.items():
+        url = f"https://www.gofundme.com/f/analytics-{i}"
+        campaigns.append(
+            Campaign(
+                url=url,
+                account_url=_account_url(i),
+                donations=[
+                    CampaignDonation(
+                        id=f"analytics-{i}-{j}",
+                        url=f"{url}#donation-analytics-{i}-{j}",
+                        campaign_url=url,
+                        amount=amount,
+                        created_at=created_at.replace(tzinfo=timezone.utc),
+                        donor=donor,
+                    )
+                    for j, (amount, created_at, donor) in enumerate(rows)
+                ],
+            )
+        )
+
+    backend_db.save_accounts(
+        [
+            Account(url=campaign.account_url, id=str(i), campaign_url=campaign.url)
+            for i, campaign in enumerate(campaigns)
+        ]
+    )
+    backend_db.save_campaigns(campaigns)
+    return backend_db
+
+
+def _groups(stats: CampaignStats) -> list[tuple[list, float]]:
+    """
+    :return: The group values and amounts of the top-level groups, in order.
+    """
+    return [(group.group_value, group.amount.amount) for group in stats.data]
+
+
+@pytest.mark.parametrize(
+    ("unit", "time", "bucket"),
+    [
+        ("day", datetime(2025, 1, 7, 23, 59), "2025-01-07"),
+        ("month", datetime(2025, 1, 31, 23, 59), "2025-01"),
+        ("year", datetime(2025, 12, 31, 23, 59), "2025"),
+        # Weeks start on Tuesday
+        ("week", datetime(2025, 1, 7, 0, 0), "2025-01-07"),
+        ("week", datetime(2025, 1, 8, 12, 0), "2025-01-07"),
+        ("week", datetime(2025, 1, 12, 12, 0), "2025-01-07"),
+        ("week", datetime(2025, 1, 13, 23, 59), "2025-01-07"),
+        ("week", datetime(2025, 1, 14, 0, 0), "2025-01-14"),
+        ("week", datetime(2025, 1, 2, 12, 0), "2024-12-31"),
+    ],
+)
+def test_time_bucket(db: Db, unit: str, time: datetime, bucket: str):
+    with db.get_session() as session:
+        result = session.execute(
+            select(time_buckets[unit](literal(time, DateTime())))
+        ).scalar()
+
+    assert result == bucket
+
+
+def test_group_by_account(db: Db):
+    stats = db.get_campaigns(
+        group_by=["account.url"], sort=[("amount", ApiSortType.DESC)]
+    )
+
+    assert _groups(stats) == [
+        ([_account_url(1)], 100.0),
+        ([_account_url(0)], 30.0),
+        ([_account_url(2)], 6.0),
+    ]
+    assert stats.data[0].account.url == _account_url(1)
+
+
+def test_group_by_account_and_month(db: Db):
+    stats = db.get_campaigns(
+        group_by=["account.url", "donation.created_at:month"],
+        sort=[("account.url", ApiSortType.ASC), ("amount", ApiSortType.ASC)],
+    )
+
+    assert [
+        (group.group_value, group.amount.amount)
+        for account in stats.data
+        for group in account.data
+    ] == [
+        ([_account_url(0), "2025-01"], 30.0),
+        ([_account_url(1), "2025-01"], 100.0),
+        ([_account_url(2), "2025-02"], 1.0),
+        ([_account_url(2), "2024-12"], 5.0),
+    ]
+
+
+def test_group_by_week(db: Db):
+    stats = db.get_campaigns(
+        group_by=["donation.created_at:week"],
+        sort=[("donation.created_at:week", ApiSortType.ASC)],
+    )
+
+    assert _groups(stats) == [
+        (["2024-12-31"], 5.0),
+        (["2025-01-07"], 30.0),
+        (["2025-01-14"], 100.0),
+        (["2025-01-28"], 1.0),
+    ]
+
+
+def test_group_by_donor(db: Db):
+    stats = db.get_campaigns(
+        group_by=["donation.donor"],
+        sort=[("amount", ApiSortType.DESC)],
+    )
+
+    assert _groups(stats) == [(["alice"], 110.0), (["bob"], 21.0), ([None], 5.0)]
+
+
+def test_group_by_donor_sorted_by_time(db: Db):
+    stats = db.get_campaigns(
+        accounts=[_account_url(0), _account_url(2)],
+        group_by=["donation.donor"],
+        sort=[("last_donation_time", ApiSortType.ASC)],
+    )
+
+    assert _groups(stats) == [([None], 5.0), (["alice"], 10.0), (["bob"], 21.0)]
@@ -0,0 +1,53 @@
+"""
+Saving campaigns only bumps the campaigns data version when something changed.
+"""
+
+from datetime import datetime, timezone
+
+from gaza_archive.db import Db
+from gaza_archive.model import Campaign, CampaignDonation, SuspensionState
+
+
+def _campaign(url: str, donation_ids: list[str]) -> Campaign:
+    return Campaign(
+        url=url,
+        account_url="https://campaigns.social/@user",
+        # As stored, like the crawler does
+        state=SuspensionState.ACTIVE,
+        donations=[
+            CampaignDonation(
+                id=donation_id,
+                url=f"{url}#donation-{donation_id}",
+                campaign_url=url,
+                amount=1.0,
+                created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            )
+            for donation_id in donation_ids
+        ],
+    )
+
+
+def _version(db: Db) -> int:
+    version, _ = db.get_data_version(scopes=("campaigns",))
+    return version
+
+
+def test_data_version(backend_db: Db):
+    first = "https://www.gofundme.com/f/versions-1"
+    second = "https://www.gofundme.com/f/versions-2"
+    backend_db.save_campaigns([_campaign(first, ["v1", "v2"])])
+    version = _version(backend_db)
+
+    # Same donations, same campaign: nothing to save
+    backend_db.save_campaigns([_campaign(first, ["v1", "v2"])])
+    assert _version(backend_db) == version
+
+    # New donation
+    backend_db.save_campaigns([_campaign(first, ["v1", "v2", "v3"])])
+    assert _version(backend_db) > version
+    version = _version(backend_db)
+
+    # Donation moved to another campaign
+    backend_db.save_campaigns([_campaign(second, ["v3"])])
+    assert _version(backend_db) > version
+    assert [d.id for d in backend_db.get_recent_campaign_donations(second)] == ["v3"]
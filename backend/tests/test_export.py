@@ -0,0 +1,28 @@
+"""
+The export filters are validated before the response starts streaming.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gaza_archive.server import create_app
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    return TestClient(create_app(), raise_server_exceptions=False)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        # Only the donations filter supports wildcards
+        "/api/v1/export/posts?account=foo*",
+        "/api/v1/export/media?account=*@x.y",
+        "/api/v1/export/posts?account=not-an-account",
+        "/api/v1/export/donations?accounts=not-an-account",
+        "/api/v1/export/donations?start_time=yesterday",
+    ],
+)
+def test_invalid_filters(client: TestClient, path: str):
+    assert client.get(path).status_code == 400
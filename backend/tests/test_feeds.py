@@ -0,0 +1,35 @@
+"""
+Conditional feed requests are only answered with a 304 for valid feeds.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gaza_archive.model import Account
+from gaza_archive.server import create_app, get_ctx
+
+account = "@feeds@example.social"
+future = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    # Also makes sure that the feeds have a Last-Modified time
+    get_ctx().db.save_accounts([Account(url=Account.to_url(account), id="feeds")])
+    return TestClient(create_app())
+
+
+@pytest.mark.parametrize("feed", ["posts", "media"])
+def test_missing_account(client: TestClient, feed: str):
+    path = f"/api/v1/accounts/@ghost@nowhere.social/{feed}/rss"
+
+    assert client.get(path).status_code == 404
+    assert client.get(path, headers={"If-Modified-Since": future}).status_code == 404
+
+
+@pytest.mark.parametrize("feed", ["posts", "media"])
+def test_not_modified(client: TestClient, feed: str):
+    path = f"/api/v1/accounts/{account}/{feed}/rss"
+
+    assert client.get(path).status_code == 200
+    assert client.get(path, headers={"If-Modified-Since": future}).status_code == 304
@@ -0,0 +1,82 @@
+"""
+The crawler and the API only import the stack of the mode they run (see
+:class:`gaza_archive.app.App`).
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+
+# Startup time budget of an entry point, in seconds. It's generous, as it's
+# only meant to catch heavy imports creeping back in.
+import_time_budget = 5.0
+
+_probe = """
+import json, sys, time
+
+started_at = time.monotonic()
+{entry_point}
+print(json.dumps({{
+    "elapsed": time.monotonic() - started_at,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def _load(entry_point: str) -> tuple[float, set[str]]:
+    """
+    Run an entry point in a fresh interpreter.
+
+    :return: The time it took, and the modules it imported.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-c", _probe.format(entry_point=entry_point)],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    # The application logs to stdout too
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["elapsed"], set(result["modules"])
+
+
+@pytest.mark.parametrize(
+    ("entry_point", "forbidden"),
+    [
+        pytest.param(
+            "from gaza_archive.app import App, AppMode\nApp(mode=AppMode.CRAWLER)",
+            ["fastapi", "starlette", "jinja2", "gaza_archive.server"],
+            id="crawler",
+        ),
+        pytest.param(
+            # What each API worker runs
+            "from gaza_archive.server import create_app\ncreate_app()",
+            [
+                "bs4",
+                "requests",
+                "gaza_archive.loop",
+                "gaza_archive.client.sources.campaigns",
+            ],
+            id="api",
+        ),
+    ],
+)
+def test_entry_point_imports(entry_point: str, forbidden: list[str]):
+    elapsed, modules = _load(entry_point)
+
+    loaded = sorted(
+        name
+        for name in forbidden
+        if any(m == name or m.startswith(name + ".") for m in modules)
+    )
+    assert not loaded, f"Unexpected imports: {', '.join(loaded)}"
+    assert elapsed < import_time_budget, (
+        f"Startup took {elapsed:.2f}s (budget: {import_time_budget:g}s)"
+    )
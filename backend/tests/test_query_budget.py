@@ -0,0 +1,112 @@
+"""
+The list and detail endpoints run a bounded number of SQL statements,
+whatever the number of items and authors they return (see ``query_budget``).
+"""
+
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from gaza_archive.db import QueryCounter
+from gaza_archive.model import Account, Media, Post
+from gaza_archive.server import _app, create_app, get_ctx
+from gaza_archive.server._app import query_budget
+
+# Enough authors and items for a lazy load per row to exceed the budget
+n_accounts = 12
+n_posts = 4
+
+account = "@user0@inst0.social"
+
+
+@pytest.fixture(scope="module")
+def app() -> FastAPI:
+    db = get_ctx().db
+    accounts = [
+        Account(
+            url=f"https://inst{i % 3}.social/@user{i}",
+            id=str(i),
+            display_name=f"User {i}",
+            avatar_url=f"https://cdn.example/avatars/{i}.png",
+            created_at=datetime(2024, 1, 1) + timedelta(days=i),
+        )
+        for i in range(n_accounts)
+    ]
+    db.save_accounts(accounts)
+
+    posts = []
+    for i, author in enumerate(accounts):
+        for j in range(n_posts):
+            post_id = str(i * n_posts + j)
+            post = Post(
+                url=f"{author.url}/{post_id}",
+                id=post_id,
+                author=author,
+                content=f"<p>Post {post_id}</p>",
+                created_at=datetime(2024, 6, 1) + timedelta(hours=int(post_id)),
+            )
+            post.attachments = [
+                Media(
+                    url=f"https://cdn.example/media/{post_id}.jpg",
+                    id=post_id,
+                    type="image",
+                    post=post,
+                )
+            ]
+            posts.append(post)
+    db.save_posts(posts)
+
+    return create_app()
+
+
+def _get(app: FastAPI, path: str) -> tuple[httpx.Response, int]:
+    """
+    Run a request in this context, so its statements are counted here too.
+
+    :return: The response, and the number of statements it executed.
+    """
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            with QueryCounter.track() as counter:
+                response = await client.get(path)
+        return response, counter.count
+
+    return asyncio.run(get())
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/v1/posts",
+        "/api/v1/posts?fields=id,author.fqn",
+        "/api/v1/posts?include=author",
+        "/api/v1/posts/0",
+        "/api/v1/media",
+        "/api/v1/accounts",
+        f"/api/v1/accounts/{account}",
+        f"/api/v1/accounts/{account}/posts",
+        f"/api/v1/accounts/{account}/media",
+    ],
+)
+def test_query_budget(app: FastAPI, path: str):
+    response, count = _get(app, path)
+
+    assert response.status_code == 200, response.text
+    assert count <= query_budget, f"{count} queries (budget: {query_budget})"
+
+
+def test_query_count_header(app: FastAPI, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(_app, "config", replace(_app.config, debug=True))
+    path = f"/api/v1/accounts/{account}/posts"
+    _get(app, path)  # Cached
+
+    response, count = _get(app, path)
+    assert response.headers["X-Query-Count"] == str(count)
@@ -0,0 +1,68 @@
+"""
+The event stream hides the same content as the other endpoints.
+"""
+
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from gaza_archive.config import Config
+from gaza_archive.db import Db
+from gaza_archive.model import Account, Campaign, CampaignDonation
+from gaza_archive.server._stream import EventStream
+
+excluded_account = "@excluded@stream.social"
+
+
+def _campaign(i: int, account_url: str) -> Campaign:
+    url = f"https://www.gofundme.com/f/stream-{i}"
+    return Campaign(
+        url=url,
+        account_url=account_url,
+        donations=[
+            CampaignDonation(
+                id=f"stream-{i}",
+                url=f"{url}#donation-stream-{i}",
+                campaign_url=url,
+                amount=10.0,
+                created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            )
+        ],
+    )
+
+
+async def _read(stream: EventStream, last_event_id: int) -> bytes:
+    """
+    :return: The frames streamed after ``last_event_id``.
+    """
+    events = stream.events(last_event_id=last_event_id)
+    try:
+        await anext(events)  # Reconnection delay
+        return await anext(events)
+    finally:
+        await events.aclose()
+
+
+def test_excluded_campaign_accounts():
+    config = replace(Config.from_env(), exclude_campaign_accounts=[excluded_account])
+    db = Db(config)
+    campaigns = [
+        _campaign(0, Account.to_url(excluded_account)),
+        _campaign(1, "https://stream.social/@included"),
+    ]
+    db.save_accounts(
+        [
+            Account(url=campaign.account_url, id=str(i), campaign_url=campaign.url)
+            for i, campaign in enumerate(campaigns)
+        ]
+    )
+
+    stream = EventStream(config, buffer_size=10, max_clients=1)
+    stream.attach(db)
+    _, last_event_id, _ = stream._since(None)
+    db.save_campaigns(campaigns)
+
+    frames = asyncio.run(_read(stream, last_event_id))
+    assert b'"id":"stream-1"' in frames
+    assert b'"id":"stream-0"' not in frames
+    stream.close()
@@ -0,0 +1,42 @@
+// Precompress the text assets of the build, so the backend (or nginx) can
+// serve the .br/.gz siblings without compressing them on every request.
+
+import { readdir, readFile, writeFile } from 'node:fs/promises'
+import { join } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+const distDir = new URL('../dist', import.meta.url).pathname
+const extensions = /\.(css|html|ico|js|json|map|svg|txt|xml)$/
+// Smaller files don't gain much, and they can even grow
+const minSize = 1024
+
+const encoders = {
+  br: (data) => brotliCompressSync(data, {
+    params: { [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY },
+  }),
+  gz: (data) => gzipSync(data, { level: 9 }),
+}
+
+let count = 0
+for (const entry of await readdir(distDir, { recursive: true, withFileTypes: true })) {
+  if (!entry.isFile() || !extensions.test(entry.name)) {
+    continue
+  }
+
+  const path = join(entry.parentPath, entry.name)
+  const data = await readFile(path)
+  if (data.length < minSize) {
+    continue
+  }
+
+  for (const [suffix, encode] of Object.entries(encoders)) {
+    const compressed = encode(data)
+    if (compressed.length < data.length) {
+      await writeFile(`${path}.${suffix}`, compressed)
+    }
+  }
+
+  count++
+}
+
+console.log(`Precompressed ${count} files in ${distDir}`)